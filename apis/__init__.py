@@ -2,6 +2,7 @@ from flask_restx import Api
 
 from .authors import api as api_authors
 from .books import api as api_books
+from .representations import BINARY_CODECS, binary_output, output_json
 
 api = Api(
     title="Books API",
@@ -11,3 +12,6 @@ api = Api(
 
 api.add_namespace(api_books, path="/api/books")
 api.add_namespace(api_authors, path="/api/authors")
+api.representation("application/json")(output_json)
+for mimetype, (encode, _decode) in BINARY_CODECS.items():
+    api.representation(mimetype)(binary_output(encode))
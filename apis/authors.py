@@ -1,33 +1,66 @@
 from http import HTTPStatus
 
-from flasgger import swag_from
+from flask import request
 from flask_restx import Namespace, Resource
 
-from apis.authors_specs import (
-    authors_delete_specs,
-    authors_get_by_id_specs,
-    authors_get_list_specs,
-    authors_post_specs,
+from apis.conditional import if_match, is_not_modified, not_modified, validators
+from apis.docs import swag_from
+from apis.pagination import (
+    get_page_args,
+    next_page_headers,
+    stream_response,
+    wants_stream,
 )
 from services.authors import (
     create_author_from_payload_json,
     delete_author,
     get_all_authors_json,
-    get_author_json,
+    get_all_authors_with_books_json,
+    get_author_with_books_json,
+    iter_authors_json,
+    iter_authors_with_books_json,
+)
+from services.batch import create_authors_from_payload_json
+from services.versions import (
+    PreconditionFailed,
+    get_author_etag,
+    get_authors_etag,
+    get_authors_with_books_etag,
 )
-from services.books import get_books_by_author_json
 
 api = Namespace("authors", description="Authors related operations")
 
 
 @api.route("/")
 class AuthorList(Resource):
-    @swag_from(authors_get_list_specs)
+    @swag_from("authors_get_list_specs")
     def get(self):
         """Get list of all authors in the database."""
-        return get_all_authors_json()
+        after_id, limit = get_page_args()
+        include_books = _include_books()
+        if wants_stream():
+            iter_json = (
+                iter_authors_with_books_json if include_books else iter_authors_json
+            )
+            return stream_response(iter_json(after_id=after_id, limit=limit))
+
+        etag, last_modified = (
+            get_authors_with_books_etag() if include_books else get_authors_etag()
+        )
+        if is_not_modified(etag, last_modified):
+            return not_modified(etag, last_modified)
+
+        get_json = (
+            get_all_authors_with_books_json if include_books else get_all_authors_json
+        )
+        authors = get_json(after_id=after_id, limit=limit)
+        return (
+            authors,
+            HTTPStatus.OK,
+            {**next_page_headers(authors, limit), **validators(etag, last_modified)},
+        )
 
-    @swag_from(authors_post_specs)
+    @swag_from("authors_post_specs")
     def post(self):
         """Create new author, and return its data"""
         try:
@@ -36,29 +69,53 @@ class AuthorList(Resource):
             return api.abort(HTTPStatus.BAD_REQUEST, ex)
 
 
+@api.route("/batch")
+class AuthorBatch(Resource):
+    @swag_from("authors_batch_post_specs")
+    def post(self):
+        """Create many authors at once, and return per-author results"""
+        try:
+            return create_authors_from_payload_json(api.payload)
+        except Exception as ex:
+            return api.abort(HTTPStatus.BAD_REQUEST, ex)
+
+
 @api.route("/<author_id>")
 @api.param("author_id", "The author identifier")
 class Author(Resource):
-    @swag_from(authors_get_by_id_specs)
+    @swag_from("authors_get_by_id_specs")
     def get(self, author_id):
         """Get author info and list of author's books by author's ID."""
         try:
-            author = get_author_json(author_id)
+            etag, last_modified = get_author_etag(author_id)
+            if is_not_modified(etag, last_modified):
+                return not_modified(etag, last_modified)
+
+            author = get_author_with_books_json(author_id)
         except Exception:
             return api.abort(
                 HTTPStatus.NOT_FOUND, f"Author with {author_id=} not found."
             )
 
-        return {
-            **author,
-            "books": get_books_by_author_json(author_id),
-        }
+        return author, HTTPStatus.OK, validators(etag, last_modified)
 
-    @swag_from(authors_delete_specs)
+    @swag_from("authors_delete_specs")
     def delete(self, author_id):
         """Delete author by its id, and all books of this author."""
         try:
-            delete_author(author_id)
+            delete_author(author_id, if_match())
             return "", HTTPStatus.NO_CONTENT
+        except PreconditionFailed as ex:
+            return api.abort(HTTPStatus.PRECONDITION_FAILED, ex)
         except Exception:
             api.abort(HTTPStatus.NOT_FOUND, f"Author with {author_id=} not found.")
+
+
+def _include_books() -> bool:
+    """Whether `?include=books` asks for the books of each author in the list.
+    Aborts with 400 Bad Request for anything else to include.
+    """
+    include = {name for name in request.args.get("include", "").split(",") if name}
+    if not include <= {"books"}:
+        api.abort(HTTPStatus.BAD_REQUEST, "Only books can be included.")
+    return "books" in include
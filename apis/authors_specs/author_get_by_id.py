@@ -75,6 +75,10 @@ authors_get_by_id_specs = {
                 },
             },
         },
+        "304": {
+            "description": "Not modified since the version identified by "
+            "`If-None-Match` (or `If-Modified-Since`)",
+        },
         "404": {
             "description": "Not found",
             "schema": {
@@ -0,0 +1,94 @@
+authors_batch_post_specs = {
+    "tags": ["authors"],
+    "description": "Create many authors in one transaction.",
+    "definitions": {
+        "Author": {
+            "type": "object",
+            "properties": {
+                "id": {
+                    "type": "number",
+                },
+                "last_name": {
+                    "type": "string",
+                },
+                "first_name": {
+                    "type": "string",
+                },
+                "middle_name": {
+                    "type": "string",
+                },
+            },
+        },
+        "AuthorResult": {
+            "type": "object",
+            "properties": {
+                "status": {
+                    "type": "number",
+                    "description": "201 if the author was created, 400 otherwise",
+                },
+                "author": {
+                    "$ref": "#/definitions/Author",
+                },
+                "message": {
+                    "description": "Why the author was not created",
+                },
+            },
+        },
+        "Error": {
+            "type": "object",
+            "properties": {
+                "message": {
+                    "type": "string",
+                }
+            },
+        },
+    },
+    "parameters": [
+        {
+            "name": "body",
+            "in": "body",
+            "required": True,
+            "schema": {
+                "type": "array",
+                "items": {
+                    "required": ["last_name", "first_name"],
+                    "properties": {
+                        "last_name": {
+                            "type": "string",
+                            "required": True,
+                        },
+                        "first_name": {
+                            "type": "string",
+                            "required": True,
+                        },
+                        "middle_name": {
+                            "type": "string",
+                        },
+                    },
+                },
+            },
+        },
+    ],
+    "responses": {
+        "201": {
+            "description": "All authors created in the database",
+            "schema": {
+                "type": "array",
+                "items": {"$ref": "#/definitions/AuthorResult"},
+            },
+        },
+        "207": {
+            "description": "Some of the authors were not created, see per-author results",
+            "schema": {
+                "type": "array",
+                "items": {"$ref": "#/definitions/AuthorResult"},
+            },
+        },
+        "400": {
+            "description": "Bad request",
+            "schema": {
+                "$ref": "#/definitions/Error",
+            },
+        },
+    },
+}
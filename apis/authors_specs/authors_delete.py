@@ -29,5 +29,11 @@ authors_delete_specs = {
                 "$ref": "#/definitions/Error",
             },
         },
+        "412": {
+            "description": "The author doesn't match `If-Match` ETag",
+            "schema": {
+                "$ref": "#/definitions/Error",
+            },
+        },
     },
 }
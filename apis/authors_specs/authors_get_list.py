@@ -1,6 +1,40 @@
 authors_get_list_specs = {
     "tags": ["authors"],
     "description": "Get list of all authors in the database.",
+    "parameters": [
+        {
+            "name": "after_id",
+            "in": "query",
+            "required": False,
+            "type": "number",
+            "description": "Return only authors with ID greater than this one "
+            "(keyset pagination cursor).",
+        },
+        {
+            "name": "limit",
+            "in": "query",
+            "required": False,
+            "type": "number",
+            "description": "Maximum number of authors to return (1-1000). "
+            "`Link` header points to the next page.",
+        },
+        {
+            "name": "stream",
+            "in": "query",
+            "required": False,
+            "type": "boolean",
+            "description": "Stream the list as chunked JSON. "
+            "Send `Accept: application/x-ndjson` to stream NDJSON instead.",
+        },
+        {
+            "name": "include",
+            "in": "query",
+            "required": False,
+            "type": "string",
+            "enum": ["books"],
+            "description": "Include the list of books of each author.",
+        },
+    ],
     "definitions": {
         "Author": {
             "type": "object",
@@ -28,5 +62,9 @@ authors_get_list_specs = {
                 "items": {"$ref": "#/definitions/Author"},
             },
         },
+        "304": {
+            "description": "Not modified since the version identified by "
+            "`If-None-Match` (or `If-Modified-Since`)",
+        },
     },
 }
@@ -1,20 +1,36 @@
 from http import HTTPStatus
 
+from flask import request
 from flask_restx import Namespace, Resource
 
+from apis.conditional import if_match, is_not_modified, not_modified, validators
+from apis.pagination import (
+    get_offset_arg,
+    get_page_args,
+    next_page_headers,
+    stream_response,
+    wants_stream,
+)
+from services.batch import create_books_from_payload_json
 from services.books import (
     delete_book,
     get_all_books_json,
     get_book_json,
+    iter_books_json,
+    search_books_json,
     update_book_from_payload_json,
 )
 from services.common import (
     create_book_and_author_from_payload_json,
     update_or_create_book_from_payload_json,
 )
+from services.versions import PreconditionFailed, get_book_etag, get_books_etag
 
 api = Namespace("books", description="Books related operations")
 
+# Number of search results returned when no `limit` is given
+SEARCH_PAGE_SIZE = 50
+
 
 @api.route("/")
 class BookList(Resource):
@@ -22,7 +38,40 @@ class BookList(Resource):
         """
         file: books_get_list.yml
         """
-        return get_all_books_json()
+        after_id, limit = get_page_args()
+        query = request.args.get("q", None)
+        if query is not None:
+            return self.search(query, limit or SEARCH_PAGE_SIZE, get_offset_arg())
+
+        if wants_stream():
+            return stream_response(iter_books_json(after_id=after_id, limit=limit))
+
+        etag, last_modified = get_books_etag()
+        if is_not_modified(etag, last_modified):
+            return not_modified(etag, last_modified)
+
+        books = get_all_books_json(after_id=after_id, limit=limit)
+        return (
+            books,
+            HTTPStatus.OK,
+            {**next_page_headers(books, limit), **validators(etag, last_modified)},
+        )
+
+    @staticmethod
+    def search(query: str, limit: int, offset: int):
+        etag, last_modified = get_books_etag()
+        if is_not_modified(etag, last_modified):
+            return not_modified(etag, last_modified)
+
+        books = search_books_json(query, limit, offset)
+        return (
+            books,
+            HTTPStatus.OK,
+            {
+                **next_page_headers(books, limit, offset),
+                **validators(etag, last_modified),
+            },
+        )
 
     def post(self):
         """
@@ -37,6 +86,18 @@ class BookList(Resource):
             return api.abort(HTTPStatus.BAD_REQUEST, ex)
 
 
+@api.route("/batch")
+class BookBatch(Resource):
+    def post(self):
+        """
+        file: books_batch_create.yml
+        """
+        try:
+            return create_books_from_payload_json(api.payload)
+        except Exception as ex:
+            return api.abort(HTTPStatus.BAD_REQUEST, ex)
+
+
 @api.route("/<book_id>")
 @api.param("book_id", "The book identifier")
 class Book(Resource):
@@ -45,7 +106,15 @@ class Book(Resource):
         file: books_get_by_id.yml
         """
         try:
-            return get_book_json(book_id)
+            etag, last_modified = get_book_etag(book_id)
+            if is_not_modified(etag, last_modified):
+                return not_modified(etag, last_modified)
+
+            return (
+                get_book_json(book_id),
+                HTTPStatus.OK,
+                validators(etag, last_modified),
+            )
         except Exception:
             api.abort(HTTPStatus.NOT_FOUND, f"Book with {book_id=} not found.")
 
@@ -54,7 +123,10 @@ class Book(Resource):
         file: books_patch.yml
         """
         try:
-            return update_book_from_payload_json(book_id, api.payload)
+            book = update_book_from_payload_json(book_id, api.payload, if_match())
+            return book, HTTPStatus.OK, validators(*get_book_etag(book["id"]))
+        except PreconditionFailed as ex:
+            return api.abort(HTTPStatus.PRECONDITION_FAILED, ex)
         except Exception as ex:
             return api.abort(HTTPStatus.BAD_REQUEST, ex)
 
@@ -64,9 +136,11 @@ class Book(Resource):
         """
         try:
             json, status_code = update_or_create_book_from_payload_json(
-                book_id, api.payload
+                book_id, api.payload, if_match()
             )
-            return json, status_code
+            return json, status_code, validators(*get_book_etag(json["id"]))
+        except PreconditionFailed as ex:
+            return api.abort(HTTPStatus.PRECONDITION_FAILED, ex)
         except Exception as ex:
             return api.abort(HTTPStatus.BAD_REQUEST, ex)
 
@@ -75,7 +149,9 @@ class Book(Resource):
         file: books_delete.yml
         """
         try:
-            delete_book(book_id)
+            delete_book(book_id, if_match())
             return "", HTTPStatus.NO_CONTENT
+        except PreconditionFailed as ex:
+            return api.abort(HTTPStatus.PRECONDITION_FAILED, ex)
         except Exception:
             api.abort(HTTPStatus.NOT_FOUND, f"Book with {book_id=} not found.")
@@ -0,0 +1,66 @@
+from datetime import datetime
+from http import HTTPStatus
+from typing import Callable, Optional
+
+from flask import request
+from werkzeug.http import http_date, quote_etag
+
+from apis.representations import BINARY_CODECS
+
+JSON_MIMETYPE = "application/json"
+
+
+def negotiated_mimetype() -> str:
+    """Return mimetype of the representation Flask-RESTX responds with: the first
+    supported one of `Accept` by quality, JSON by default.
+    """
+    accepted = sorted(request.accept_mimetypes, key=lambda item: item[1], reverse=True)
+    for mimetype, _quality in accepted:
+        if mimetype == JSON_MIMETYPE or mimetype in BINARY_CODECS:
+            return mimetype
+    return JSON_MIMETYPE
+
+
+def representation_etag(etag: str) -> str:
+    """Return `etag` of the data for the negotiated representation. Strong validators of
+    different representations must differ, so binary ones get a suffix, e.g.
+    `3-msgpack`. The JSON one is `etag` itself.
+    """
+    mimetype = negotiated_mimetype()
+    if mimetype == JSON_MIMETYPE:
+        return etag
+    return f"{etag}-{mimetype.rsplit('/', 1)[1]}"
+
+
+def validators(etag: str, last_modified: Optional[datetime] = None) -> dict:
+    """Return `ETag` and `Last-Modified` response headers."""
+    headers = {"ETag": quote_etag(representation_etag(etag))}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def is_not_modified(etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """Whether the client's copy is fresh according to `If-None-Match`, or to
+    `If-Modified-Since` if there is no `If-None-Match` header.
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(representation_etag(etag))
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def not_modified(etag: str, last_modified: Optional[datetime] = None) -> tuple:
+    """Return `304 Not Modified` response."""
+    return "", HTTPStatus.NOT_MODIFIED, validators(etag, last_modified)
+
+
+def if_match() -> Optional[Callable[[str], bool]]:
+    """Return predicate checking an ETag (of the negotiated representation) against
+    `If-Match` header, None if there's no such header.
+    """
+    if not request.if_match:
+        return None
+    etags = request.if_match
+    return lambda etag: etags.contains(representation_etag(etag))
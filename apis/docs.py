@@ -0,0 +1,123 @@
+"""
+Flasgger API docs (`/apidocs/`, `/apispec_1.json`), set up on the first request to them.
+
+Importing Flasgger and the `apis/authors_specs` dicts, and building the spec, are left
+out of the startup of the API: `LazyDocs` wraps the WSGI app and creates a separate
+Flask app with Flasgger and copies of the API routes when the docs are first requested;
+the spec is built once and cached. The Flask-RESTX spec (`/swagger.json`) is already
+built on its first request.
+
+In production the spec can be built ahead of time and served from a file instead
+(`BOOKS_SPEC_FILE=apispec.json`):
+
+python -m apis.docs apispec.json
+"""
+
+import importlib
+import sys
+import threading
+from typing import Callable, Optional
+
+from flask import Flask
+
+SPEC_FILE_ENV = "BOOKS_SPEC_FILE"
+SPEC_URL = "/apispec_1.json"
+# Paths of the routes added by Flasgger
+DOCS_PATHS = ("/apidocs", SPEC_URL, "/flasgger_static/", "/oauth2-redirect.html")
+SPECS_PACKAGE = "apis.authors_specs"
+
+
+def swag_from(specs_name: str, package: str = SPECS_PACKAGE) -> Callable:
+    """Like `flasgger.swag_from(specs_dict)`, but the specs dict is only imported from
+    `package` when the docs are set up.
+    :param specs_name: name of the specs dict in `package`.
+    :param package: module with the specs dict.
+    """
+
+    def decorator(function: Callable) -> Callable:
+        function.lazy_specs = (package, specs_name)
+        return function
+
+    return decorator
+
+
+def load_specs(app: Flask) -> None:
+    """Set `specs_dict` read by Flasgger on the view methods decorated with `swag_from`."""
+    for view in app.view_functions.values():
+        view_class = getattr(view, "view_class", None)
+        methods = getattr(view_class, "methods", None) or ()
+        for function in [view, *(getattr(view_class, m.lower()) for m in methods)]:
+            lazy_specs = getattr(function, "lazy_specs", None)
+            if lazy_specs is not None and not hasattr(function, "specs_dict"):
+                package, specs_name = lazy_specs
+                module = importlib.import_module(package)
+                function.specs_dict = getattr(module, specs_name)
+
+
+def create_docs_app(app: Flask, spec: Optional[bytes] = None) -> Flask:
+    """Return a Flask app serving Flasgger docs of `app`.
+    :param spec: pre-built spec to serve instead of building it.
+    """
+    from flasgger import Swagger
+
+    if spec is None:
+        load_specs(app)
+    docs_app = Flask(app.import_name)
+    docs_app.config.update(app.config)
+    # Flasgger builds the spec from the routes and views of the app it's attached to
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint != "static":
+            docs_app.add_url_rule(
+                rule.rule,
+                rule.endpoint,
+                app.view_functions[rule.endpoint],
+                methods=rule.methods,
+            )
+    Swagger(docs_app)
+    if spec is not None:
+        docs_app.view_functions["flasgger.apispec_1"] = lambda: docs_app.response_class(
+            spec, mimetype="application/json"
+        )
+    return docs_app
+
+
+def build_spec(app: Flask) -> bytes:
+    """Return Flasgger spec of `app` as JSON."""
+    with create_docs_app(app).test_client() as client:
+        return client.get(SPEC_URL).data
+
+
+class LazyDocs:
+    """WSGI middleware passing requests to the docs to an app created on the first of
+    them, and the rest to the wrapped app.
+    """
+
+    def __init__(self, app: Flask, spec_file: Optional[str] = None):
+        self.app = app
+        self.wsgi_app = app.wsgi_app
+        self.spec_file = spec_file
+        self._docs_app: Optional[Flask] = None
+        self._lock = threading.Lock()
+
+    @property
+    def docs_app(self) -> Flask:
+        with self._lock:
+            if self._docs_app is None:
+                spec = None
+                if self.spec_file:
+                    with open(self.spec_file, "rb") as file:
+                        spec = file.read()
+                self._docs_app = create_docs_app(self.app, spec)
+            return self._docs_app
+
+    def __call__(self, environ: dict, start_response: Callable):
+        if environ.get("PATH_INFO", "").startswith(DOCS_PATHS):
+            return self.docs_app.wsgi_app(environ, start_response)
+        return self.wsgi_app(environ, start_response)
+
+
+if __name__ == "__main__":
+    from books_app import app
+
+    with open(sys.argv[1], "wb") as file:
+        file.write(build_spec(app))
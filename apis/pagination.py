@@ -0,0 +1,97 @@
+from http import HTTPStatus
+from typing import Iterable, Iterator, Optional
+from urllib.parse import urlencode
+
+from flask import Response, request
+from flask_restx import abort
+
+from core.json_encoding import dumps
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+MAX_PAGE_SIZE = 1000
+
+
+def get_page_args() -> tuple[Optional[int], Optional[int]]:
+    """Return `(after_id, limit)` keyset pagination args from the query string.
+    Aborts with 400 Bad Request if any of them is not a valid number.
+    """
+    after_id = _int_arg("after_id")
+    limit = _int_arg("limit")
+
+    if limit is not None and not 0 < limit <= MAX_PAGE_SIZE:
+        abort(HTTPStatus.BAD_REQUEST, f"limit must be between 1 and {MAX_PAGE_SIZE}.")
+
+    return after_id, limit
+
+
+def get_offset_arg() -> int:
+    """Return `offset` pagination arg from the query string, 0 if there is none.
+    Aborts with 400 Bad Request if it is not a valid number.
+    """
+    offset = _int_arg("offset")
+    if offset is None:
+        return 0
+    if offset < 0:
+        abort(HTTPStatus.BAD_REQUEST, "offset must not be negative.")
+    return offset
+
+
+def next_page_headers(
+    page: list[dict], limit: Optional[int], offset: Optional[int] = None
+) -> dict:
+    """Return `Link` header pointing to the next page, if there could be one.
+    The next page starts after the last item's id, or at the next offset if `offset`
+    is passed (for lists not ordered by id).
+    """
+    if limit is None or len(page) < limit:
+        return {}
+
+    args = request.args.to_dict()
+    if offset is None:
+        args["after_id"] = page[-1]["id"]
+    else:
+        args["offset"] = offset + len(page)
+    return {"Link": f'<{request.base_url}?{urlencode(args)}>; rel="next"'}
+
+
+def wants_stream() -> bool:
+    """Whether the client asked for a streamed (NDJSON or chunked JSON) response."""
+    return _wants_ndjson() or request.args.get("stream", "") in ("1", "true")
+
+
+def stream_response(items: Iterable[dict]) -> Response:
+    """Stream `items` as NDJSON (`Accept: application/x-ndjson`) or as a chunked
+    JSON array (`?stream=1`), serializing them one by one.
+    """
+    if _wants_ndjson():
+        return Response(_ndjson_chunks(items), mimetype=NDJSON_MIMETYPE)
+    return Response(_json_array_chunks(items), mimetype="application/json")
+
+
+def _ndjson_chunks(items: Iterable[dict]) -> Iterator[str]:
+    for item in items:
+        yield dumps(item) + "\n"
+
+
+def _json_array_chunks(items: Iterable[dict]) -> Iterator[str]:
+    # Same bytes as `json.dumps(list(items))`, without building the list
+    separator = "["
+    for item in items:
+        yield separator + dumps(item)
+        separator = ", "
+    yield "[]\n" if separator == "[" else "]\n"
+
+
+def _wants_ndjson() -> bool:
+    best = request.accept_mimetypes.best_match(["application/json", NDJSON_MIMETYPE])
+    return best == NDJSON_MIMETYPE
+
+
+def _int_arg(name: str) -> Optional[int]:
+    value = request.args.get(name, None)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        abort(HTTPStatus.BAD_REQUEST, f"{name} must be a number, got {value!r}.")
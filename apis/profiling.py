@@ -0,0 +1,210 @@
+"""
+Opt-in request profiling for the Books API (`BOOKS_PROFILING=1 python books_app.py`).
+
+- `Server-Timing` header on every response with time spent per phase: `db_connect`
+  (pool checkout), `sql` (queries and fetching rows), `models` (building dataclasses
+  from rows), `dump` (serialization to dicts), `json` (encoding the response) and
+  `app` (routing, Flask-RESTX and everything else), plus the number of SQL statements.
+- `GET /_profiling/latency`: latency histograms by endpoint.
+- `POST /_profiling/profile?requests=N`: profile the next N requests with cProfile,
+  then `GET /_profiling/profile` returns the stats (`python -m pstats`, snakeviz, or
+  `flameprof profile.pstats > flame.svg`), or `?format=text` for a summary.
+"""
+
+import bisect
+import cProfile
+import io
+import marshal
+import pstats
+import threading
+from collections import defaultdict
+from http import HTTPStatus
+from typing import Optional
+
+from flask import Flask, Response, jsonify, request
+from flask_restx import Api
+
+from core.database import get_pool
+from core.profiling import TimedConnection, phase, start_recording, stop_recording
+
+ENABLE_ENV = "BOOKS_PROFILING"
+URL_PREFIX = "/_profiling"
+# Upper bounds of the latency histogram buckets, in milliseconds
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+# Phases in the order they are reported in `Server-Timing`
+PHASES = ("db_connect", "sql", "models", "dump", "json", "app")
+MAX_PROFILED_REQUESTS = 10_000
+
+
+class LatencyHistogram:
+    def __init__(self, bounds: tuple[float, ...] = LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def to_dict(self) -> dict:
+        """Return Prometheus-like histogram: cumulative count of values <= `le`."""
+        cumulative, buckets = 0, []
+        for bound, count in zip((*self.bounds, "+Inf"), self.buckets):
+            cumulative += count
+            buckets.append({"le": bound, "count": cumulative})
+        return {"count": self.count, "sum_ms": round(self.sum, 3), "buckets": buckets}
+
+
+class Sampler:
+    """Profiles a given number of requests with cProfile, one request at a time."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._busy = threading.Lock()
+        self._profile: Optional[cProfile.Profile] = None
+        self.requested = 0
+        self.sampled = 0
+
+    def start(self, requests: int) -> None:
+        with self._lock:
+            self._profile = cProfile.Profile()
+            self.requested, self.sampled = requests, 0
+
+    def is_done(self) -> bool:
+        return self._profile is not None and self.sampled >= self.requested
+
+    def enable(self) -> Optional[cProfile.Profile]:
+        """Start profiling the current request, if more samples are needed and no
+        other request is being profiled. Return the profile if it was enabled.
+        """
+        with self._lock:
+            if self._profile is None or self.is_done():
+                return None
+            if not self._busy.acquire(blocking=False):
+                return None
+            profile = self._profile
+        profile.enable()
+        return profile
+
+    def disable(self, profile: cProfile.Profile) -> None:
+        profile.disable()
+        with self._lock:
+            if profile is self._profile:
+                self.sampled += 1
+        self._busy.release()
+
+    def stats(self) -> pstats.Stats:
+        with self._lock:
+            return pstats.Stats(self._profile)
+
+
+def init_app(app: Flask, api: Api) -> None:
+    """Enable profiling of all requests to `app`, and the `/_profiling/` endpoints."""
+    histograms: dict[str, LatencyHistogram] = defaultdict(LatencyHistogram)
+    histograms_lock = threading.Lock()
+    sampler = Sampler()
+
+    # New connections record `sql` time and count statements
+    pool = get_pool()
+    pool.factory = TimedConnection
+    pool.close_all()
+
+    output_json = api.representations["application/json"]
+
+    def timed_output_json(data, code, headers=None):
+        with phase("json"):
+            return output_json(data, code, headers)
+
+    api.representations["application/json"] = timed_output_json
+
+    @app.before_request
+    def start_profiling():
+        if request.path.startswith(URL_PREFIX):
+            return
+        request.environ["profiling.profile"] = sampler.enable()
+        start_recording()
+
+    @app.after_request
+    def finish_profiling(response: Response) -> Response:
+        recorder = stop_recording()
+        if profile := request.environ.pop("profiling.profile", None):
+            sampler.disable(profile)
+        if recorder is None:
+            return response
+
+        total_ms = recorder.total() * 1000
+        rule = request.url_rule.rule if request.url_rule else "<unmatched>"
+        with histograms_lock:
+            histograms[f"{request.method} {rule}"].observe(total_ms)
+
+        metrics = []
+        for name in PHASES:
+            if name in recorder.durations:
+                metric = f"{name};dur={recorder.durations[name] * 1000:.3f}"
+                if name == "sql":
+                    statements = recorder.counts["sql_statements"]
+                    metric += f';desc="{statements} statements"'
+                metrics.append(metric)
+        metrics.append(f"total;dur={total_ms:.3f}")
+        response.headers["Server-Timing"] = ", ".join(metrics)
+        return response
+
+    @app.teardown_request
+    def stop_profiling(_exception=None):
+        # In case `after_request` didn't run because of an unhandled error
+        stop_recording()
+        if profile := request.environ.pop("profiling.profile", None):
+            sampler.disable(profile)
+
+    def latency():
+        with histograms_lock:
+            return jsonify(
+                {endpoint: item.to_dict() for endpoint, item in histograms.items()}
+            )
+
+    def start_profile():
+        try:
+            requests = int(request.args.get("requests", "100"))
+        except ValueError:
+            requests = 0
+        if not 0 < requests <= MAX_PROFILED_REQUESTS:
+            return (
+                jsonify(
+                    message=f"requests must be between 1 and {MAX_PROFILED_REQUESTS}."
+                ),
+                HTTPStatus.BAD_REQUEST,
+            )
+        sampler.start(requests)
+        return jsonify(requests=requests, sampled=0), HTTPStatus.ACCEPTED
+
+    def get_profile():
+        if sampler.requested == 0:
+            return jsonify(message="No profile was started."), HTTPStatus.NOT_FOUND
+        if not sampler.is_done():
+            return (
+                jsonify(requests=sampler.requested, sampled=sampler.sampled),
+                HTTPStatus.ACCEPTED,
+            )
+
+        stats = sampler.stats()
+        if request.args.get("format") == "text":
+            stream = io.StringIO()
+            stats.stream = stream
+            stats.sort_stats("cumulative").print_stats(50)
+            return Response(stream.getvalue(), mimetype="text/plain")
+        return Response(
+            marshal.dumps(stats.stats),
+            mimetype="application/octet-stream",
+            headers={"Content-Disposition": "attachment; filename=profile.pstats"},
+        )
+
+    app.add_url_rule(f"{URL_PREFIX}/latency", "profiling_latency", latency)
+    app.add_url_rule(
+        f"{URL_PREFIX}/profile",
+        "profiling_start_profile",
+        start_profile,
+        methods=["POST"],
+    )
+    app.add_url_rule(f"{URL_PREFIX}/profile", "profiling_get_profile", get_profile)
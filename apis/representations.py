@@ -0,0 +1,110 @@
+"""
+Representations of the Books API responses, chosen by the `Accept` header:
+
+- `application/json` (default): same text as Flask-RESTX's, encoded by `core.json_encoding`.
+- `application/msgpack` (or `application/x-msgpack`), if msgpack is installed, and
+  `application/cbor`, if cbor2 is installed: the same data as the JSON, in a compact
+  binary format which is faster to parse, for internal clients.
+
+Request bodies in these formats are decoded by `Request` (set as `app.request_class`),
+so `api.payload` is the same for a JSON body and a binary one.
+"""
+
+import json
+from typing import Any, Callable
+
+from flask import Request as FlaskRequest
+from flask import current_app, make_response
+from werkzeug.exceptions import BadRequest
+
+from core.json_encoding import default, dumps
+
+MSGPACK_MIMETYPES = ("application/msgpack", "application/x-msgpack")
+CBOR_MIMETYPE = "application/cbor"
+
+
+def output_json(data, code, headers=None):
+    """Same response as Flask-RESTX's `output_json`, encoded with `core.json_encoding`.
+    `json.dumps` is used when `RESTX_JSON` config (or indentation in debug mode) asks
+    for its options.
+    """
+    settings = current_app.config.get("RESTX_JSON", {})
+    if current_app.debug:
+        settings = {"indent": 4, **settings}
+
+    if settings:
+        dumped = json.dumps(data, **{"default": default, **settings})
+    else:
+        dumped = dumps(data)
+
+    # Always end with a new line, like Flask-RESTX
+    response = make_response(dumped + "\n", code)
+    response.headers.extend(headers or {})
+    response.vary.add("Accept")
+    return response
+
+
+def _msgpack_codec() -> tuple[Callable[[Any], bytes], Callable[[bytes], Any]]:
+    import msgpack
+
+    return lambda data: msgpack.packb(data, default=default), msgpack.unpackb
+
+
+def _cbor_codec() -> tuple[Callable[[Any], bytes], Callable[[bytes], Any]]:
+    import cbor2
+
+    # Dataclasses are encoded like in JSON, but dates are CBOR date-times
+    def cbor_default(encoder, value):
+        encoder.encode(default(value))
+
+    return lambda data: cbor2.dumps(data, default=cbor_default), cbor2.loads
+
+
+def get_binary_codecs() -> dict[str, tuple[Callable, Callable]]:
+    """Return `(encode, decode)` functions by mimetype of the installed binary formats."""
+    codecs = {}
+    for mimetypes, get_codec in (
+        (MSGPACK_MIMETYPES, _msgpack_codec),
+        ((CBOR_MIMETYPE,), _cbor_codec),
+    ):
+        try:
+            codec = get_codec()
+        except ImportError:
+            continue
+        for mimetype in mimetypes:
+            codecs[mimetype] = codec
+    return codecs
+
+
+BINARY_CODECS = get_binary_codecs()
+
+
+def binary_output(encode: Callable[[Any], bytes]) -> Callable:
+    """Return representation encoding the response data with `encode`."""
+
+    def output(data, code, headers=None):
+        response = make_response(encode(data), code)
+        response.headers.extend(headers or {})
+        response.vary.add("Accept")
+        return response
+
+    return output
+
+
+class Request(FlaskRequest):
+    """Request whose `get_json()`, and so `api.payload`, also decodes request bodies in
+    the binary formats of `BINARY_CODECS`, by their `Content-Type`.
+    """
+
+    def get_json(self, force: bool = False, silent: bool = False, cache: bool = True):
+        codec = BINARY_CODECS.get(self.mimetype)
+        if codec is None:
+            return super().get_json(force=force, silent=silent, cache=cache)
+
+        _encode, decode = codec
+        try:
+            return decode(self.get_data(cache=cache))
+        except Exception:
+            if silent:
+                return None
+            raise BadRequest(f"Request body is not valid {self.mimetype}.")
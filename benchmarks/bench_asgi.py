@@ -0,0 +1,126 @@
+"""
+Load test of the Books API served by the threaded WSGI server (`books_app.py`) versus
+the ASGI server (`books_asgi.py`): many concurrent clients, each sending requests one
+after another over its own keep-alive connection.
+
+python -m benchmarks.bench_asgi [clients] [requests per client]
+"""
+
+import asyncio
+import statistics
+import subprocess
+import sys
+import time
+
+from core.database import delete_db, init_db
+
+HOST = "127.0.0.1"
+PORT = 8765
+URL = "/api/books/1"
+
+SERVERS = {
+    "WSGI, thread per connection": [
+        sys.executable,
+        "-c",
+        "from books_app import app;"
+        f"app.run(host={HOST!r}, port={PORT}, threaded=True, debug=False)",
+    ],
+    "ASGI, uvicorn": [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "books_asgi:app",
+        f"--host={HOST}",
+        f"--port={PORT}",
+        "--no-access-log",
+        "--log-level=warning",
+    ],
+}
+
+
+async def wait_for_server(timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection(HOST, PORT)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+
+async def client(number: int, latencies: list[float], errors: list[str]) -> None:
+    request = f"GET {URL} HTTP/1.1\r\nHost: {HOST}\r\n\r\n".encode()
+    writer = None
+    try:
+        for _ in range(number):
+            started = time.perf_counter()
+            # Reconnect like a real client does if the server closed the connection
+            # (the WSGI development server doesn't keep connections alive)
+            if writer is None:
+                reader, writer = await asyncio.open_connection(HOST, PORT)
+
+            writer.write(request)
+            status_line = await reader.readline()
+            content_length, keep_alive = 0, True
+            while (line := await reader.readline()) not in (b"\r\n", b""):
+                name, _, value = line.decode().partition(":")
+                if name.lower() == "content-length":
+                    content_length = int(value)
+                elif name.lower() == "connection":
+                    keep_alive = value.strip().lower() != "close"
+            await reader.readexactly(content_length)
+            if b" 200 " not in status_line:
+                errors.append(status_line.decode().strip())
+            latencies.append(time.perf_counter() - started)
+
+            if not keep_alive:
+                writer.close()
+                writer = None
+    except (OSError, asyncio.IncompleteReadError) as ex:
+        errors.append(repr(ex))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+async def load(clients: int, number: int) -> None:
+    latencies, errors = [], []
+    await wait_for_server()
+    started = time.perf_counter()
+    await asyncio.gather(*(client(number, latencies, errors) for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+
+    if len(latencies) > 1:
+        quantiles = statistics.quantiles(latencies, n=100)
+        p50, p99 = quantiles[49] * 1000, quantiles[98] * 1000
+    else:
+        p50 = p99 = float("nan")
+    print(
+        f"    {len(latencies) / elapsed:>10,.0f} req/sec  p50 {p50:.1f} ms  "
+        f"p99 {p99:.1f} ms  errors {len(errors):,}"
+    )
+
+
+def run(clients: int, number: int) -> None:
+    for label, command in SERVERS.items():
+        print(f"{label}: {clients:,} keep-alive clients x {number} requests")
+        server = subprocess.Popen(
+            command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            asyncio.run(load(clients, number))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    delete_db()
+    init_db()
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 1000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 10,
+    )
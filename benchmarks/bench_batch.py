@@ -0,0 +1,46 @@
+"""
+Rows/sec of creating books one `POST /api/books/` at a time versus
+`POST /api/books/batch`.
+
+python -m benchmarks.bench_batch [batch size]
+"""
+
+import sys
+import time
+
+from books_app import app
+from core.database import delete_db, init_db
+
+
+def make_payload(size: int) -> list[dict]:
+    return [
+        {
+            "title": f"Book #{i}",
+            "author": {"last_name": f"Author{i % 1000}", "first_name": "Benchmark"},
+        }
+        for i in range(size)
+    ]
+
+
+def run(size: int) -> None:
+    client = app.test_client()
+    payload = make_payload(size)
+
+    single = payload[: max(1, size // 50)]
+    started = time.perf_counter()
+    for item in single:
+        client.post("/api/books/", json=item)
+    elapsed = time.perf_counter() - started
+    print(f"{'POST /api/books/':<32} {len(single) / elapsed:>12,.0f} rows/sec")
+
+    started = time.perf_counter()
+    response = client.post("/api/books/batch", json=payload)
+    elapsed = time.perf_counter() - started
+    assert response.status_code == 201, response.text
+    print(f"{'POST /api/books/batch':<32} {size / elapsed:>12,.0f} rows/sec")
+
+
+if __name__ == "__main__":
+    delete_db()
+    init_db()
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
@@ -0,0 +1,50 @@
+"""
+Payload size and encode/decode time of lists of books (as the Books API returns them)
+as JSON and in the binary formats of `apis.representations` (MessagePack, CBOR).
+
+python -m benchmarks.bench_binary [size ...]
+"""
+
+import json
+import sys
+import time
+from typing import Any, Callable
+
+from apis.representations import BINARY_CODECS, CBOR_MIMETYPE, MSGPACK_MIMETYPES
+from benchmarks.bench_serializer import make_books
+from core.json_encoding import dumps
+from core.models import dump_book
+
+
+def per_call(func: Callable[[], Any], number: int) -> float:
+    started = time.perf_counter()
+    for _ in range(number):
+        func()
+    return (time.perf_counter() - started) / number
+
+
+def run(size: int) -> None:
+    payload = [dump_book(book) for book in make_books(size)]
+    codecs = {"json": (lambda data: dumps(data).encode(), json.loads)}
+    for name, mimetype in (("msgpack", MSGPACK_MIMETYPES[0]), ("cbor", CBOR_MIMETYPE)):
+        if mimetype in BINARY_CODECS:
+            codecs[name] = BINARY_CODECS[mimetype]
+
+    number = max(1, 100_000 // size)
+    json_size = None
+    for name, (encode, decode) in codecs.items():
+        body = encode(payload)
+        assert decode(body) == payload
+        json_size = json_size or len(body)
+        encoding = per_call(lambda: encode(payload), number)
+        decoding = per_call(lambda: decode(body), number)
+        print(
+            f"{size:>9,} books, {name:<7} {len(body):>12,} bytes "
+            f"({len(body) / json_size:>4.0%})  encode {encoding * 1000:>8.3f} ms  "
+            f"decode {decoding * 1000:>8.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    for size in [int(arg) for arg in sys.argv[1:]] or [100, 1_000, 10_000]:
+        run(size)
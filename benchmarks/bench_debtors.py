@@ -0,0 +1,100 @@
+"""
+Latency of `books_alchemy.database.get_debtors()`: one grouped query versus the old
+query per overdue loan (N+1).
+
+python -m benchmarks.bench_debtors [loans]
+"""
+
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from books_alchemy import database
+from books_alchemy.database import GivenBook, Student, session
+
+STUDENTS = 10_000
+
+
+def get_debtors_n_plus_1() -> list[Student]:
+    """The old implementation: a query per overdue loan, duplicate students."""
+    given_books = session.execute(
+        select(GivenBook)
+        .filter_by(date_of_return=None)
+        .filter(GivenBook.date_of_issue < datetime.today() - timedelta(14))
+    )
+    students = []
+    for gb in given_books:
+        student_ = session.execute(
+            select(Student).filter_by(id=gb[0].student_id)
+        ).scalar_one()
+        students.append(student_)
+    return students
+
+
+def seed(loans: int) -> None:
+    rnd = random.Random(0)
+    session.execute(
+        Student.__table__.insert(),
+        [
+            {
+                "id": student_id,
+                "name": "Name",
+                "surname": f"Surname{student_id}",
+                "phone": "+7(921)000-00-00",
+                "email": f"student{student_id}@example.com",
+                "average_score": 4.0,
+                "scholarship": False,
+            }
+            for student_id in range(3, STUDENTS + 3)
+        ],
+    )
+    books = range(1, loans // STUDENTS + 2)
+    pairs = rnd.sample(
+        [
+            (book_id, student_id)
+            for book_id in books
+            for student_id in range(3, STUDENTS + 3)
+        ],
+        loans,
+    )
+    now = datetime.now()
+    rows = []
+    for book_id, student_id in pairs:
+        date_of_issue = now - timedelta(days=rnd.randint(0, 365))
+        # A tenth of the loans are not returned yet
+        returned = rnd.random() > 0.1
+        rows.append(
+            {
+                "book_id": book_id,
+                "student_id": student_id,
+                "date_of_issue": date_of_issue,
+                "date_of_return": (
+                    date_of_issue + timedelta(days=7) if returned else None
+                ),
+            }
+        )
+    session.execute(GivenBook.__table__.insert(), rows)
+    session.commit()
+
+
+def run(loans: int) -> None:
+    seed(loans)
+    for label, func in (
+        ("query per loan (N+1)", get_debtors_n_plus_1),
+        ("single grouped query", database.get_debtors),
+    ):
+        started = time.perf_counter()
+        debtors = func()
+        elapsed = time.perf_counter() - started
+        print(
+            f"{loans:,} loans, {label:<32} {elapsed * 1000:>10.1f} ms  ({len(debtors):,} rows)"
+        )
+        session.expire_all()
+
+
+if __name__ == "__main__":
+    database.initialize_db()
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,92 @@
+"""
+Dispatch throughput and end-to-end latency of `image_service` with an in-memory broker
+and a worker in this process, for several chunk sizes; and latency of a small batch
+submitted behind a bulk backfill, with and without the priority queues; and the same
+batch submitted twice, the second time served by the results cache.
+
+python -m benchmarks.bench_image_dispatch [images]
+"""
+
+import os
+import sys
+import time
+from unittest import mock
+
+os.environ.update(
+    IMAGE_SERVICE_BROKER_URL="memory://",
+    IMAGE_SERVICE_RESULT_BACKEND="cache+memory://",
+    IMAGE_SERVICE_TRACKER_URL="memory://",
+    IMAGE_SERVICE_PROCESSING_TIME="0,0",
+    IMAGE_SERVICE_RATE_LIMIT_IMAGES="1000000",
+)
+
+from celery.contrib.testing.worker import start_worker  # noqa: E402
+
+from image_service import app as image_app  # noqa: E402
+
+CHUNK_SIZES = (1, 10, 100)
+
+
+def submit(client, images: list[str], priority: str = None) -> str:
+    response = client.post(
+        "/process_images", json={"images": images, "priority": priority}
+    )
+    assert response.status_code == 202, response.json
+    return response.json["group_id"]
+
+
+def wait(group_id: str) -> None:
+    while image_app.tracker.get_statuses([group_id])[0]["status"] < 1.0:
+        time.sleep(0.001)
+
+
+def run_chunks(client, images: int) -> None:
+    for chunk_size in CHUNK_SIZES:
+        # New images every time, the processed ones are cached
+        batch = [f"chunk{chunk_size}-image{index}" for index in range(images)]
+        with mock.patch.object(image_app, "CHUNK_SIZE", chunk_size):
+            started = time.perf_counter()
+            group_id = submit(client, batch)
+            dispatched = time.perf_counter()
+            wait(group_id)
+            finished = time.perf_counter()
+        print(
+            f"{images:,} images, chunk {chunk_size:>3}: "
+            f"dispatch {images / (dispatched - started):>9,.0f} images/s, "
+            f"end-to-end {(finished - started) * 1000:>8.1f} ms"
+        )
+
+
+def run_priority(client, images: int) -> None:
+    for label, priority in (("same queue", "bulk"), ("interactive queue", None)):
+        backfill = [f"{priority}-backfill{index}" for index in range(images)]
+        with mock.patch.object(image_app, "CHUNK_SIZE", 1):
+            backfill_id = submit(client, backfill)
+            started = time.perf_counter()
+            wait(submit(client, [f"{priority}-image"], priority))
+            latency = time.perf_counter() - started
+            wait(backfill_id)
+        print(
+            f"1 image behind a {images:,}-image backfill, {label:<17}: "
+            f"{latency * 1000:>8.1f} ms"
+        )
+
+
+def run_resubmit(client, images: int) -> None:
+    batch = [f"resubmitted{index}" for index in range(images)]
+    for label in ("first submission", "resubmission"):
+        started = time.perf_counter()
+        wait(submit(client, batch))
+        elapsed = time.perf_counter() - started
+        print(f"{images:,} images, {label:<17}: {elapsed * 1000:>8.1f} ms")
+    stats = image_app.tracker.cache_stats()
+    print(f"results cache: {stats['size']:,} images, hit rate {stats['hit_rate']:.0%}")
+
+
+if __name__ == "__main__":
+    images = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    client = image_app.app.test_client()
+    with start_worker(image_app.celery, pool="solo", perform_ping_check=False):
+        run_chunks(client, images)
+        run_priority(client, images)
+        run_resubmit(client, images)
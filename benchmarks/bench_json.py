@@ -0,0 +1,42 @@
+"""
+Encoding lists of books (as the Books API returns them) to JSON with each available
+encoder of `core.json_encoding`, by payload size.
+
+python -m benchmarks.bench_json [size ...]
+"""
+
+import importlib.util
+import json
+import sys
+import time
+
+from benchmarks.bench_serializer import make_books
+from core.json_encoding import ENCODERS, get_dumps
+from core.models import dump_book
+
+
+def run(size: int) -> None:
+    payload = [dump_book(book) for book in make_books(size)]
+    expected = json.dumps(payload)
+    number = max(1, 100_000 // size)
+    baseline = None
+    for name in ENCODERS[1:]:
+        if importlib.util.find_spec(name) is None:
+            continue
+        dumps = get_dumps(name)
+        identical = "identical" if dumps(payload) == expected else "different"
+        started = time.perf_counter()
+        for _ in range(number):
+            dumps(payload)
+        per_payload = (time.perf_counter() - started) / number
+        baseline = baseline or per_payload
+        print(
+            f"{size:>9,} books, {name:<7} {per_payload * 1000:>10.3f} ms/payload "
+            f"{len(expected) / per_payload / 2**20:>8,.0f} MiB/s "
+            f"{baseline / per_payload:>6.1f}x  {identical}"
+        )
+
+
+if __name__ == "__main__":
+    for size in [int(arg) for arg in sys.argv[1:]] or [10, 100, 1_000, 10_000]:
+        run(size)
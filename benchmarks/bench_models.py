@@ -0,0 +1,108 @@
+"""
+Time and memory (`tracemalloc`) of loading a result set of books from sqlite as
+regular dataclasses with an `Author` per row (unpacking each row), versus the slotted
+`core.models` dataclasses built by `services.books` row factory, with one `Author`
+per author.
+
+python -m benchmarks.bench_models [rows ...]
+"""
+
+import sqlite3
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from services.books import _book_row_factory
+
+QUERY = """
+    SELECT books.id, books.title, authors.id, authors.last_name, authors.first_name, authors.middle_name
+    FROM books
+    JOIN authors ON books.author_id = authors.id
+    ORDER BY books.id
+"""
+
+
+@dataclass
+class RegularAuthor:
+    last_name: str
+    first_name: str
+    id: Optional[int] = None
+    middle_name: Optional[str] = None
+
+
+@dataclass
+class RegularBook:
+    id: int
+    title: str
+    author: RegularAuthor
+
+
+def make_db(rows: int) -> sqlite3.Connection:
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(
+        f"""
+        CREATE TABLE authors (
+            id INTEGER PRIMARY KEY, last_name TEXT, first_name TEXT, middle_name TEXT
+        );
+        CREATE TABLE books (id INTEGER PRIMARY KEY, title TEXT, author_id INTEGER);
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n LIMIT {max(1, rows // 100)})
+        INSERT INTO authors SELECT i, 'Last' || i, 'First' || i, NULL FROM n;
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n LIMIT {rows})
+        INSERT INTO books SELECT i, 'Book #' || i, i % {max(1, rows // 100)} + 1 FROM n;
+        """
+    )
+    return conn
+
+
+def load_regular(conn: sqlite3.Connection) -> list:
+    books = []
+    for row in conn.execute(QUERY):
+        book_id, title, author_id, last_name, first_name, middle_name = row
+        author = RegularAuthor(last_name, first_name, author_id, middle_name)
+        books.append(RegularBook(book_id, title, author))
+    return books
+
+
+def load_compact(conn: sqlite3.Connection) -> list:
+    cursor = conn.cursor()
+    cursor.row_factory = _book_row_factory()
+    cursor.execute(QUERY)
+    return cursor.fetchall()
+
+
+def measure_load(
+    name: str, load: Callable[[sqlite3.Connection], list], conn: sqlite3.Connection
+) -> tuple[float, int]:
+    started = time.perf_counter()
+    rows = len(load(conn))
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    books = load(conn)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del books
+
+    print(
+        f"{rows:>9,} rows, {name:<8} {elapsed * 1000:>10.1f} ms  "
+        f"retained {retained / 2**20:>8.1f} MiB  peak {peak / 2**20:>8.1f} MiB"
+    )
+    return elapsed, retained
+
+
+def run(rows: int) -> None:
+    conn = make_db(rows)
+    regular_time, regular_memory = measure_load("regular", load_regular, conn)
+    compact_time, compact_memory = measure_load("compact", load_compact, conn)
+    print(
+        f"{'':<20} {compact_time / regular_time:>10.2f}x  "
+        f"retained {compact_memory / regular_memory:>8.2f}x"
+    )
+    conn.close()
+
+
+if __name__ == "__main__":
+    for rows in [int(arg) for arg in sys.argv[1:]] or [10_000, 1_000_000]:
+        run(rows)
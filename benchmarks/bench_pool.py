@@ -0,0 +1,96 @@
+"""
+Requests/sec of the Books API with a connection per service call (the old behaviour)
+versus pooled, long-lived connections. The read-through cache is disabled for both, so
+every request reads the database.
+
+python -m benchmarks.bench_pool [requests]
+"""
+
+import sqlite3
+import sys
+from contextlib import closing, contextmanager
+from typing import Any, Callable
+from unittest import mock
+
+from benchmarks.common import measure
+from books_app import app
+from core.cache import MISSING, CacheBackend, get_cache, set_cache_backend
+from core.database import DATABASE_FILE_PATH, delete_db, init_db
+
+ENDPOINTS = ["/api/books/", "/api/books/1", "/api/authors/1"]
+
+
+class ConnectPerCall:
+    """Stand-in for `ConnectionPool`: a new connection for every `connection()` call."""
+
+    @contextmanager
+    def connection(self):
+        with closing(sqlite3.connect(DATABASE_FILE_PATH)) as conn, conn:
+            yield conn
+
+    def call_after_commit(self, callback: Callable[[], object]) -> None:
+        callback()
+
+    def call_after_rollback(self, callback: Callable[[], object]) -> None:
+        pass
+
+    def in_transaction(self) -> bool:
+        return False
+
+
+class NoCache(CacheBackend):
+    def get(self, key: str) -> Any:
+        return MISSING
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def delete(self, *keys: str) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+
+def connect_per_call():
+    # Every `get_connection()` goes through `get_pool()`
+    return mock.patch("core.database.get_pool", ConnectPerCall)
+
+
+def run(number: int) -> None:
+    client = app.test_client()
+    for url in ENDPOINTS:
+        with connect_per_call():
+            before = measure(
+                f"GET {url} (connect per call)", lambda: client.get(url), number
+            )
+        after = measure(f"GET {url} (pooled)", lambda: client.get(url), number)
+        print(f"{'':<48} {after / before:>12.2f}x")
+
+    payload = {"title": "Benchmark book", "author": {"id": 1}}
+    with connect_per_call():
+        before = measure(
+            "POST /api/books/ (connect per call)",
+            lambda: client.post("/api/books/", json=payload),
+            number,
+        )
+    after = measure(
+        "POST /api/books/ (pooled)",
+        lambda: client.post("/api/books/", json=payload),
+        number,
+    )
+    print(f"{'':<48} {after / before:>12.2f}x")
+
+
+if __name__ == "__main__":
+    delete_db()
+    init_db()
+    cache = get_cache()
+    set_cache_backend(NoCache())
+    try:
+        run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
+    finally:
+        set_cache_backend(cache)
@@ -0,0 +1,96 @@
+"""
+Query latency of searching books by title with the FTS5 index (`GET /api/books/?q=`)
+versus a `LIKE '%word%'` scan, as `books_alchemy` does with `ilike`.
+
+python -m benchmarks.bench_search [number of books]
+"""
+
+import random
+import sys
+import time
+
+from benchmarks.common import measure
+from core.database import delete_db, get_connection, init_db, insert_many
+from services.books import search_books
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "to", "vi", "zu", "pe", "dra", "gon"]
+
+
+def seed(size: int) -> list[str]:
+    """Insert `size` books with random titles, return the vocabulary of titles."""
+    rnd = random.Random(0)
+    words = sorted(
+        {
+            "".join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 4)))
+            for _ in range(20_000)
+        }
+    )
+    started = time.perf_counter()
+    with get_connection() as conn:
+        author_ids = insert_many(
+            conn,
+            "authors",
+            ("last_name", "first_name"),
+            [
+                (rnd.choice(words).title(), rnd.choice(words).title())
+                for _ in range(1000)
+            ],
+        )
+        insert_many(
+            conn,
+            "books",
+            ("author_id", "title"),
+            [
+                (
+                    rnd.choice(author_ids),
+                    " ".join(rnd.choice(words) for _ in range(rnd.randint(2, 6))),
+                )
+                for _ in range(size)
+            ],
+        )
+    elapsed = time.perf_counter() - started
+    print(f"Inserted {size:,} books (with FTS index) in {elapsed:.1f} s")
+    return words
+
+
+def like_search(word: str, limit: int) -> list:
+    with get_connection() as conn:
+        return conn.execute(
+            """
+            SELECT books.id, books.title, authors.id, authors.last_name, authors.first_name, authors.middle_name
+            FROM books
+            JOIN authors ON books.author_id = authors.id
+            WHERE books.title LIKE ?
+            ORDER BY books.id
+            LIMIT ?
+            """,
+            [f"%{word}%", limit],
+        ).fetchall()
+
+
+def run(size: int) -> None:
+    words = seed(size)
+    rnd = random.Random(1)
+    # Rare words make LIKE scan the whole table, frequent ones stop it early. FTS5
+    # ranks all of the matches, so it gets slower the more books match.
+    for label, word in (
+        ("rare word", rnd.choice(words)),
+        ("frequent prefix", SYLLABLES[0] + SYLLABLES[1]),
+    ):
+        number = 20
+        before = measure(
+            f"{label} {word!r}, LIKE scan", lambda: like_search(word, 50), number
+        )
+        after = measure(
+            f"{label} {word!r}, FTS5", lambda: search_books(word, 50), number
+        )
+        print(
+            f"{'':<48} {1000 / before:>9.2f} ms vs {1000 / after:.2f} ms"
+            f"  ({after / before:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    delete_db()
+    init_db()
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,42 @@
+"""
+Serializing lists of books with marshmallow `BookSchema().dump(many=True)` versus the
+compiled `core.models.dump_book`.
+
+python -m benchmarks.bench_serializer [size ...]
+"""
+
+import sys
+
+from benchmarks.common import measure
+from core.models import Author, Book, BookSchema, dump_book
+
+
+def make_books(size: int) -> list[Book]:
+    authors = [
+        Author(id=i, last_name=f"Last{i}", first_name=f"First{i}", middle_name=None)
+        for i in range(100)
+    ]
+    return [
+        Book(id=i, title=f"Book #{i}", author=authors[i % 100]) for i in range(size)
+    ]
+
+
+def run(size: int) -> None:
+    books = make_books(size)
+    assert BookSchema().dump(books, many=True) == [dump_book(book) for book in books]
+
+    number = max(1, 100_000 // size)
+    before = measure(
+        f"{size:,} books, marshmallow",
+        lambda: BookSchema().dump(books, many=True),
+        number,
+    )
+    after = measure(
+        f"{size:,} books, compiled", lambda: [dump_book(book) for book in books], number
+    )
+    print(f"{'':<48} {after / before:>12.2f}x")
+
+
+if __name__ == "__main__":
+    for size in [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]:
+        run(size)
@@ -0,0 +1,82 @@
+"""
+Students CSV import: the streaming chunked importer versus the old importer, which read
+the whole file and inserted all rows with one `bulk_insert_mappings`. Peak memory is
+measured with tracemalloc in a separate run, as it slows down the import.
+
+python -m benchmarks.bench_students_import [rows]
+"""
+
+import csv
+import io
+import sys
+import time
+import tracemalloc
+from typing import Callable
+
+from books_alchemy import database
+from books_alchemy.database import Student, session
+
+
+def make_csv(rows: int) -> bytes:
+    lines = (
+        f"Name;Surname{index};+7(921){index % 1000:03}-00-00;"
+        f"student{index}@example.com;{index % 50 / 10};{index % 2}\n"
+        for index in range(rows)
+    )
+    return "".join(lines).encode("utf-8")
+
+
+def import_old(data: io.BytesIO) -> None:
+    csv_data = data.read().decode("utf-8")
+    mappings = []
+    for row in csv.reader(io.StringIO(csv_data), delimiter=";"):
+        if len(row) == 6:
+            mappings.append(
+                {
+                    "name": row[0],
+                    "surname": row[1],
+                    "phone": row[2],
+                    "email": row[3],
+                    "average_score": float(row[4]),
+                    "scholarship": bool(row[5]),
+                }
+            )
+    session.bulk_insert_mappings(Student, mappings)
+    session.commit()
+
+
+def import_streaming(data: io.BytesIO) -> None:
+    lines = io.TextIOWrapper(data, encoding="utf-8", newline="")
+    database.import_students_csv(lines)
+
+
+def measure(func: Callable[[io.BytesIO], None], data: bytes, trace: bool) -> float:
+    database.initialize_db()
+    if trace:
+        tracemalloc.start()
+    started = time.perf_counter()
+    func(io.BytesIO(data))
+    elapsed = time.perf_counter() - started
+    if trace:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak
+    return elapsed
+
+
+def run(rows: int) -> None:
+    data = make_csv(rows)
+    print(f"{rows:,} rows, {len(data) / 2**20:.1f} MiB of CSV")
+    for label, func in (
+        ("read all, one bulk insert", import_old),
+        ("streaming, chunked", import_streaming),
+    ):
+        elapsed = measure(func, data, trace=False)
+        peak = measure(func, data, trace=True)
+        print(
+            f"{label:<28} {rows / elapsed:>10,.0f} rows/s  peak {peak / 2**20:>8.1f} MiB"
+        )
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
@@ -0,0 +1,13 @@
+import time
+from typing import Callable
+
+
+def measure(label: str, func: Callable[[], object], number: int) -> float:
+    """Call `func` `number` times, print and return calls per second."""
+    started = time.perf_counter()
+    for _ in range(number):
+        func()
+    elapsed = time.perf_counter() - started
+    rate = number / elapsed
+    print(f"{label:<48} {rate:>12,.0f} ops/sec  ({elapsed:.3f} s for {number:,})")
+    return rate
@@ -0,0 +1,487 @@
+"""
+Benchmark suite of the Books API: seeds the database with synthetic authors and books,
+then drives every endpoint of `apis/books.py` and `apis/authors.py` through the Flask
+test client and through a real WSGI server at several concurrency levels. Reports
+throughput, latency percentiles and memory, saves them to
+`benchmarks/results/<commit>.json` and compares them with the previous results.
+
+python -m benchmarks.suite [--books 10000] [--requests 500] [--concurrency 1,8,32]
+                           [--no-server] [--only books_get] [--baseline PATH]
+"""
+
+import argparse
+import http.client
+import itertools
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, NamedTuple, Optional
+
+from books_app import app
+from core.database import delete_db, get_connection, init_db, insert_many
+
+RESULTS_DIR = Path(__file__).parent / "results"
+HOST = "127.0.0.1"
+PORT = 8766
+SEED_BATCH_SIZE = 100_000
+BATCH_SIZE = 20
+# Requests of each endpoint sampled with tracemalloc
+MEMORY_SAMPLE = 20
+# Relative change reported as a regression: throughput down or p99 latency up
+THRESHOLD = 0.1
+WORDS = [
+    "python", "fluent", "clean", "code", "network", "programming", "agile",
+    "architecture", "data", "science", "learning", "deep", "systems", "design",
+]  # fmt: skip
+
+
+class Data(NamedTuple):
+    """Ids of the seeded rows, and iterators of the rows that may be deleted."""
+
+    author_ids: range
+    book_ids: range
+    spare_author_ids: Callable[[], int]
+    spare_book_ids: Callable[[], int]
+
+
+class Request(NamedTuple):
+    method: str
+    path: str
+    json: Optional[object] = None
+    headers: Optional[dict] = None
+
+
+class Scenario(NamedTuple):
+    name: str
+    make_request: Callable[[random.Random, Data], Request]
+
+
+def _book_payload(rnd: random.Random, data: Data) -> dict:
+    return {
+        "title": " ".join(rnd.sample(WORDS, 3)),
+        "author": {"id": rnd.choice(data.author_ids)},
+    }
+
+
+def _author_payload(rnd: random.Random) -> dict:
+    return {"last_name": rnd.choice(WORDS).title(), "first_name": "Benchmark"}
+
+
+# In the order they are run: reads, then writes, then deletes
+SCENARIOS = [
+    Scenario(
+        "books_list_page",
+        lambda rnd, data: Request(
+            "GET", f"/api/books/?after_id={rnd.choice(data.book_ids)}&limit=100"
+        ),
+    ),
+    Scenario(
+        "books_stream_ndjson",
+        lambda rnd, data: Request(
+            "GET",
+            f"/api/books/?after_id={rnd.choice(data.book_ids)}&limit=1000",
+            headers={"Accept": "application/x-ndjson"},
+        ),
+    ),
+    Scenario(
+        "books_search",
+        lambda rnd, data: Request("GET", f"/api/books/?q={rnd.choice(WORDS)}&limit=20"),
+    ),
+    Scenario(
+        "books_get",
+        lambda rnd, data: Request("GET", f"/api/books/{rnd.choice(data.book_ids)}"),
+    ),
+    Scenario(
+        "authors_list_page",
+        lambda rnd, data: Request(
+            "GET", f"/api/authors/?after_id={rnd.choice(data.author_ids)}&limit=100"
+        ),
+    ),
+    Scenario(
+        "authors_list_page_with_books",
+        lambda rnd, data: Request(
+            "GET",
+            f"/api/authors/?after_id={rnd.choice(data.author_ids)}&limit=100"
+            "&include=books",
+        ),
+    ),
+    Scenario(
+        "authors_get",
+        lambda rnd, data: Request("GET", f"/api/authors/{rnd.choice(data.author_ids)}"),
+    ),
+    Scenario(
+        "books_post",
+        lambda rnd, data: Request("POST", "/api/books/", _book_payload(rnd, data)),
+    ),
+    Scenario(
+        "books_batch_post",
+        lambda rnd, data: Request(
+            "POST",
+            "/api/books/batch",
+            [_book_payload(rnd, data) for _ in range(BATCH_SIZE)],
+        ),
+    ),
+    Scenario(
+        "books_patch",
+        lambda rnd, data: Request(
+            "PATCH",
+            f"/api/books/{rnd.choice(data.book_ids)}",
+            {"title": " ".join(rnd.sample(WORDS, 3))},
+        ),
+    ),
+    Scenario(
+        "books_put",
+        lambda rnd, data: Request(
+            "PUT", f"/api/books/{rnd.choice(data.book_ids)}", _book_payload(rnd, data)
+        ),
+    ),
+    Scenario(
+        "authors_post",
+        lambda rnd, data: Request("POST", "/api/authors/", _author_payload(rnd)),
+    ),
+    Scenario(
+        "authors_batch_post",
+        lambda rnd, data: Request(
+            "POST",
+            "/api/authors/batch",
+            [_author_payload(rnd) for _ in range(BATCH_SIZE)],
+        ),
+    ),
+    Scenario(
+        "books_delete",
+        lambda rnd, data: Request("DELETE", f"/api/books/{data.spare_book_ids()}"),
+    ),
+    Scenario(
+        "authors_delete",
+        lambda rnd, data: Request("DELETE", f"/api/authors/{data.spare_author_ids()}"),
+    ),
+]
+
+
+def seed(books: int, authors: int, spare: int, rnd: random.Random) -> Data:
+    """Insert `authors` authors and `books` books, and `spare` more of each to be
+    deleted. Spare books belong to the seeded authors, spare authors have no books.
+    """
+    started = time.perf_counter()
+    with get_connection() as conn:
+        author_ids = _insert_authors(conn, authors, rnd)
+        spare_author_ids = _insert_authors(conn, spare, rnd)
+
+    book_ids = range(0)
+    for start in range(0, books + spare, SEED_BATCH_SIZE):
+        with get_connection() as conn:
+            ids = insert_many(
+                conn,
+                "books",
+                ("author_id", "title"),
+                [
+                    (rnd.choice(author_ids), " ".join(rnd.sample(WORDS, 3)))
+                    for _ in range(min(SEED_BATCH_SIZE, books + spare - start))
+                ],
+            )
+        book_ids = range(book_ids.start or ids.start, ids.stop)
+    print(
+        f"Seeded {authors:,} authors and {books:,} books (+{spare:,} spare) "
+        f"in {time.perf_counter() - started:.1f} s"
+    )
+    return Data(
+        author_ids=author_ids,
+        book_ids=book_ids[:books],
+        spare_author_ids=itertools.count(spare_author_ids.start).__next__,
+        spare_book_ids=itertools.count(book_ids[books:].start).__next__,
+    )
+
+
+def _insert_authors(conn: sqlite3.Connection, number: int, rnd: random.Random) -> range:
+    return insert_many(
+        conn,
+        "authors",
+        ("last_name", "first_name"),
+        [(rnd.choice(WORDS).title(), f"Author{index}") for index in range(number)],
+    )
+
+
+def _summary(latencies: list[float], errors: int, elapsed: float) -> dict:
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else []
+    percentile = (lambda p: quantiles[p - 1] * 1000) if quantiles else lambda p: 0.0
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(50),
+        "p90_ms": percentile(90),
+        "p99_ms": percentile(99),
+        "max_ms": max(latencies, default=0.0) * 1000,
+    }
+
+
+def run_test_client(scenario: Scenario, data: Data, number: int, seed: int) -> dict:
+    """Send `number` requests one after another through the Flask test client."""
+    client = app.test_client()
+    rnd = random.Random(seed)
+
+    def send() -> bool:
+        request = scenario.make_request(rnd, data)
+        response = client.open(
+            request.path,
+            method=request.method,
+            json=request.json,
+            headers=request.headers,
+        )
+        response.get_data()
+        return response.status_code < 400
+
+    latencies, errors = [], 0
+    started = time.perf_counter()
+    for _ in range(number):
+        request_started = time.perf_counter()
+        errors += not send()
+        latencies.append(time.perf_counter() - request_started)
+    result = _summary(latencies, errors, time.perf_counter() - started)
+
+    tracemalloc.start()
+    for _ in range(MEMORY_SAMPLE):
+        send()
+    result["peak_kib"] = tracemalloc.get_traced_memory()[1] / 1024
+    tracemalloc.stop()
+    return result
+
+
+def run_server(
+    scenario: Scenario, data: Data, number: int, concurrency: int, seed: int
+) -> dict:
+    """Send `number` requests over `concurrency` keep-alive connections to the server."""
+    lock = threading.Lock()
+    rnd = random.Random(seed)
+    remaining = iter(range(number))
+    latencies, errors = [], []
+
+    def worker() -> None:
+        connection = http.client.HTTPConnection(HOST, PORT, timeout=60)
+        try:
+            while True:
+                with lock:
+                    if next(remaining, None) is None:
+                        return
+                    request = scenario.make_request(rnd, data)
+                body = json.dumps(request.json) if request.json is not None else None
+                headers = {
+                    "Content-Type": "application/json",
+                    **(request.headers or {}),
+                }
+                started = time.perf_counter()
+                try:
+                    connection.request(request.method, request.path, body, headers)
+                    response = connection.getresponse()
+                    response.read()
+                    failed = response.status >= 400
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+                    failed = True
+                latency = time.perf_counter() - started
+                with lock:
+                    latencies.append(latency)
+                    errors.append(failed)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return _summary(latencies, sum(errors), time.perf_counter() - started)
+
+
+def start_server() -> subprocess.Popen:
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-c",
+            "from books_app import app;"
+            f"app.run(host={HOST!r}, port={PORT}, threaded=True, debug=False)",
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            http.client.HTTPConnection(HOST, PORT, timeout=1).connect()
+            return server
+        except OSError:
+            if time.monotonic() > deadline or server.poll() is not None:
+                server.kill()
+                raise RuntimeError("The server didn't start")
+            time.sleep(0.1)
+
+
+def peak_rss_kib(pid: int) -> Optional[int]:
+    """Return the peak resident memory of a process (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def git_commit() -> str:
+    def git(*args: str) -> str:
+        return subprocess.run(
+            ["git", *args],
+            capture_output=True,
+            text=True,
+            check=False,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+
+    commit = git("rev-parse", "--short", "HEAD") or "unknown"
+    dirty = git("status", "--porcelain", "--untracked-files=no")
+    return f"{commit}-dirty" if dirty else commit
+
+
+def print_result(label: str, result: dict) -> None:
+    memory = f"  peak {result['peak_kib']:>8,.0f} KiB" if "peak_kib" in result else ""
+    print(
+        f"{label:<44} {result['rps']:>9,.0f} req/s  p50 {result['p50_ms']:>7.2f}  "
+        f"p90 {result['p90_ms']:>7.2f}  p99 {result['p99_ms']:>7.2f} ms  "
+        f"errors {result['errors']:>4}{memory}"
+    )
+
+
+def find_baseline(current: dict) -> Optional[Path]:
+    """Return the latest results of another commit with the same parameters."""
+    candidates = []
+    for path in RESULTS_DIR.glob("*.json"):
+        try:
+            results = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        if (
+            results.get("commit") != current["commit"]
+            and results.get("params") == current["params"]
+        ):
+            candidates.append((results["date"], path))
+    return max(candidates)[1] if candidates else None
+
+
+def compare(current: dict, baseline: dict, threshold: float = THRESHOLD) -> int:
+    """Print changes against `baseline`, return the number of regressions."""
+    print(f"\nCompared with {baseline['commit']} ({baseline['date']}):")
+    regressions = 0
+    for key, result in current["results"].items():
+        before = baseline["results"].get(key)
+        if before is None or not before["rps"] or not before["p99_ms"]:
+            continue
+        rps_change = result["rps"] / before["rps"] - 1
+        p99_change = result["p99_ms"] / before["p99_ms"] - 1
+        regressed = rps_change < -threshold or p99_change > threshold * 2
+        regressions += regressed
+        print(
+            f"{key:<44} req/s {rps_change:>+7.1%}  p99 {p99_change:>+7.1%}"
+            f"{'  REGRESSION' if regressed else ''}"
+        )
+    return regressions
+
+
+def run(args: argparse.Namespace) -> dict:
+    scenarios = [
+        scenario
+        for scenario in SCENARIOS
+        if not args.only or scenario.name in args.only
+    ]
+    runs = 1 + (0 if args.no_server else len(args.concurrency))
+    rnd = random.Random(args.seed)
+    delete_db()
+    init_db()
+    # Every run of a delete scenario deletes its own rows
+    spare = (args.requests + MEMORY_SAMPLE) * runs
+    data = seed(args.books, args.authors or max(args.books // 10, 1), spare, rnd)
+
+    results = {}
+    for scenario in scenarios:
+        key = f"{scenario.name} test_client"
+        results[key] = run_test_client(scenario, data, args.requests, args.seed)
+        print_result(key, results[key])
+
+    server_rss = None
+    if not args.no_server:
+        server = start_server()
+        try:
+            for concurrency in args.concurrency:
+                for scenario in scenarios:
+                    key = f"{scenario.name} server c={concurrency}"
+                    results[key] = run_server(
+                        scenario, data, args.requests, concurrency, args.seed
+                    )
+                    print_result(key, results[key])
+            server_rss = peak_rss_kib(server.pid)
+        finally:
+            server.terminate()
+            server.wait()
+
+    return {
+        "commit": git_commit(),
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "cpus": os.cpu_count(),
+        "params": {
+            "books": args.books,
+            "authors": args.authors,
+            "requests": args.requests,
+            "concurrency": [] if args.no_server else args.concurrency,
+            "seed": args.seed,
+        },
+        "server_peak_rss_kib": server_rss,
+        "results": results,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--books", type=int, default=10_000)
+    parser.add_argument("--authors", type=int, help="default: a tenth of books")
+    parser.add_argument("--requests", type=int, default=500, help="per endpoint")
+    parser.add_argument(
+        "--concurrency",
+        type=lambda value: [int(level) for level in value.split(",")],
+        default=[1, 8, 32],
+    )
+    parser.add_argument("--no-server", action="store_true")
+    parser.add_argument("--only", nargs="+", help="names of scenarios to run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", type=Path, help="results file to compare with")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    current = run(args)
+    if not args.no_save:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        path = RESULTS_DIR / f"{current['commit']}.json"
+        path.write_text(json.dumps(current, indent=2))
+        print(f"\nSaved to {path}")
+
+    baseline_path = args.baseline or find_baseline(current)
+    if baseline_path is None:
+        return 0
+    regressions = compare(current, json.loads(baseline_path.read_text()))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
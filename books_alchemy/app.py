@@ -1,26 +1,35 @@
 from http import HTTPStatus
 
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, url_for
 from sqlalchemy.exc import NoResultFound
 
 from books_alchemy.database import (
     get_all_books,
-    get_average_books_given_this_month,
     get_books_by_name,
     get_debtors,
-    get_most_popular_book,
     get_remaining_authors_books,
-    get_top10_readers,
     get_unread_books,
     give_book,
     initialize_db,
     return_book,
-    bulk_add_students_from_csv,
+    session,
+)
+from books_alchemy.jobs import jobs, save_upload
+from books_alchemy.statistics import (
+    get_average_books_given_this_month,
+    get_most_popular_book,
+    get_top10_readers,
 )
 
 app = Flask(__name__)
 
 
+@app.teardown_appcontext
+def remove_session(exception=None):
+    """Close the request's session and return its connection to the pool."""
+    session.remove()
+
+
 @app.route("/books/", methods=["GET"])
 def get_all_books_route():
     """Получить все книги в библиотеке (GET)
@@ -83,6 +92,8 @@ def get_most_popular_book_route():
     curl -X GET http://127.0.0.1:5000/books/most_popular/
     """
     book = get_most_popular_book()
+    if book is None:
+        return {"message": "No books were given yet."}, HTTPStatus.NOT_FOUND
     return book.to_json(), HTTPStatus.OK
 
 
@@ -105,8 +116,11 @@ def get_debtors_list():
     curl -X GET http://127.0.0.1:5000/debtors/
     """
     debtors = []
-    for student in get_debtors():
-        debtors.append(student.to_json())
+    for student, overdue_count, oldest_date_of_issue in get_debtors():
+        debtor = student.to_json()
+        debtor["overdue_count"] = overdue_count
+        debtor["oldest_date_of_issue"] = oldest_date_of_issue
+        debtors.append(debtor)
     return jsonify(debtors), HTTPStatus.OK
 
 
@@ -139,8 +153,10 @@ def get_remaining_authors_books_count(author_id):
 @app.route("/students/csv/", methods=["POST"])
 def bulk_add_students_route():
     """
-    Осуществляет массовое добавление студентов из CSV файла.
-    Файл должен загружаться как multipart/form-data.
+    Осуществляет массовое добавление студентов из CSV файла в фоновой задаче.
+    Файл должен загружаться как multipart/form-data, строки вида
+    `Иван;Сидоров;+7(921)123-45-67;ivan@sidorov.ru;3.9;0`.
+    Некорректные строки пропускаются и попадают в отчёт, который возвращает `/status/<job_id>`.
 
     Пример использования:
         curl -F file=@./students.csv http://127.0.0.1:5000/students/csv/
@@ -148,10 +164,35 @@ def bulk_add_students_route():
     if "file" not in request.files:
         return {"message": "Error: no file uploaded."}, HTTPStatus.BAD_REQUEST
 
-    file = request.files["file"]
-    csv_data = file.stream.read().decode("utf-8")
-    bulk_add_students_from_csv(csv_data)
-    return "OK", HTTPStatus.CREATED
+    job_id = jobs.submit("import_students", save_upload(request.files["file"]))
+    return _accepted(job_id)
+
+
+@app.route("/statistics/rebuild/", methods=["POST"])
+def rebuild_statistics_route():
+    """
+    Пересчитать статистику выдачи книг в фоновой задаче.
+    curl -X POST http://127.0.0.1:5000/statistics/rebuild/
+    """
+    return _accepted(jobs.submit("rebuild_statistics"))
+
+
+@app.route("/status/<job_id>", methods=["GET"])
+def get_job_status(job_id: str):
+    """
+    Получить состояние фоновой задачи: PENDING, PROGRESS, SUCCESS или FAILURE,
+    долю выполненной работы (`progress`) и результат (`result`) или ошибку (`error`).
+    curl -X GET http://127.0.0.1:5000/status/<job_id>
+    """
+    status = jobs.get_status(job_id)
+    if status is None:
+        return {"error": "Invalid job_id"}, HTTPStatus.NOT_FOUND
+    return status, HTTPStatus.OK
+
+
+def _accepted(job_id: str):
+    location = url_for("get_job_status", job_id=job_id)
+    return {"job_id": job_id}, HTTPStatus.ACCEPTED, {"Location": location}
 
 
 if __name__ == "__main__":
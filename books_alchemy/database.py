@@ -2,7 +2,7 @@ import csv
 import os.path
 import re
 from datetime import datetime, timedelta
-from typing import Tuple
+from typing import Callable, Iterable, Optional, Tuple
 
 from sqlalchemy import (
     Boolean,
@@ -10,11 +10,11 @@ from sqlalchemy import (
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
     String,
     create_engine,
     event,
-    extract,
     func,
     select,
 )
@@ -25,19 +25,55 @@ from sqlalchemy.orm import (
     backref,
     mapped_column,
     relationship,
+    scoped_session,
     sessionmaker,
 )
 from io import StringIO
 
-# For in-memory database, use this config:
-# engine = create_engine("sqlite+pysqlite:///:memory:", echo=True)
+# Engine settings can be overridden with environment variables, e.g. for in-memory
+# database: BOOKS_ALCHEMY_DATABASE_URL="sqlite+pysqlite:///:memory:"
+DATABASE_URL = os.environ.get(
+    "BOOKS_ALCHEMY_DATABASE_URL", "sqlite:///books_alchemy.db"
+)
+ECHO = os.environ.get("BOOKS_ALCHEMY_ECHO", "") in ("1", "true")
+POOL_SIZE = int(os.environ.get("BOOKS_ALCHEMY_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.environ.get("BOOKS_ALCHEMY_MAX_OVERFLOW", "10"))
+# Milliseconds a connection waits for another one's write lock before failing
+BUSY_TIMEOUT = int(os.environ.get("BOOKS_ALCHEMY_BUSY_TIMEOUT", "5000"))
+
+engine = create_engine(
+    DATABASE_URL,
+    echo=ECHO,
+    **(
+        {"pool_size": POOL_SIZE, "max_overflow": MAX_OVERFLOW}
+        if ":memory:" not in DATABASE_URL
+        else {}
+    ),
+)
+
+
+@event.listens_for(engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers work while a writer holds the lock
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode = WAL")
+    cursor.execute("PRAGMA synchronous = NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT}")
+    cursor.close()
+
+
+# Validation of imported students
+PHONE_RE = re.compile(r"^\+7\(9\d\d\)\d\d\d-\d\d-\d\d$")
+EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+SCHOLARSHIP_VALUES = {"0": False, "1": True, "false": False, "true": True}
+CSV_IMPORT_CHUNK_SIZE = int(os.environ.get("BOOKS_ALCHEMY_CSV_CHUNK_SIZE", "5000"))
+MAX_IMPORT_ERRORS = 1000
 
-DB_FILENAME = "books.db"
-if os.path.exists(DB_FILENAME):
-    os.remove(DB_FILENAME)
-engine = create_engine(f"sqlite:///{DB_FILENAME}", echo=True)
 Session = sessionmaker(bind=engine)
-session = Session()
+# Session of the current thread. Web requests call `session.remove()` on teardown
+# (see `app.py`), so every request starts with a new session and returns its
+# connection to the pool.
+session = scoped_session(Session)
 
 
 class Base(DeclarativeBase):
@@ -52,7 +88,7 @@ class Book(Base):
     count: Mapped[int] = mapped_column(Integer, default=1)
     release_date: Mapped["Date"] = mapped_column(Date, nullable=False)
     author_id: Mapped[int] = mapped_column(
-        Integer, ForeignKey("authors.id"), nullable=False
+        Integer, ForeignKey("authors.id"), nullable=False, index=True
     )
     author = relationship(
         "Author", backref=backref("books", cascade="all, delete-orphan", lazy="select")
@@ -83,7 +119,7 @@ class Student(Base):
     surname: Mapped[str] = mapped_column(String, nullable=False)
     phone: Mapped[str] = mapped_column(String, nullable=False)
     email: Mapped[str] = mapped_column(String, nullable=False)
-    average_score: Mapped["Float"] = mapped_column(Float, nullable=False)
+    average_score: Mapped["Float"] = mapped_column(Float, nullable=False, index=True)
     scholarship: Mapped["Boolean"] = mapped_column(Boolean, nullable=False)
 
     books = relationship("GivenBook", back_populates="student")
@@ -108,11 +144,27 @@ class Student(Base):
 
 class GivenBook(Base):
     __tablename__ = "receiving_books"
+    __table_args__ = (
+        # Overdue books: `date_of_return IS NULL AND date_of_issue < ?` is a range scan
+        # of this index, and `student_id` makes it covering for `get_debtors()`
+        Index(
+            "receiving_books_date_of_return_date_of_issue",
+            "date_of_return",
+            "date_of_issue",
+            "student_id",
+        ),
+        # Loans of a period: `date_of_issue >= ? AND date_of_issue < ?` is a range scan
+        # of this index, and `student_id` makes it covering for the reports by student
+        Index(
+            "receiving_books_date_of_issue_student_id", "date_of_issue", "student_id"
+        ),
+    )
     book_id: Mapped[int] = mapped_column(
         Integer, ForeignKey("books.id"), primary_key=True
     )
+    # The primary key starts with `book_id`, so loans of a student need their own index
     student_id: Mapped[int] = mapped_column(
-        Integer, ForeignKey("students.id"), primary_key=True
+        Integer, ForeignKey("students.id"), primary_key=True, index=True
     )
     date_of_issue: Mapped["DateTime"] = mapped_column(DateTime, nullable=False)
     date_of_return: Mapped["DateTime"] = mapped_column(
@@ -136,6 +188,29 @@ class GivenBook(Base):
         return (datetime.now() - self.date_of_issue).days
 
 
+def create_indexes() -> None:
+    """Create indexes of the models missing in an existing database (`create_all()` only
+    creates indexes of new tables).
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+
+def month_range(day: datetime) -> Tuple[datetime, datetime]:
+    """Полуинтервал [начало месяца, начало следующего месяца) для месяца дня `day`.
+
+    Сравнение столбца с границами использует индекс, в отличие от `extract()` от столбца.
+    """
+    start = datetime(day.year, day.month, 1)
+    return start, datetime(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def year_range(day: datetime) -> Tuple[datetime, datetime]:
+    """Полуинтервал [начало года, начало следующего года) для года дня `day`."""
+    return datetime(day.year, 1, 1), datetime(day.year + 1, 1, 1)
+
+
 def get_all_books():
     return session.query(Book).all()
 
@@ -144,20 +219,27 @@ def get_books_by_name(name: str):
     return session.query(Book).filter(Book.name.ilike(f"%{name}%"))
 
 
-def get_debtors() -> list[Student]:
-    """Получить список должников, которые держат книги у себя более 14 дней."""
-    given_books = session.execute(
-        select(GivenBook)
-        .filter_by(date_of_return=None)
+def get_debtors() -> list[Tuple[Student, int, datetime]]:
+    """Получить список должников, которые держат книги у себя более 14 дней.
+    :return: Список кортежей вида (студент, кол-во просроченных книг, дата выдачи самой
+    старой из них), начиная с самых давних должников. Каждый студент встречается один раз.
+    """
+    overdue = (
+        select(
+            GivenBook.student_id,
+            func.count().label("overdue_count"),
+            func.min(GivenBook.date_of_issue).label("oldest_date_of_issue"),
+        )
+        .filter(GivenBook.date_of_return.is_(None))
         .filter(GivenBook.date_of_issue < datetime.today() - timedelta(14))
+        .group_by(GivenBook.student_id)
+        .subquery()
     )
-    students = []
-    for gb in given_books:
-        student_ = session.execute(
-            select(Student).filter_by(id=gb[0].student_id)
-        ).scalar_one()
-        students.append(student_)
-    return students
+    return session.execute(
+        select(Student, overdue.c.overdue_count, overdue.c.oldest_date_of_issue)
+        .join(overdue, Student.id == overdue.c.student_id)
+        .order_by(overdue.c.oldest_date_of_issue, Student.id)
+    ).all()
 
 
 def give_book(student_id: int, book_id: int) -> GivenBook:
@@ -196,13 +278,12 @@ def get_remaining_authors_books(author_id: int) -> int:
 def get_average_books_given_this_month() -> float:
     """Получить среднее количество книг, которые студенты брали в этом месяце."""
     students_qty = session.query(Student).count()
-    # Count books given this month
-    given_book_count = (
-        session.query(GivenBook)
-        .filter(extract("year", GivenBook.date_of_issue) == datetime.now().year)
-        .filter(extract("month", GivenBook.date_of_issue) == datetime.now().month)
-        .count()
-    )
+    start, end = month_range(datetime.now())
+    given_book_count = session.execute(
+        select(func.count())
+        .select_from(GivenBook)
+        .filter(GivenBook.date_of_issue >= start, GivenBook.date_of_issue < end)
+    ).scalar()
     return given_book_count / students_qty
 
 
@@ -211,14 +292,19 @@ def get_top10_readers() -> list[Tuple[Student, int]]:
     :return: Список кортежей вида (студент, кол-во прочитанных книг) за текущий год, по убыванию
     количества прочитанных книг.
     """
-    return (
-        session.query(Student, func.count(GivenBook.book_id))
-        .filter(extract("year", GivenBook.date_of_issue) == datetime.now().year)
-        .outerjoin(GivenBook)
-        .group_by(Student.id)
-        .order_by(func.count(GivenBook.book_id).desc())
-        .limit(10)
+    start, end = year_range(datetime.now())
+    readers = (
+        select(GivenBook.student_id, func.count().label("given_count"))
+        .filter(GivenBook.date_of_issue >= start, GivenBook.date_of_issue < end)
+        .group_by(GivenBook.student_id)
+        .subquery()
     )
+    return session.execute(
+        select(Student, readers.c.given_count)
+        .join(readers, Student.id == readers.c.student_id)
+        .order_by(readers.c.given_count.desc(), Student.id)
+        .limit(10)
+    ).all()
 
 
 def get_most_popular_book() -> Book:
@@ -241,19 +327,11 @@ def get_most_popular_book() -> Book:
 
 def get_unread_books(student_id: int) -> list:
     """Получить список книг, которые студент не читал, при этом другие книги этого автора студент уже брал."""
-    # Подзапрос: авторы которых брал студент
-    taken_authors_query = (
-        session.query(Author.id)
-        .outerjoin(Book)
-        .outerjoin(GivenBook)
-        .filter(GivenBook.student_id == student_id)
-        .subquery()
-    )
-    taken_books_query = (
-        session.query(GivenBook.book_id)
-        .filter(GivenBook.student_id == student_id)
-        .subquery()
+    # Подзапросы: книги, которые брал студент, и их авторы
+    taken_books_query = select(GivenBook.book_id).filter(
+        GivenBook.student_id == student_id
     )
+    taken_authors_query = select(Book.author_id).filter(Book.id.in_(taken_books_query))
     # Запрос: книги которые студент не брал, но с авторами, которых брал
     books = (
         session.query(Book)
@@ -264,29 +342,100 @@ def get_unread_books(student_id: int) -> list:
     return books
 
 
-def bulk_add_students_from_csv(csv_data: str) -> None:
+def _parse_student_row(row: list[str]) -> dict:
+    """
+    Проверить строку CSV со студентом и преобразовать её в словарь для вставки.
+    :raises ValueError: если строка не прошла проверку.
+    """
+    if len(row) != 6:
+        raise ValueError(f"Expected 6 columns, got {len(row)}")
+    name, surname, phone, email, average_score, scholarship = row
+    if not name or not surname:
+        raise ValueError("Name and surname are required")
+    if not PHONE_RE.match(phone):
+        raise ValueError(f"Wrong phone format: {phone}")
+    if not EMAIL_RE.match(email):
+        raise ValueError(f"Wrong email format: {email}")
+    try:
+        score = float(average_score)
+    except ValueError:
+        score = -1.0
+    if not 0 <= score <= 5:
+        raise ValueError(f"Wrong average score: {average_score}")
+    if scholarship not in SCHOLARSHIP_VALUES:
+        raise ValueError(f"Wrong scholarship value: {scholarship}")
+    return {
+        "name": name,
+        "surname": surname,
+        "phone": phone,
+        "email": email,
+        "average_score": score,
+        "scholarship": SCHOLARSHIP_VALUES[scholarship],
+    }
+
+
+def import_students_csv(
+    lines: Iterable[str],
+    chunk_size: int = CSV_IMPORT_CHUNK_SIZE,
+    on_chunk: Optional[Callable[[int, int], None]] = None,
+) -> dict:
+    """
+    Осуществляет массовое добавление студентов из CSV с разделителем ;, читая его построчно.
+    Строки вставляются пачками по `chunk_size`, каждая пачка в своей транзакции, так что
+    память не зависит от размера файла. Строки с ошибками пропускаются.
+    :param lines: строки CSV, например, файл, открытый с `newline=""`.
+    :param chunk_size: количество студентов, вставляемых одной транзакцией.
+    :param on_chunk: вызывается после каждой пачки с количеством добавленных и
+    пропущенных строк.
+    :return: отчёт вида {"imported": 2, "failed": 1, "errors": [{"line": 3, "error": "..."}]},
+    в `errors` не больше `MAX_IMPORT_ERRORS` первых ошибок.
+    :raises csv.Error: если CSV не удаётся разобрать.
+    """
+    insert_students = Student.__table__.insert()
+    imported, failed, errors = 0, 0, []
+    chunk = []
+    reader = csv.reader(lines, delimiter=";")
+    for row in reader:
+        if not row:
+            continue
+        try:
+            chunk.append(_parse_student_row(row))
+        except ValueError as ex:
+            failed += 1
+            if len(errors) < MAX_IMPORT_ERRORS:
+                errors.append({"line": reader.line_num, "error": str(ex)})
+            continue
+
+        if len(chunk) >= chunk_size:
+            session.execute(insert_students, chunk)
+            session.commit()
+            imported += len(chunk)
+            chunk = []
+            if on_chunk is not None:
+                on_chunk(imported, failed)
+
+    if chunk:
+        session.execute(insert_students, chunk)
+        session.commit()
+        imported += len(chunk)
+    if on_chunk is not None:
+        on_chunk(imported, failed)
+    return {"imported": imported, "failed": failed, "errors": errors}
+
+
+def bulk_add_students_from_csv(csv_data: str) -> dict:
     """
     Осуществляет массовое добавление студентов из строки в формате CSV.
     :param csv_data: строка в формате CSV с разделителем ;.
+    :return: отчёт об импорте, см. `import_students_csv`.
     """
-    mappings = []
-    for row in csv.reader(StringIO(csv_data), delimiter=";"):
-        if len(row) == 6:
-            mappings.append(
-                {
-                    "name": row[0],
-                    "surname": row[1],
-                    "phone": row[2],
-                    "email": row[3],
-                    "average_score": float(row[4]),
-                    "scholarship": bool(row[5]),
-                }
-            )
-    session.bulk_insert_mappings(Student, mappings)
-    session.commit()
+    return import_students_csv(StringIO(csv_data, newline=""))
 
 
 def initialize_db():
+    """Recreate the tables and fill them with sample data."""
+    session.remove()
+    Base.metadata.drop_all(engine)
     Base.metadata.create_all(engine)
 
     student1 = Student(
@@ -376,7 +525,7 @@ def initialize_db():
 
 
 def before_insert_student_listener(mapper, connection, target: Student):
-    if not re.search(r"^\+7\(9\d\d\)\d\d\d-\d\d-\d\d$", target.phone):
+    if not PHONE_RE.match(target.phone):
         raise ValueError(f"Wrong phone format: {target.phone}")
 
 
@@ -0,0 +1,175 @@
+"""
+Background jobs: long imports and reports run outside of the request thread.
+
+With `BOOKS_ALCHEMY_CELERY_BROKER` set (e.g. `redis://localhost:6379/0`), jobs are sent
+to Celery workers, which must see the same `BOOKS_ALCHEMY_UPLOAD_DIR` and database:
+
+    celery -A books_alchemy.jobs.celery worker
+
+Otherwise they run in a thread pool of the web process, and their status is kept in
+memory.
+"""
+
+import io
+import os
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from celery import Celery
+from werkzeug.datastructures import FileStorage
+
+from books_alchemy.database import import_students_csv, session
+from books_alchemy.statistics import rebuild_statistics
+
+BROKER_URL = os.environ.get("BOOKS_ALCHEMY_CELERY_BROKER", "")
+RESULT_BACKEND = os.environ.get("BOOKS_ALCHEMY_CELERY_BACKEND", BROKER_URL)
+WORKERS = int(os.environ.get("BOOKS_ALCHEMY_JOB_WORKERS", "2"))
+UPLOAD_DIR = os.environ.get("BOOKS_ALCHEMY_UPLOAD_DIR", tempfile.gettempdir())
+# Finished jobs kept by the thread pool backend, the oldest are forgotten first
+MAX_FINISHED_JOBS = 1000
+
+# Job states, the same as Celery's
+PENDING = "PENDING"
+PROGRESS = "PROGRESS"
+SUCCESS = "SUCCESS"
+FAILURE = "FAILURE"
+
+# Called by a job with the done fraction (0..1) and details, e.g. rows imported so far
+Progress = Callable[[float, dict], None]
+
+
+def save_upload(file: FileStorage) -> str:
+    """Сохранить загруженный файл для задачи и вернуть путь к нему."""
+    fd, path = tempfile.mkstemp(prefix="books_alchemy_", suffix=".csv", dir=UPLOAD_DIR)
+    with os.fdopen(fd, "wb") as target:
+        file.save(target)
+    return path
+
+
+def import_students_job(progress: Progress, path: str) -> dict:
+    """Импортировать студентов из сохранённого CSV файла и удалить его."""
+    try:
+        size = os.path.getsize(path) or 1
+        with open(path, "rb") as raw:
+            lines = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+
+            def on_chunk(imported: int, failed: int) -> None:
+                progress(raw.tell() / size, {"imported": imported, "failed": failed})
+
+            return import_students_csv(lines, on_chunk=on_chunk)
+    finally:
+        os.remove(path)
+
+
+def rebuild_statistics_job(progress: Progress) -> dict:
+    """Пересчитать статистику выдачи книг."""
+    rebuild_statistics()
+    return {}
+
+
+JOBS: dict[str, Callable[..., Any]] = {
+    "import_students": import_students_job,
+    "rebuild_statistics": rebuild_statistics_job,
+}
+
+
+def _run(name: str, progress: Progress, *args) -> Any:
+    try:
+        return JOBS[name](progress, *args)
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.remove()
+
+
+class ThreadPoolJobs:
+    """Runs jobs in threads of the current process."""
+
+    def __init__(self, workers: int = WORKERS):
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._jobs: OrderedDict[str, dict] = OrderedDict()
+
+    def submit(self, name: str, *args) -> str:
+        job_id = str(uuid.uuid4())
+        with self._lock:
+            self._jobs[job_id] = {"state": PENDING, "progress": 0.0}
+            self._forget_finished()
+        self._executor.submit(self._execute, job_id, name, *args)
+        return job_id
+
+    def get_status(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            status = self._jobs.get(job_id)
+            return {"id": job_id, **status} if status is not None else None
+
+    def _update(self, job_id: str, **fields) -> None:
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _execute(self, job_id: str, name: str, *args) -> None:
+        def progress(fraction: float, info: dict) -> None:
+            self._update(job_id, state=PROGRESS, progress=fraction, info=info)
+
+        self._update(job_id, state=PROGRESS)
+        try:
+            result = _run(name, progress, *args)
+        except Exception as ex:
+            self._update(job_id, state=FAILURE, error=f"{type(ex).__name__}: {ex}")
+        else:
+            self._update(job_id, state=SUCCESS, progress=1.0, result=result)
+
+    def _forget_finished(self) -> None:
+        finished = [
+            job_id
+            for job_id, status in self._jobs.items()
+            if status["state"] in (SUCCESS, FAILURE)
+        ]
+        for job_id in finished[: max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+            del self._jobs[job_id]
+
+
+class CeleryJobs:
+    """Sends jobs to Celery workers."""
+
+    def __init__(self, app: Celery):
+        self.app = app
+
+        @app.task(bind=True, name="books_alchemy.jobs.run")
+        def run(task, name: str, *args):
+            def progress(fraction: float, info: dict) -> None:
+                task.update_state(
+                    state=PROGRESS, meta={"progress": fraction, "info": info}
+                )
+
+            return _run(name, progress, *args)
+
+        self._run = run
+
+    def submit(self, name: str, *args) -> str:
+        return self._run.delay(name, *args).id
+
+    def get_status(self, job_id: str) -> Optional[dict]:
+        # Celery reports unknown jobs as PENDING, so `None` is never returned
+        result = self.app.AsyncResult(job_id)
+        status = {"id": job_id, "state": result.state, "progress": 0.0}
+        if result.state == PROGRESS:
+            status.update(result.info)
+        elif result.state == SUCCESS:
+            status.update(progress=1.0, result=result.result)
+        elif result.state == FAILURE:
+            status["error"] = f"{type(result.result).__name__}: {result.result}"
+        return status
+
+
+celery: Optional[Celery] = None
+if BROKER_URL:
+    celery = Celery("books_alchemy", broker=BROKER_URL, backend=RESULT_BACKEND)
+    jobs = CeleryJobs(celery)
+else:
+    jobs = ThreadPoolJobs()
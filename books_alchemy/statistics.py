@@ -0,0 +1,226 @@
+"""
+Предрассчитанная статистика выдачи книг.
+
+Счётчики обновляются ORM-событиями `GivenBook` в той же транзакции, что и выдача книги,
+так что отчёты читают несколько готовых строк вместо агрегации всей `receiving_books`.
+Данные, добавленные в обход ORM (bulk insert, SQL), учитываются после пересчёта
+(заодно в существующей базе создаются недостающие индексы моделей):
+
+    python -m books_alchemy.statistics
+"""
+
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import Index, Integer, delete, event, func, insert, literal, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.orm.attributes import get_history
+
+from books_alchemy.database import (
+    Base,
+    Book,
+    GivenBook,
+    Student,
+    create_indexes,
+    month_range,
+    session,
+    year_range,
+)
+
+# Books given to students with the average score above this one count as popular
+POPULAR_MIN_AVERAGE_SCORE = 4
+
+
+class IssuesByMonth(Base):
+    """Количество выданных книг по месяцам."""
+
+    __tablename__ = "stats_issues_by_month"
+    year: Mapped[int] = mapped_column(Integer, primary_key=True)
+    month: Mapped[int] = mapped_column(Integer, primary_key=True)
+    issued_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class ReaderIssuesByYear(Base):
+    """Количество книг, выданных студенту, по годам."""
+
+    __tablename__ = "stats_reader_issues_by_year"
+    __table_args__ = (
+        Index("stats_reader_issues_by_year_top", "year", "issued_count", "student_id"),
+    )
+    year: Mapped[int] = mapped_column(Integer, primary_key=True)
+    student_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    issued_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class BookPopularity(Base):
+    """Количество выдач книги студентам со средним баллом выше 4."""
+
+    __tablename__ = "stats_book_popularity"
+    __table_args__ = (Index("stats_book_popularity_top", "issued_count", "book_id"),)
+    book_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    issued_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+def get_average_books_given_this_month() -> float:
+    """Получить среднее количество книг, которые студенты брали в этом месяце."""
+    now = datetime.now()
+    given_book_count = session.execute(
+        select(IssuesByMonth.issued_count).filter_by(year=now.year, month=now.month)
+    ).scalar()
+    return (given_book_count or 0) / session.query(Student).count()
+
+
+def get_top10_readers() -> list[Tuple[Student, int]]:
+    """Получите ТОП-10 самых читающих студентов в этом году.
+    :return: Список кортежей вида (студент, кол-во прочитанных книг) за текущий год, по убыванию
+    количества прочитанных книг.
+    """
+    return session.execute(
+        select(Student, ReaderIssuesByYear.issued_count)
+        .join(ReaderIssuesByYear, ReaderIssuesByYear.student_id == Student.id)
+        .filter(ReaderIssuesByYear.year == datetime.now().year)
+        .filter(ReaderIssuesByYear.issued_count > 0)
+        .order_by(ReaderIssuesByYear.issued_count.desc(), Student.id)
+        .limit(10)
+    ).all()
+
+
+def get_most_popular_book() -> Optional[Book]:
+    """
+    Получить самую популярную книгу среди студентов, у которых средний балл больше 4.0.
+    :return: инстанс книги, которую больше всего брали студенты со средним баллом >4,
+    или None, если таких выдач не было.
+    """
+    return session.execute(
+        select(Book)
+        .join(BookPopularity, BookPopularity.book_id == Book.id)
+        .filter(BookPopularity.issued_count > 0)
+        .order_by(BookPopularity.issued_count.desc(), Book.id)
+        .limit(1)
+    ).scalar()
+
+
+def rebuild_statistics() -> None:
+    """Пересчитать всю статистику по таблице выдач (например, после загрузки данных SQL).
+
+    Выдачи считаются по полуинтервалам месяцев и лет между первой и последней выдачей,
+    так что каждый запрос читает диапазон индекса по `date_of_issue`.
+    """
+    for model in (IssuesByMonth, ReaderIssuesByYear, BookPopularity):
+        session.execute(delete(model))
+
+    # Separate queries: SQLite reads min() or max() alone from the end of the index
+    first = session.execute(select(func.min(GivenBook.date_of_issue))).scalar()
+    last = session.execute(select(func.max(GivenBook.date_of_issue))).scalar()
+    day = first
+    while day is not None and day <= last:
+        start, end = month_range(day)
+        issued_count = session.execute(
+            select(func.count())
+            .select_from(GivenBook)
+            .filter(GivenBook.date_of_issue >= start, GivenBook.date_of_issue < end)
+        ).scalar()
+        if issued_count:
+            session.execute(
+                insert(IssuesByMonth).values(
+                    year=start.year, month=start.month, issued_count=issued_count
+                )
+            )
+        day = end
+
+    day = first
+    while day is not None and day <= last:
+        start, end = year_range(day)
+        session.execute(
+            insert(ReaderIssuesByYear).from_select(
+                ["year", "student_id", "issued_count"],
+                select(literal(start.year), GivenBook.student_id, func.count())
+                .filter(GivenBook.date_of_issue >= start, GivenBook.date_of_issue < end)
+                .group_by(GivenBook.student_id),
+            )
+        )
+        day = end
+
+    session.execute(
+        insert(BookPopularity).from_select(
+            ["book_id", "issued_count"],
+            select(GivenBook.book_id, func.count())
+            .join(Student, Student.id == GivenBook.student_id)
+            .filter(Student.average_score > POPULAR_MIN_AVERAGE_SCORE)
+            .group_by(GivenBook.book_id),
+        )
+    )
+    session.commit()
+
+
+def _add(connection, model, key: dict, delta: int) -> None:
+    """Прибавить `delta` к счётчику `model` с первичным ключом `key`."""
+    connection.execute(
+        sqlite_insert(model)
+        .values(**key, issued_count=delta)
+        .on_conflict_do_update(
+            index_elements=list(key),
+            set_={"issued_count": model.issued_count + delta},
+        )
+    )
+
+
+def _count_loan(
+    connection, book_id: int, student_id: int, date_of_issue: datetime, delta: int
+) -> None:
+    _add(
+        connection,
+        IssuesByMonth,
+        {"year": date_of_issue.year, "month": date_of_issue.month},
+        delta,
+    )
+    _add(
+        connection,
+        ReaderIssuesByYear,
+        {"year": date_of_issue.year, "student_id": student_id},
+        delta,
+    )
+    average_score = connection.execute(
+        select(Student.average_score).filter_by(id=student_id)
+    ).scalar()
+    if average_score is not None and average_score > POPULAR_MIN_AVERAGE_SCORE:
+        _add(connection, BookPopularity, {"book_id": book_id}, delta)
+
+
+def count_given_book_listener(mapper, connection, target: GivenBook):
+    _count_loan(connection, target.book_id, target.student_id, target.date_of_issue, 1)
+
+
+def uncount_given_book_listener(mapper, connection, target: GivenBook):
+    _count_loan(connection, target.book_id, target.student_id, target.date_of_issue, -1)
+
+
+def recount_given_book_listener(mapper, connection, target: GivenBook):
+    # Returning a book only sets `date_of_return`, which doesn't change statistics
+    old = {}
+    for name in ("book_id", "student_id", "date_of_issue"):
+        history = get_history(target, name)
+        if history.deleted:
+            old[name] = history.deleted[0]
+    if not old:
+        return
+
+    _count_loan(
+        connection,
+        old.get("book_id", target.book_id),
+        old.get("student_id", target.student_id),
+        old.get("date_of_issue", target.date_of_issue),
+        -1,
+    )
+    _count_loan(connection, target.book_id, target.student_id, target.date_of_issue, 1)
+
+
+event.listen(GivenBook, "after_insert", count_given_book_listener)
+event.listen(GivenBook, "after_delete", uncount_given_book_listener)
+event.listen(GivenBook, "after_update", recount_given_book_listener)
+
+if __name__ == "__main__":
+    Base.metadata.create_all(session.get_bind())
+    create_indexes()
+    rebuild_statistics()
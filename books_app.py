@@ -1,12 +1,16 @@
-from flasgger import Swagger
+import os
+
 from flask import Flask
 
-from apis import api
+from apis import api, docs, profiling, representations
 from core.database import delete_db, init_db
 
 app = Flask(__name__)
+app.request_class = representations.Request
 api.init_app(app)
-swagger = Swagger(app)
+if os.environ.get(profiling.ENABLE_ENV):
+    profiling.init_app(app, api)
+app.wsgi_app = docs.LazyDocs(app, os.environ.get(docs.SPEC_FILE_ENV))
 
 if __name__ == "__main__":
     delete_db()
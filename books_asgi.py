@@ -0,0 +1,44 @@
+"""
+ASGI entry point of the Books API: the same app, routes and Swagger as `books_app.py`.
+
+The event loop of the ASGI server holds client connections, so thousands of idle
+keep-alive clients cost no threads. Requests are offloaded to a thread pool sized to
+the SQLite connection pool, so a request never waits for a connection while holding a
+thread.
+
+python books_asgi.py
+uvicorn books_asgi:app --no-access-log
+"""
+
+import uvicorn
+from a2wsgi import WSGIMiddleware
+
+from books_app import app as wsgi_app
+from core.database import get_pool, init_db
+
+asgi_app = WSGIMiddleware(wsgi_app, workers=get_pool().max_size)
+
+
+async def app(scope, receive, send):
+    """`asgi_app`, with the database created (or upgraded) on startup of the server,
+    not on import. Migrations are idempotent, so every worker runs them.
+    """
+    if scope["type"] != "lifespan":
+        return await asgi_app(scope, receive, send)
+
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            try:
+                init_db()
+            except Exception as ex:
+                await send({"type": "lifespan.startup.failed", "message": repr(ex)})
+                return
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, access_log=False, lifespan="on")
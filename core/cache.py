@@ -0,0 +1,104 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any
+
+MISSING = object()
+
+
+class CacheBackend(ABC):
+    """Storage behind the read-through cache.
+
+    Implement this to share the cache between workers (e.g. on top of Redis); such a
+    backend is responsible for serializing values itself.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Any:
+        """Return cached value or `MISSING`."""
+
+    @abstractmethod
+    def set(self, key: str, value: Any) -> None:
+        """Store `value` under `key`."""
+
+    @abstractmethod
+    def delete(self, *keys: str) -> None:
+        """Remove `keys` from the cache; unknown keys are ignored."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove everything from the cache."""
+
+    @abstractmethod
+    def stats(self) -> dict:
+        """Return hit/miss/eviction counters."""
+
+
+class LRUCache(CacheBackend):
+    """Thread-safe in-process cache, bounded by size and entry age."""
+
+    def __init__(self, max_size: int = 10_000, ttl: float = 60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = self._misses = self._evictions = self._expirations = 0
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key, None)
+            if entry is None:
+                self._misses += 1
+                return MISSING
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return MISSING
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+            }
+
+
+_backend: CacheBackend = LRUCache()
+
+
+def get_cache() -> CacheBackend:
+    return _backend
+
+
+def set_cache_backend(backend: CacheBackend) -> None:
+    """Replace the cache backend, e.g. with a shared one on multi-worker deployments."""
+    global _backend
+    _backend = backend
@@ -1,6 +1,11 @@
 import os
 import sqlite3
-from typing import Optional
+import threading
+from typing import Callable, ContextManager, Optional, TypeVar
+
+from core.cache import MISSING, get_cache
+from core.migrations import migrate
+from core.pool import ConnectionPool
 
 INITIAL_AUTHORS = [
     {"id": 1, "last_name": "Romalho", "first_name": "Luciano", "middle_name": ""},
@@ -18,70 +23,135 @@ INITIAL_BOOKS = [
 ]
 DATABASE_FILE_PATH = "books.db"
 
+T = TypeVar("T")
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Return the connection pool for `DATABASE_FILE_PATH`, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DATABASE_FILE_PATH)
+    return _pool
+
+
+def get_connection() -> ContextManager[sqlite3.Connection]:
+    """Check out a pooled connection; commits on success, rolls back on error."""
+    return get_pool().connection()
+
+
+def in_transaction() -> bool:
+    """Return whether the current thread has an open transaction, whose reads may see
+    uncommitted changes."""
+    return get_pool().in_transaction()
+
+
+def read_through(key: str, load: Callable[[], T]) -> T:
+    """Return value cached under `key`, calling `load()` and caching its result on a miss.
+    Values loaded inside a transaction are not cached, as they may be uncommitted yet.
+    Cached values are shared between callers and must not be modified.
+    """
+    cache = get_cache()
+    value = cache.get(key)
+    if value is MISSING:
+        value = load()
+        if not in_transaction():
+            cache.set(key, value)
+    return value
+
+
+def invalidate_cache(*keys: str) -> None:
+    """Drop `keys` from the cache now, and again once the current transaction is
+    committed or rolled back, so that concurrent readers can't cache data that is about
+    to change.
+    """
+    get_cache().delete(*keys)
+    pool = get_pool()
+    pool.call_after_commit(lambda: get_cache().delete(*keys))
+    pool.call_after_rollback(lambda: get_cache().delete(*keys))
+
+
+def begin_write(conn: sqlite3.Connection) -> None:
+    """Take the database write lock now, unless a write transaction is already open,
+    so that data read before the first write can't be changed by other connections.
+    """
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+
+
+def insert_many(
+    conn: sqlite3.Connection, table: str, columns: tuple[str, ...], rows: list[tuple]
+) -> range:
+    """Insert `rows` into `table` with a single `executemany` and return their ids.
+    The ids are contiguous, because `table` uses AUTOINCREMENT and the write lock is
+    held until the end of the transaction.
+    """
+    if not rows:
+        return range(0)
+
+    conn.executemany(
+        f"""
+        INSERT INTO `{table}` ({", ".join(columns)})
+        VALUES ({", ".join("?" * len(columns))})
+        """,
+        rows,
+    )
+    (last_id,) = conn.execute(
+        "SELECT seq FROM sqlite_sequence WHERE name = ?", [table]
+    ).fetchone()
+    return range(last_id - len(rows) + 1, last_id + 1)
+
 
 def delete_db():
-    """Delete database file, if exists."""
-    if os.path.exists(DATABASE_FILE_PATH):
-        os.remove(DATABASE_FILE_PATH)
+    """Delete database file (and its WAL files), if exists."""
+    if _pool is not None:
+        _pool.close_all()
+    get_cache().clear()
+    for path in (
+        DATABASE_FILE_PATH,
+        f"{DATABASE_FILE_PATH}-wal",
+        f"{DATABASE_FILE_PATH}-shm",
+    ):
+        if os.path.exists(path):
+            os.remove(path)
 
 
 def init_db() -> None:
-    """Create tables (if not exist) and load initial data."""
-    with sqlite3.connect(DATABASE_FILE_PATH) as conn:
+    """Migrate the database to the latest schema, and load initial data into a new one."""
+    with get_connection() as conn:
+        begin_write(conn)
+        # Databases created before migrations have tables, but no schema version
+        is_new = not conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'authors'"
+        ).fetchone()
+        migrate(conn)
+        if not is_new:
+            return
+
         cursor: sqlite3.Cursor = conn.cursor()
-        cursor.execute(
+        cursor.executemany(
             """
-            SELECT name FROM sqlite_master
-            WHERE type='table' AND name='table_books'; 
+            INSERT OR IGNORE INTO `authors`
+            (id, last_name, first_name, middle_name) VALUES (?, ?, ?, ?)
+            """,
+            [
+                (
+                    item["id"],
+                    item["last_name"],
+                    item["first_name"],
+                    item["middle_name"],
+                )
+                for item in INITIAL_AUTHORS
+            ],
+        )
+        cursor.executemany(
             """
+            INSERT OR IGNORE INTO `books`
+            (id, author_id, title) VALUES (?, ?, ?)
+            """,
+            [(item["id"], item["author_id"], item["title"]) for item in INITIAL_BOOKS],
         )
-        exists: Optional[tuple[str,]] = cursor.fetchone()
-        # now in `exist` we have tuple with table name if table really exists in DB
-        if not exists:
-            cursor.executescript(
-                """
-                CREATE TABLE `authors` (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT, 
-                    last_name TEXT NOT NULL,
-                    first_name TEXT, 
-                    middle_name TEXT NULL
-                )
-                """
-            )
-            cursor.executescript(
-                """
-                CREATE TABLE `books` (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT, 
-                    author_id INTEGER NOT NULL ,
-                    title TEXT,
-                    FOREIGN KEY (author_id)
-                        REFERENCES `authors` (id)
-                        ON DELETE CASCADE 
-                )
-                """
-            )
-            cursor.executemany(
-                """
-                INSERT INTO `authors`
-                (id, last_name, first_name, middle_name) VALUES (?, ?, ?, ?)
-                """,
-                [
-                    (
-                        item["id"],
-                        item["last_name"],
-                        item["first_name"],
-                        item["middle_name"],
-                    )
-                    for item in INITIAL_AUTHORS
-                ],
-            )
-            cursor.executemany(
-                """
-                INSERT INTO `books`
-                (id, author_id, title) VALUES (?, ?, ?)
-                """,
-                [
-                    (item["id"], item["author_id"], item["title"])
-                    for item in INITIAL_BOOKS
-                ],
-            )
@@ -0,0 +1,100 @@
+"""
+JSON encoding of the API responses: the same text as `json.dumps(obj)`, with ujson when
+it is installed (2-2.5 times faster for lists of books), and with dataclasses and dates
+encoded too (as dicts and ISO 8601 strings).
+
+ujson writes floats with a one-digit exponent (`1e-5` instead of `1e-05`) and the DEL
+character differently, so output which may contain them is encoded again with `json`.
+
+The encoder is chosen with `BOOKS_JSON_ENCODER`: `auto` (default, ujson if installed,
+otherwise `json`), `json`, `ujson`, or `orjson`, the fastest one, whose output is
+compact: no spaces after separators and non-ASCII characters not escaped.
+"""
+
+import dataclasses
+import datetime
+import json
+import os
+import re
+from typing import Any, Callable
+
+ENCODER_ENV = "BOOKS_JSON_ENCODER"
+ENCODERS = ("auto", "json", "ujson", "orjson")
+# A float written by ujson with a one-digit exponent, e.g. `1e-5`
+_SHORT_EXPONENT_RE = re.compile(r"e[-+]\d(?!\d)")
+
+
+def default(obj: Any) -> Any:
+    """Return JSON-encodable form of objects `json` doesn't encode: dataclasses as dicts,
+    dates and times as ISO 8601 strings.
+    :raises TypeError: for other objects, like `json`
+    """
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+_json_encoder = json.JSONEncoder(default=default)
+
+
+def json_dumps(obj: Any) -> str:
+    return _json_encoder.encode(obj)
+
+
+def _ujson_dumps() -> Callable[[Any], str]:
+    import ujson
+
+    def ujson_dumps(obj: Any) -> str:
+        dumped = ujson.dumps(
+            obj,
+            ensure_ascii=True,
+            escape_forward_slashes=False,
+            separators=(", ", ": "),
+            default=default,
+        )
+        # May also match inside strings, which are then just encoded again
+        if _SHORT_EXPONENT_RE.search(dumped) or "\x7f" in dumped:
+            return json_dumps(obj)
+        return dumped
+
+    return ujson_dumps
+
+
+def _orjson_dumps() -> Callable[[Any], str]:
+    import orjson
+
+    def orjson_dumps(obj: Any) -> str:
+        try:
+            return orjson.dumps(
+                obj, default=default, option=orjson.OPT_NON_STR_KEYS
+            ).decode()
+        except TypeError:
+            # E.g. integers over 64 bits
+            return json_dumps(obj)
+
+    return orjson_dumps
+
+
+def get_dumps(name: str = "auto") -> Callable[[Any], str]:
+    """Return function encoding an object to JSON with the encoder `name`.
+    :param name: one of `ENCODERS`
+    :raises ImportError: if the encoder is not installed (but `auto` falls back to `json`)
+    :raises ValueError: if the encoder is unknown
+    """
+    if name == "auto":
+        try:
+            return _ujson_dumps()
+        except ImportError:
+            return json_dumps
+    if name == "json":
+        return json_dumps
+    if name == "ujson":
+        return _ujson_dumps()
+    if name == "orjson":
+        return _orjson_dumps()
+    raise ValueError(f"Unknown JSON encoder {name!r}, expected one of {ENCODERS}.")
+
+
+dumps = get_dumps(os.environ.get(ENCODER_ENV, "auto"))
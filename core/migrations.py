@@ -0,0 +1,232 @@
+import sqlite3
+from typing import Callable, NamedTuple, Optional
+
+# Schema version of the database is kept in `PRAGMA user_version`. Migrations are
+# applied in order of their versions, each exactly once. Never edit a migration that
+# has been released - add a new one instead.
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable[[sqlite3.Connection], None]
+
+
+MIGRATIONS: list[Migration] = []
+
+
+def migration(version: int, description: str):
+    """Register decorated function as the migration to schema `version`."""
+
+    def register(apply: Callable[[sqlite3.Connection], None]):
+        if any(item.version == version for item in MIGRATIONS):
+            raise Exception(f"Migration {version} is already registered.")
+        MIGRATIONS.append(Migration(version, description, apply))
+        MIGRATIONS.sort()
+        return apply
+
+    return register
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    (version,) = conn.execute("PRAGMA user_version").fetchone()
+    return version
+
+
+def migrate(conn: sqlite3.Connection, target: Optional[int] = None) -> list[int]:
+    """Apply pending migrations up to `target` version (the latest, if None).
+    All of them run in the current transaction of `conn`, so a failed migration leaves
+    the schema as it was.
+    :param conn: connection to migrate the database of
+    :param target: schema version to migrate to
+    :return: versions of the applied migrations
+    :raises Exception: if the database schema is newer than `target`
+    """
+    if target is None:
+        target = MIGRATIONS[-1].version if MIGRATIONS else 0
+
+    # Take the write lock before reading the version, so that concurrent processes
+    # can't apply the same migration twice
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+
+    current = get_schema_version(conn)
+    if current > target:
+        raise Exception(f"Database schema version {current} is newer than {target}.")
+
+    applied = []
+    for item in MIGRATIONS:
+        if current < item.version <= target:
+            item.apply(conn)
+            conn.execute(f"PRAGMA user_version = {int(item.version)}")
+            applied.append(item.version)
+    return applied
+
+
+def execute_script(conn: sqlite3.Connection, script: str) -> None:
+    """Execute SQL statements of `script` one by one. Unlike `executescript`, doesn't
+    commit the current transaction.
+    """
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            conn.execute(statement)
+            statement = ""
+    if statement.strip():
+        raise Exception(f"Incomplete SQL statement: {statement.strip()}")
+
+
+# Row versions and per-table change counters, maintained by triggers on every write.
+# Used to build ETags without reading (and serializing) the data itself.
+VERSIONING_DDL = """
+    CREATE TABLE IF NOT EXISTS `table_versions` (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0,
+        updated_at INTEGER NOT NULL DEFAULT (strftime('%s', 'now'))
+    );
+    INSERT OR IGNORE INTO `table_versions` (name) VALUES ('authors'), ('books');
+
+    CREATE TRIGGER IF NOT EXISTS `books_row_version`
+    AFTER UPDATE OF author_id, title ON `books`
+    BEGIN
+        UPDATE `books` SET version = version + 1 WHERE id = NEW.id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS `authors_row_version`
+    AFTER UPDATE OF last_name, first_name, middle_name ON `authors`
+    BEGIN
+        UPDATE `authors` SET version = version + 1 WHERE id = NEW.id;
+    END;
+"""
+for _table, _columns in (
+    ("authors", "last_name, first_name, middle_name"),
+    ("books", "author_id, title"),
+):
+    for _event in ("INSERT", f"UPDATE OF {_columns}", "DELETE"):
+        VERSIONING_DDL += f"""
+    CREATE TRIGGER IF NOT EXISTS `{_table}_{_event.split()[0].lower()}_table_version`
+    AFTER {_event} ON `{_table}`
+    BEGIN
+        UPDATE `table_versions`
+        SET version = version + 1, updated_at = strftime('%s', 'now')
+        WHERE name = '{_table}';
+    END;
+"""
+
+
+def add_version_columns(conn: sqlite3.Connection) -> None:
+    """Add row `version` columns to tables created before migrations were introduced."""
+    for table in ("authors", "books"):
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info(`{table}`)")]
+        if "version" not in columns:
+            conn.execute(
+                f"ALTER TABLE `{table}` ADD COLUMN version INTEGER NOT NULL DEFAULT 1"
+            )
+
+
+@migration(1, "Create authors and books tables")
+def create_tables(conn: sqlite3.Connection) -> None:
+    # `IF NOT EXISTS` adopts databases created before migrations were introduced, which
+    # lack the `version` columns
+    execute_script(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS `authors` (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            last_name TEXT NOT NULL,
+            first_name TEXT,
+            middle_name TEXT NULL,
+            version INTEGER NOT NULL DEFAULT 1
+        );
+        CREATE TABLE IF NOT EXISTS `books` (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            author_id INTEGER NOT NULL ,
+            title TEXT,
+            version INTEGER NOT NULL DEFAULT 1,
+            FOREIGN KEY (author_id)
+                REFERENCES `authors` (id)
+                ON DELETE CASCADE
+        );
+        """,
+    )
+    add_version_columns(conn)
+    execute_script(conn, VERSIONING_DDL)
+
+
+@migration(2, "Index books by author and by title")
+def create_books_indexes(conn: sqlite3.Connection) -> None:
+    # (author_id, title) serves lookups by author_id, including `ON DELETE CASCADE`,
+    # and covers the books columns of the books-authors join (the id is the rowid)
+    execute_script(
+        conn,
+        """
+        CREATE INDEX IF NOT EXISTS `books_author_id_title` ON `books` (author_id, title);
+        CREATE INDEX IF NOT EXISTS `books_title` ON `books` (title);
+        """,
+    )
+
+
+@migration(3, "Full-text search index of book titles and author names")
+def create_books_search(conn: sqlite3.Connection) -> None:
+    # `books_search.rowid` is the book id. `author` is the full name of the author,
+    # kept up to date by triggers on both tables. Prefix indexes make `term*` queries
+    # of 2-3 characters as fast as whole-term ones. `rank` ranks title matches above
+    # author ones.
+    author_name = """
+        SELECT coalesce(last_name, '') || ' ' || coalesce(first_name, '') || ' '
+            || coalesce(middle_name, '')
+        FROM `authors` WHERE id = {}
+    """
+    execute_script(
+        conn,
+        f"""
+        CREATE VIRTUAL TABLE `books_search` USING fts5(
+            title, author, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        );
+        INSERT INTO `books_search` (books_search, rank)
+        VALUES ('rank', 'bm25(10.0, 1.0)');
+        INSERT INTO `books_search` (rowid, title, author)
+        SELECT books.id, books.title, ({author_name.format("books.author_id")})
+        FROM `books`;
+
+        CREATE TRIGGER `books_search_insert` AFTER INSERT ON `books`
+        BEGIN
+            INSERT INTO `books_search` (rowid, title, author)
+            VALUES (NEW.id, NEW.title, ({author_name.format("NEW.author_id")}));
+        END;
+        CREATE TRIGGER `books_search_update` AFTER UPDATE OF author_id, title ON `books`
+        BEGIN
+            UPDATE `books_search`
+            SET title = NEW.title, author = ({author_name.format("NEW.author_id")})
+            WHERE rowid = NEW.id;
+        END;
+        CREATE TRIGGER `books_search_delete` AFTER DELETE ON `books`
+        BEGIN
+            DELETE FROM `books_search` WHERE rowid = OLD.id;
+        END;
+        CREATE TRIGGER `authors_search_update`
+        AFTER UPDATE OF last_name, first_name, middle_name ON `authors`
+        BEGIN
+            UPDATE `books_search`
+            SET author = ({author_name.format("NEW.id")})
+            WHERE rowid IN (SELECT id FROM `books` WHERE author_id = NEW.id);
+        END;
+        """,
+    )
+
+
+@migration(4, "Add row versions to tables adopted without them")
+def add_missing_version_columns(conn: sqlite3.Connection) -> None:
+    # Migration 1 didn't add them to databases created before migrations
+    add_version_columns(conn)
+
+
+@migration(5, "Index authors by last name")
+def create_authors_indexes(conn: sqlite3.Connection) -> None:
+    # Batch creation of books looks authors up by name
+    execute_script(
+        conn,
+        """
+        CREATE INDEX IF NOT EXISTS `authors_last_name` ON `authors` (last_name);
+        """,
+    )
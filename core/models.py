@@ -1,10 +1,13 @@
 from dataclasses import dataclass
-from typing import Optional
+from typing import Any, Callable, Optional
 
-from marshmallow import Schema, fields, post_load
+from marshmallow import RAISE, Schema, fields, post_load
+from marshmallow.decorators import POST_DUMP, POST_LOAD, PRE_DUMP
+from marshmallow.utils import ensure_text_type, is_collection, missing
 
 
-@dataclass
+# Slotted: no `__dict__` per instance, for result sets of millions of books
+@dataclass(slots=True)
 class Author:
     last_name: str
     first_name: str
@@ -12,7 +15,7 @@ class Author:
     middle_name: Optional[str] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class Book:
     id: int
     title: str
@@ -36,3 +39,133 @@ class BookSchema(Schema):
     id = fields.Int()
     title = fields.Str()
     author = fields.Nested(AuthorSchema)
+
+
+def compile_dump(schema: Schema) -> Callable[[Any], dict]:
+    """Compile `schema` into a function returning the same dict as `schema.dump(obj)`
+    for objects having all of the schema's attributes.
+
+    Field lookups, type dispatch and nested schemas are resolved once, here, so the
+    returned function is a single dict literal. Schemas with dump hooks or with field
+    types other than `Int`, `Str` and `Nested` fall back to `schema.dump`.
+    :param schema: schema instance to compile
+    :return: function serializing one object
+    """
+    if schema._has_processors(PRE_DUMP) or schema._has_processors(POST_DUMP):
+        return schema.dump
+
+    namespace = {"ensure_text_type": ensure_text_type}
+    items = []
+    for name, field in schema.dump_fields.items():
+        attribute = field.attribute or name
+        if not attribute.isidentifier():
+            return schema.dump
+
+        if type(field) is fields.Nested and not field.many:
+            namespace[f"dump_{name}"] = compile_dump(field.schema)
+            expression = f"dump_{name}(value)"
+        elif type(field) is fields.Integer and not field.as_string:
+            expression = "int(value)"
+        elif type(field) is fields.String:
+            expression = "value if value.__class__ is str else ensure_text_type(value)"
+        else:
+            return schema.dump
+
+        key = field.data_key if field.data_key is not None else name
+        items.append(
+            f"{key!r}: None if (value := obj.{attribute}) is None else {expression}"
+        )
+
+    function_name = f"dump_{type(schema).__name__}"
+    source = f"def {function_name}(obj):\n    return {{{', '.join(items)}}}\n"
+    exec(source, namespace)
+    return namespace[function_name]
+
+
+def compile_load(schema: Schema, partial=None) -> Callable[[Any], Any]:
+    """Compile `schema` into a loader for well-formed input.
+
+    The loader returns the same as `schema.load(data, partial=partial)` when every value
+    already has the field's type (`int` for `Int`, `str` for `Str`, a dict for `Nested`)
+    and no required field is missing. Otherwise it returns `missing`, and the caller
+    should use `schema.load()` to get marshmallow's conversions or validation errors.
+    :param schema: schema instance to compile
+    :param partial: same as `partial` argument of `schema.load()`
+    :return: function loading one item
+    """
+    hooks = {key for key, names in schema._hooks.items() if names}
+    if schema.unknown != RAISE or not hooks <= {
+        (POST_LOAD, False),
+        (PRE_DUMP, False),
+        (POST_DUMP, False),
+    }:
+        return lambda data: missing
+
+    post_load_hooks = []
+    for name in schema._hooks[(POST_LOAD, False)]:
+        hook = getattr(schema, name)
+        if hook.__marshmallow_hook__[(POST_LOAD, False)].get("pass_original"):
+            return lambda data: missing
+        post_load_hooks.append(hook)
+
+    loaders = []
+    for name, field in schema.load_fields.items():
+        if field.validators or field.load_default is not missing:
+            return lambda data: missing
+
+        key = field.data_key if field.data_key is not None else name
+        optional = (
+            partial is True
+            or (is_collection(partial) and name in partial)
+            or not field.required
+        )
+        if type(field) is fields.Nested and not field.many and field.unknown is None:
+            if is_collection(partial):
+                nested_partial = [
+                    item[len(key) + 1 :]
+                    for item in partial
+                    if item.startswith(key + ".")
+                ]
+            else:
+                nested_partial = partial
+            load_value = compile_load(field.schema, nested_partial)
+        elif type(field) is fields.Integer:
+            load_value = _exact_type_loader(int)
+        elif type(field) is fields.String:
+            load_value = _exact_type_loader(str)
+        else:
+            return lambda data: missing
+
+        loaders.append((key, field.attribute or name, optional, load_value))
+
+    known_keys = {key for key, _, _, _ in loaders}
+
+    def load(data):
+        if type(data) is not dict or not data.keys() <= known_keys:
+            return missing
+
+        result = {}
+        for key, attribute, optional, load_value in loaders:
+            value = data.get(key, missing)
+            if value is missing:
+                if optional:
+                    continue
+                return missing
+            value = load_value(value)
+            if value is missing:
+                return missing
+            result[attribute] = value
+
+        for hook in post_load_hooks:
+            result = hook(result, many=False, partial=partial)
+        return result
+
+    return load
+
+
+def _exact_type_loader(value_type: type) -> Callable[[Any], Any]:
+    return lambda value: value if type(value) is value_type else missing
+
+
+dump_author = compile_dump(AuthorSchema())
+dump_book = compile_dump(BookSchema())
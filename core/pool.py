@@ -0,0 +1,152 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+from core.profiling import phase
+
+# Applied once to every new connection, when it is checked out for the first time.
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection became available within the pool timeout."""
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of long-lived SQLite connections.
+
+    A thread that already holds a connection gets the same connection back on nested
+    `connection()` calls, so a service function calling another one shares a single
+    connection and a single transaction. The transaction is committed (or rolled back
+    on error) when the outermost block exits, and the connection is returned to the pool.
+    """
+
+    def __init__(
+        self,
+        database: str,
+        max_size: int = 8,
+        timeout: float = 10.0,
+        pragmas: tuple[str, ...] = PRAGMAS,
+        factory: type[sqlite3.Connection] = sqlite3.Connection,
+    ):
+        self.database = database
+        self.max_size = max_size
+        self.timeout = timeout
+        self.pragmas = pragmas
+        self.factory = factory
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._local = threading.local()
+        self._generation = 0
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Check out a connection for the current thread.
+        :raises PoolTimeout: if all connections are busy for longer than `timeout`
+        """
+        local = self._local
+        if getattr(local, "conn", None) is not None:
+            yield local.conn
+            return
+
+        with phase("db_connect"):
+            generation, conn = self._checkout()
+        local.conn, local.after_commit, local.after_rollback = conn, [], []
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            for callback in local.after_rollback:
+                callback()
+            raise
+        else:
+            for callback in local.after_commit:
+                callback()
+        finally:
+            local.conn, local.after_commit, local.after_rollback = None, [], []
+            self._checkin(generation, conn)
+
+    def in_transaction(self) -> bool:
+        """Return whether the current thread holds a connection with an open transaction."""
+        conn = getattr(self._local, "conn", None)
+        return conn is not None and conn.in_transaction
+
+    def call_after_commit(self, callback: Callable[[], object]) -> None:
+        """Call `callback` once the current thread's transaction is committed,
+        or right away if the thread does not hold a connection.
+        Callbacks are dropped if the transaction is rolled back.
+        """
+        if getattr(self._local, "conn", None) is None:
+            callback()
+        else:
+            self._local.after_commit.append(callback)
+
+    def call_after_rollback(self, callback: Callable[[], object]) -> None:
+        """Call `callback` once the current thread's transaction is rolled back.
+        Does nothing if the thread does not hold a connection, or if the transaction
+        is committed.
+        """
+        if getattr(self._local, "conn", None) is not None:
+            self._local.after_rollback.append(callback)
+
+    def close_all(self) -> None:
+        """Close idle connections; connections in use are closed when returned."""
+        self._generation += 1
+        while True:
+            try:
+                _, conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            conn.close()
+
+    def _checkout(self) -> tuple[int, sqlite3.Connection]:
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(
+                f"No free connection to {self.database} in {self.timeout} seconds."
+            )
+        try:
+            while True:
+                try:
+                    generation, conn = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._generation, self._connect()
+
+                if generation == self._generation and self._is_healthy(conn):
+                    return generation, conn
+                conn.close()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _checkin(self, generation: int, conn: sqlite3.Connection) -> None:
+        if generation == self._generation and not conn.in_transaction:
+            self._idle.put((generation, conn))
+        else:
+            conn.close()
+        self._slots.release()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.database, check_same_thread=False, factory=self.factory
+        )
+        for pragma in self.pragmas:
+            conn.execute(pragma)
+        return conn
+
+    @staticmethod
+    def _is_healthy(conn: sqlite3.Connection) -> bool:
+        try:
+            conn.execute("SELECT 1").fetchone()
+        except sqlite3.Error:
+            return False
+        return True
@@ -0,0 +1,131 @@
+import sqlite3
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+# Per-request timings by phase. Phases are exclusive: time spent in a nested phase
+# (e.g. `sql` inside `models`) is not counted in the enclosing one, so the phases of a
+# request add up to its total time. When no `Recorder` is active, `phase()` does
+# nothing, so the instrumentation costs next to nothing unless profiling is enabled.
+
+
+class Recorder:
+    """Collects exclusive time per phase, and event counts, of one request."""
+
+    def __init__(self, root: str = "app"):
+        self.durations: dict[str, float] = defaultdict(float)
+        self.counts: dict[str, int] = defaultdict(int)
+        self._stack = [root]
+        self._started = self._start = time.perf_counter()
+
+    def enter(self, name: str) -> None:
+        now = time.perf_counter()
+        self.durations[self._stack[-1]] += now - self._started
+        self._stack.append(name)
+        self._started = now
+
+    def exit(self) -> None:
+        now = time.perf_counter()
+        self.durations[self._stack.pop()] += now - self._started
+        self._started = now
+
+    def count(self, name: str, number: int = 1) -> None:
+        self.counts[name] += number
+
+    def total(self) -> float:
+        """Return seconds elapsed since the recorder was created."""
+        return time.perf_counter() - self._start
+
+
+_recorder: ContextVar[Optional[Recorder]] = ContextVar("recorder", default=None)
+
+
+def start_recording() -> Recorder:
+    """Start recording phases of the current request (thread or task)."""
+    recorder = Recorder()
+    _recorder.set(recorder)
+    return recorder
+
+
+def stop_recording() -> Optional[Recorder]:
+    """Stop recording and return the recorder, with its root phase closed."""
+    recorder = _recorder.get()
+    if recorder is not None:
+        recorder.exit()
+        _recorder.set(None)
+    return recorder
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Count the time spent in the block as phase `name` of the current request."""
+    recorder = _recorder.get()
+    if recorder is None:
+        yield
+        return
+
+    recorder.enter(name)
+    try:
+        yield
+    finally:
+        recorder.exit()
+
+
+def _count_statement(statement: str) -> None:
+    # Statements run by triggers are reported as `-- TRIGGER name` comments
+    recorder = _recorder.get()
+    if recorder is not None and not statement.startswith("--"):
+        recorder.count("sql_statements")
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor recording the time of executing queries and fetching rows as `sql`."""
+
+    def execute(self, *args):
+        with phase("sql"):
+            return super().execute(*args)
+
+    def executemany(self, *args):
+        with phase("sql"):
+            return super().executemany(*args)
+
+    def fetchone(self):
+        with phase("sql"):
+            return super().fetchone()
+
+    def fetchmany(self, *args):
+        with phase("sql"):
+            return super().fetchmany(*args)
+
+    def fetchall(self):
+        with phase("sql"):
+            return super().fetchall()
+
+    def __next__(self):
+        with phase("sql"):
+            return super().__next__()
+
+
+class TimedConnection(sqlite3.Connection):
+    """Connection recording `sql` time and counting executed statements. Use as
+    `factory` of `sqlite3.connect()`.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.set_trace_callback(_count_statement)
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+
+    def executemany(self, *args):
+        return self.cursor().executemany(*args)
+
+    def commit(self):
+        with phase("sql"):
+            return super().commit()
@@ -1,58 +1,188 @@
 """
 docker run -p 6379:6379 --name my-redis -d redis
+celery -A image_service.app.celery worker
+celery -A image_service.app.celery worker -Q interactive  # dedicated to small batches
+python -m image_service.app
 curl -X POST  -H "Content-Type: application/json" --data '{"images": ["image1", "image2", "image3"]}' http://127.0.0.1:5000/process_images
+curl -X POST  -H "Content-Type: application/json" --data '{"group_ids": ["<group_id>"]}' http://127.0.0.1:5000/status
 """
 
+import math
+import os
 import random
+import time
+import uuid
 
-from flask import Flask, request, jsonify
 from celery import Celery, group
-import time
+from flask import Flask, jsonify, request
+from kombu import Queue
+
+from image_service.progress import create_tracker
+from image_service.ratelimit import TokenBucketLimiter
+
+BROKER_URL = os.environ.get("IMAGE_SERVICE_BROKER_URL", "redis://localhost:6379/0")
+RESULT_BACKEND = os.environ.get("IMAGE_SERVICE_RESULT_BACKEND", BROKER_URL)
+# Where workers count finished tasks of each group, `memory://` for a single process
+TRACKER_URL = os.environ.get("IMAGE_SERVICE_TRACKER_URL", BROKER_URL)
+# Simulated processing time of an image, "min,max" seconds
+PROCESSING_TIME = tuple(
+    float(seconds)
+    for seconds in os.environ.get("IMAGE_SERVICE_PROCESSING_TIME", "5,15").split(",")
+)
+# Maximum number of groups in a bulk status request
+MAX_STATUS_GROUPS = 1000
+# Images processed by one task: fewer messages and tracker updates for big batches
+CHUNK_SIZE = int(os.environ.get("IMAGE_SERVICE_CHUNK_SIZE", "10"))
+# Batches of up to this many images go to the `interactive` queue, bigger ones to `bulk`
+INTERACTIVE_MAX_IMAGES = int(os.environ.get("IMAGE_SERVICE_INTERACTIVE_MAX", "10"))
+# Images a client may submit per `RATE_LIMIT_PERIOD` seconds, also the maximum batch size
+RATE_LIMIT_IMAGES = int(os.environ.get("IMAGE_SERVICE_RATE_LIMIT_IMAGES", "10000"))
+RATE_LIMIT_PERIOD = float(os.environ.get("IMAGE_SERVICE_RATE_LIMIT_PERIOD", "60"))
+# Addresses of proxies whose `X-Client-Id` header names the client, comma-separated.
+# Other clients are limited by their address, as they could rotate the header.
+TRUSTED_PROXIES = frozenset(
+    address.strip()
+    for address in os.environ.get("IMAGE_SERVICE_TRUSTED_PROXIES", "").split(",")
+    if address.strip()
+)
+# Processed images reused by ID: how many are kept in memory and for how many seconds
+RESULT_CACHE_SIZE = int(os.environ.get("IMAGE_SERVICE_RESULT_CACHE_SIZE", "100000"))
+RESULT_TTL = int(os.environ.get("IMAGE_SERVICE_RESULT_TTL", "3600"))
 
 app = Flask(__name__)
 
 # Конфигурация Celery
 celery = Celery(
     app.name,
-    broker="redis://localhost:6379/0",
-    backend="redis://localhost:6379/0",
+    broker=BROKER_URL,
+    backend=RESULT_BACKEND,
 )
+# Workers consume both queues unless started with `-Q`
+celery.conf.task_queues = (Queue("interactive"), Queue("bulk"))
+celery.conf.task_default_queue = "bulk"
+tracker = create_tracker(TRACKER_URL, cache_size=RESULT_CACHE_SIZE, ttl=RESULT_TTL)
+limiter = TokenBucketLimiter(RATE_LIMIT_IMAGES, RATE_LIMIT_PERIOD)
 
 
-@celery.task
-def process_image(image_id: str):
-    time.sleep(random.randint(5, 15))
+def _process_image(image_id: str) -> str:
+    time.sleep(random.uniform(*PROCESSING_TIME))
     return f"Image {image_id} processed"
 
 
-@app.route("/process_images", methods=["POST"])
-def process_images():
-    images = request.json.get("images")
+@celery.task
+def process_images_chunk(image_ids: list[str]):
+    """Обработать пакет изображений и сообщить о результатах всем ждущим их группам."""
+    done = []
+    for image_id in image_ids:
+        try:
+            done.append((image_id, _process_image(image_id), False))
+        except Exception as ex:
+            done.append((image_id, repr(ex), True))
+    tracker.images_done(done)
 
-    if images and isinstance(images, list):
-        # Создаём группу задач
-        task_group = group(process_image.s(image_id) for image_id in images)
 
-        # Запускаем группу задач и сохраняем её
-        result = task_group.apply_async()
-        result.save()
+def _client_id() -> str:
+    if request.remote_addr in TRUSTED_PROXIES:
+        if client_id := request.headers.get("X-Client-Id"):
+            return client_id
+    return request.remote_addr or ""
 
-        # Возвращаем пользователю ID группы для отслеживания
-        return jsonify({"group_id": result.id}), 202
-    else:
-        return jsonify({"error": "Missing or invalid images parameter"}), 400
+
+@app.route("/process_images", methods=["POST"])
+def process_images():
+    """
+    Запустить обработку изображений. Необязательный параметр `priority`: `interactive`
+    или `bulk`, по умолчанию выбирается по размеру пакета.
+    """
+    images = request.json.get("images")
+    priority = request.json.get("priority")
+
+    # Image IDs are keys of the results cache and of the tracker
+    if not (
+        images
+        and isinstance(images, list)
+        and all(isinstance(image, str) and image for image in images)
+    ):
+        return jsonify({"error": "images must be a list of non-empty strings"}), 400
+    if len(images) > RATE_LIMIT_IMAGES:
+        return (
+            jsonify({"error": f"No more than {RATE_LIMIT_IMAGES} images at once"}),
+            400,
+        )
+    if priority is None:
+        priority = "interactive" if len(images) <= INTERACTIVE_MAX_IMAGES else "bulk"
+    elif priority not in ("interactive", "bulk"):
+        return jsonify({"error": "priority must be interactive or bulk"}), 400
+
+    if wait := limiter.acquire(_client_id(), len(images)):
+        return (
+            jsonify({"error": "Too many images, try again later"}),
+            429,
+            {"Retry-After": str(math.ceil(wait))},
+        )
+
+    group_id = str(uuid.uuid4())
+    # Изображения, которые уже обработаны или обрабатываются, повторно не запускаются
+    image_ids = tracker.submit(group_id, images)
+
+    # Создаём группу задач, каждая обрабатывает до CHUNK_SIZE изображений
+    if image_ids:
+        task_group = group(
+            process_images_chunk.s(image_ids[start : start + CHUNK_SIZE])
+            for start in range(0, len(image_ids), CHUNK_SIZE)
+        )
+        task_group.apply_async(queue=priority)
+
+    # Возвращаем пользователю ID группы для отслеживания
+    return jsonify({"group_id": group_id}), 202
 
 
 @app.route("/status/<group_id>", methods=["GET"])
 def get_group_status(group_id: str):
-    result = celery.GroupResult.restore(group_id)
-
-    if result:
-        status = result.completed_count() / len(result)
-        return jsonify({"status": status}), 200
+    """
+    Прогресс группы задач, с `?results=1` — и результаты задач по порядку.
+    `cached` и `attached` — изображения группы, взятые из кэша результатов или
+    присоединённые к уже запущенной обработке, `cache` — статистика кэша.
+    """
+    (status,) = tracker.get_statuses([group_id])
+
+    if status:
+        if request.args.get("results"):
+            status["results"] = tracker.get_results(group_id)
+        status["cache"] = tracker.cache_stats()
+        return jsonify(status), 200
     else:
         return jsonify({"error": "Invalid group_id"}), 404
 
 
+@app.route("/status", methods=["POST"])
+def get_groups_status():
+    """Прогресс нескольких групп задач за один запрос, `null` для неизвестных групп."""
+    group_ids = (request.json or {}).get("group_ids")
+
+    if (
+        isinstance(group_ids, list)
+        and 0 < len(group_ids) <= MAX_STATUS_GROUPS
+        and all(isinstance(group_id, str) for group_id in group_ids)
+    ):
+        statuses = tracker.get_statuses(group_ids)
+        return (
+            jsonify(
+                {
+                    "groups": dict(zip(group_ids, statuses)),
+                    "cache": tracker.cache_stats(),
+                }
+            ),
+            200,
+        )
+    else:
+        return (
+            jsonify(
+                {"error": f"group_ids must be a list of 1 to {MAX_STATUS_GROUPS} IDs"}
+            ),
+            400,
+        )
+
+
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,406 @@
+"""
+Progress of task groups, updated by workers as each task finishes.
+
+Reading a group's status costs one backend round trip, however many tasks the group
+has (`GroupResult.completed_count()` reads the result of every task), and statuses of
+many groups are read with one round trip too.
+
+Results of processed images are cached by image ID: a submitted image which was
+already processed is counted as done at once, and an image which is being processed
+for another group is attached to that work instead of being queued again.
+"""
+
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, defaultdict
+from typing import Any, Optional
+
+# Seconds a group's progress is kept after its last update
+EXPIRES = 24 * 60 * 60
+# Results cache: maximum number of images (in memory) and seconds a result is reused
+RESULT_CACHE_SIZE = 100_000
+RESULT_TTL = 60 * 60
+# Seconds after which an unfinished image is considered lost and is queued again
+IN_FLIGHT_TIMEOUT = 10 * 60
+
+
+class ResultsCache:
+    """Results of images in memory, bounded by size and age, least recently used ones
+    evicted first. Not thread-safe: `MemoryTracker` calls it under its lock.
+    """
+
+    MISSING = object()
+
+    def __init__(self, max_size: int = RESULT_CACHE_SIZE, ttl: float = RESULT_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self.evictions = self.expirations = 0
+
+    def get(self, key: str) -> Any:
+        """Return cached value or `ResultsCache.MISSING`."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return self.MISSING
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            return self.MISSING
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _status(
+    total: int, completed: int, failed: int, cached: int = 0, attached: int = 0
+) -> dict:
+    return {
+        "status": (completed + failed) / total if total else 1.0,
+        "total": total,
+        "completed": completed,
+        "failed": failed,
+        "cached": cached,
+        "attached": attached,
+    }
+
+
+def _cache_stats(cache_hits: int, in_flight_hits: int, misses: int) -> dict:
+    requests = cache_hits + in_flight_hits + misses
+    return {
+        "cache_hits": cache_hits,
+        "in_flight_hits": in_flight_hits,
+        "misses": misses,
+        "hit_rate": (cache_hits + in_flight_hits) / requests if requests else 0.0,
+    }
+
+
+class Tracker(ABC):
+    """Progress of task groups and the results cache of images."""
+
+    @abstractmethod
+    def start(self, group_id: str, total: int) -> None:
+        """Start tracking a group of `total` tasks."""
+
+    @abstractmethod
+    def submit(self, group_id: str, image_ids: list[str]) -> list[str]:
+        """Start tracking a group of images, count the cached ones as done and attach
+        the ones being processed to that work.
+        :return: IDs of the images to process.
+        """
+
+    @abstractmethod
+    def items_done(self, group_id: str, items: list[tuple[int, Any, bool]]) -> None:
+        """Count finished tasks of the group: `(index, result, failed)` tuples."""
+
+    @abstractmethod
+    def images_done(self, results: list[tuple[str, Any, bool]]) -> None:
+        """Count processed images in all groups waiting for them, and cache successful
+        results: `(image_id, result, failed)` tuples.
+        """
+
+    @abstractmethod
+    def get_statuses(self, group_ids: list[str]) -> list[Optional[dict]]:
+        """Return progress of the groups, `None` for unknown ones."""
+
+    @abstractmethod
+    def get_results(self, group_id: str) -> Optional[list]:
+        """Return results of the group's tasks by index, `None` for unfinished ones."""
+
+    @abstractmethod
+    def cache_stats(self) -> dict:
+        """Return counters of the results cache."""
+
+
+class MemoryTracker(Tracker):
+    """Keeps progress in memory of the current process, for tests and a single
+    process running the workers (e.g. `task_always_eager`).
+    """
+
+    def __init__(
+        self,
+        cache_size: int = RESULT_CACHE_SIZE,
+        ttl: float = RESULT_TTL,
+        in_flight_timeout: float = IN_FLIGHT_TIMEOUT,
+    ):
+        self._lock = threading.Lock()
+        self._groups: dict[str, dict] = {}
+        self._results = ResultsCache(max_size=cache_size, ttl=ttl)
+        self.in_flight_timeout = in_flight_timeout
+        # Image ID -> (time it was queued, [(group ID, index)] waiting for it)
+        self._in_flight: dict[str, tuple[float, list[tuple[str, int]]]] = {}
+        self._cache_hits = self._in_flight_hits = self._misses = 0
+
+    def start(self, group_id: str, total: int) -> None:
+        with self._lock:
+            self._groups[group_id] = {
+                "total": total,
+                "completed": 0,
+                "failed": 0,
+                "cached": 0,
+                "attached": 0,
+                "results": {},
+            }
+
+    def submit(self, group_id: str, image_ids: list[str]) -> list[str]:
+        self.start(group_id, len(image_ids))
+        to_process, cached = [], []
+        now = time.monotonic()
+        with self._lock:
+            group = self._groups[group_id]
+            for index, image_id in enumerate(image_ids):
+                result = self._results.get(image_id)
+                if result is not ResultsCache.MISSING:
+                    cached.append((index, result, False))
+                    continue
+
+                queued_at, waiters = self._in_flight.get(image_id, (0.0, []))
+                waiters.append((group_id, index))
+                if waiters[:-1] and queued_at > now - self.in_flight_timeout:
+                    group["attached"] += 1
+                else:
+                    self._in_flight[image_id] = (now, waiters)
+                    to_process.append(image_id)
+
+            group["cached"] = len(cached)
+            self._cache_hits += len(cached)
+            self._in_flight_hits += group["attached"]
+            self._misses += len(to_process)
+        self.items_done(group_id, cached)
+        return to_process
+
+    def items_done(self, group_id: str, items: list[tuple[int, Any, bool]]) -> None:
+        with self._lock:
+            group = self._groups.get(group_id)
+            if group is None:
+                return
+            for index, result, failed in items:
+                group["failed" if failed else "completed"] += 1
+                group["results"][index] = result
+
+    def images_done(self, results: list[tuple[str, Any, bool]]) -> None:
+        items_by_group = defaultdict(list)
+        with self._lock:
+            for image_id, result, failed in results:
+                _queued_at, waiters = self._in_flight.pop(image_id, (0.0, []))
+                if not failed:
+                    self._results.set(image_id, result)
+                for group_id, index in waiters:
+                    items_by_group[group_id].append((index, result, failed))
+        for group_id, items in items_by_group.items():
+            self.items_done(group_id, items)
+
+    def get_statuses(self, group_ids: list[str]) -> list[Optional[dict]]:
+        with self._lock:
+            return [
+                (
+                    _status(
+                        group["total"],
+                        group["completed"],
+                        group["failed"],
+                        group["cached"],
+                        group["attached"],
+                    )
+                    if (group := self._groups.get(group_id)) is not None
+                    else None
+                )
+                for group_id in group_ids
+            ]
+
+    def get_results(self, group_id: str) -> Optional[list]:
+        with self._lock:
+            group = self._groups.get(group_id)
+            if group is None:
+                return None
+            return [group["results"].get(index) for index in range(group["total"])]
+
+    def cache_stats(self) -> dict:
+        with self._lock:
+            stats = _cache_stats(self._cache_hits, self._in_flight_hits, self._misses)
+            stats.update(
+                in_flight=len(self._in_flight),
+                size=len(self._results),
+                evictions=self._results.evictions,
+                expirations=self._results.expirations,
+            )
+        return stats
+
+
+class RedisTracker(Tracker):
+    """Keeps progress in Redis hashes: `group:<id>` with the counters, and
+    `group:<id>:results` with the result of each finished task by its index.
+
+    Results of images are cached in `image:<id>:result` keys expiring after `ttl`
+    (the size is bounded by Redis' `maxmemory-policy`), groups waiting for an image
+    are listed in `image:<id>:waiters`, and `image:<id>:queued` is set while the image
+    is queued or being processed.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        ttl: int = RESULT_TTL,
+        in_flight_timeout: int = IN_FLIGHT_TIMEOUT,
+    ):
+        import redis
+
+        self.redis = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.in_flight_timeout = in_flight_timeout
+
+    def start(self, group_id: str, total: int) -> None:
+        key = f"group:{group_id}"
+        pipe = self.redis.pipeline()
+        pipe.hset(
+            key,
+            mapping={
+                "total": total,
+                "completed": 0,
+                "failed": 0,
+                "cached": 0,
+                "attached": 0,
+            },
+        )
+        pipe.expire(key, EXPIRES)
+        pipe.execute()
+
+    def submit(self, group_id: str, image_ids: list[str]) -> list[str]:
+        self.start(group_id, len(image_ids))
+        pipe = self.redis.pipeline(transaction=False)
+        for image_id in image_ids:
+            pipe.get(f"image:{image_id}:result")
+        results = pipe.execute()
+
+        cached, misses = [], []
+        for index, (image_id, result) in enumerate(zip(image_ids, results)):
+            if result is not None:
+                cached.append((index, json.loads(result), False))
+            else:
+                misses.append((index, image_id))
+
+        # An image is queued unless it is already queued (and not lost). If the image
+        # finishes between the two pipelines, it is queued again, but no group misses it.
+        pipe = self.redis.pipeline(transaction=False)
+        for index, image_id in misses:
+            pipe.rpush(f"image:{image_id}:waiters", f"{group_id}:{index}")
+            pipe.expire(f"image:{image_id}:waiters", EXPIRES)
+            pipe.set(f"image:{image_id}:queued", 1, nx=True, ex=self.in_flight_timeout)
+        replies = pipe.execute()
+        to_process = [
+            image_id
+            for (_index, image_id), queued in zip(misses, replies[2::3])
+            if queued
+        ]
+
+        attached = len(misses) - len(to_process)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hset(
+            f"group:{group_id}", mapping={"cached": len(cached), "attached": attached}
+        )
+        pipe.hincrby("image_cache:stats", "cache_hits", len(cached))
+        pipe.hincrby("image_cache:stats", "in_flight_hits", attached)
+        pipe.hincrby("image_cache:stats", "misses", len(to_process))
+        pipe.execute()
+        if cached:
+            self.items_done(group_id, cached)
+        return to_process
+
+    def items_done(self, group_id: str, items: list[tuple[int, Any, bool]]) -> None:
+        key = f"group:{group_id}"
+        if not self.redis.exists(key):
+            return
+        failed = sum(item_failed for _index, _result, item_failed in items)
+        pipe = self.redis.pipeline()
+        if len(items) > failed:
+            pipe.hincrby(key, "completed", len(items) - failed)
+        if failed:
+            pipe.hincrby(key, "failed", failed)
+        pipe.hset(
+            f"{key}:results",
+            mapping={index: json.dumps(result) for index, result, _failed in items},
+        )
+        pipe.expire(key, EXPIRES)
+        pipe.expire(f"{key}:results", EXPIRES)
+        pipe.execute()
+
+    def images_done(self, results: list[tuple[str, Any, bool]]) -> None:
+        pipe = self.redis.pipeline()
+        for image_id, result, failed in results:
+            if not failed:
+                pipe.set(f"image:{image_id}:result", json.dumps(result), ex=self.ttl)
+            pipe.lrange(f"image:{image_id}:waiters", 0, -1)
+            pipe.delete(f"image:{image_id}:waiters", f"image:{image_id}:queued")
+        replies = iter(pipe.execute())
+
+        items_by_group = defaultdict(list)
+        for image_id, result, failed in results:
+            if not failed:
+                next(replies)
+            for waiter in next(replies):
+                group_id, index = waiter.decode().rsplit(":", 1)
+                items_by_group[group_id].append((int(index), result, failed))
+            next(replies)
+        for group_id, items in items_by_group.items():
+            self.items_done(group_id, items)
+
+    def get_statuses(self, group_ids: list[str]) -> list[Optional[dict]]:
+        pipe = self.redis.pipeline(transaction=False)
+        for group_id in group_ids:
+            pipe.hmget(
+                f"group:{group_id}",
+                "total",
+                "completed",
+                "failed",
+                "cached",
+                "attached",
+            )
+        return [
+            (
+                _status(*(int(value or 0) for value in counters))
+                if counters[0] is not None
+                else None
+            )
+            for counters in pipe.execute()
+        ]
+
+    def get_results(self, group_id: str) -> Optional[list]:
+        key = f"group:{group_id}"
+        pipe = self.redis.pipeline()
+        pipe.hget(key, "total")
+        pipe.hgetall(f"{key}:results")
+        total, results = pipe.execute()
+        if total is None:
+            return None
+        results = {int(index): json.loads(value) for index, value in results.items()}
+        return [results.get(index) for index in range(int(total))]
+
+    def cache_stats(self) -> dict:
+        stats = self.redis.hgetall("image_cache:stats")
+        return _cache_stats(
+            *(
+                int(stats.get(name, 0))
+                for name in (b"cache_hits", b"in_flight_hits", b"misses")
+            )
+        )
+
+
+def create_tracker(
+    url: str, cache_size: int = RESULT_CACHE_SIZE, ttl: int = RESULT_TTL
+) -> Tracker:
+    """Return the tracker for `url`: `memory://` or a Redis URL."""
+    if url.startswith("memory://"):
+        return MemoryTracker(cache_size=cache_size, ttl=ttl)
+    return RedisTracker(url, ttl=ttl)
@@ -0,0 +1,52 @@
+import threading
+import time
+from typing import Callable
+
+
+class TokenBucketLimiter:
+    """Limits the rate of something (e.g. images submitted) per client: each client
+    has a bucket of `capacity` tokens, refilled at `capacity / period` tokens per second.
+
+    Buckets are kept in memory, so with several web processes each one has its own limit.
+    """
+
+    def __init__(
+        self,
+        capacity: float,
+        period: float,
+        clock: Callable[[], float] = time.monotonic,
+        max_clients: int = 100_000,
+    ):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.clock = clock
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        # Client -> (tokens, time of the last update)
+        self._buckets: dict[str, tuple[float, float]] = {}
+
+    def acquire(self, client: str, tokens: float = 1) -> float:
+        """Take `tokens` from the client's bucket.
+        :return: 0 if the tokens were taken, otherwise seconds to wait until the bucket has
+        enough tokens; more than `capacity` tokens are never available.
+        """
+        with self._lock:
+            now = self.clock()
+            available, updated = self._buckets.get(client, (self.capacity, now))
+            available = min(self.capacity, available + (now - updated) * self.rate)
+            if tokens > available:
+                self._buckets[client] = (available, now)
+                if tokens > self.capacity:
+                    return float("inf")
+                return (tokens - available) / self.rate
+
+            if client not in self._buckets and len(self._buckets) >= self.max_clients:
+                self._forget_full_buckets(now)
+            self._buckets[client] = (available - tokens, now)
+            return 0.0
+
+    def _forget_full_buckets(self, now: float) -> None:
+        # A full bucket is the same as no bucket
+        for client, (available, updated) in list(self._buckets.items()):
+            if available + (now - updated) * self.rate >= self.capacity:
+                del self._buckets[client]
@@ -1,33 +1,156 @@
+import json
 import sqlite3
+from typing import Callable, Iterator
 
-from core.database import DATABASE_FILE_PATH
-from core.models import Author, AuthorSchema
+from core.cache import MISSING, get_cache
+from core.database import (
+    begin_write,
+    get_connection,
+    in_transaction,
+    invalidate_cache,
+    read_through,
+)
+from core.models import Author, AuthorSchema, Book, dump_author, dump_book
+from core.profiling import phase
+from services.books import author_books_key, book_key
+from services.versions import check_etag, get_author_etag
 
 
-def get_all_authors() -> list[Author]:
-    with sqlite3.connect(DATABASE_FILE_PATH) as conn:
+def author_key(author_id: int) -> str:
+    return f"author:{int(author_id)}"
+
+
+def _author_from_row(cursor: sqlite3.Cursor, row: tuple) -> Author:
+    return Author(*row)
+
+
+def iter_authors(
+    after_id: int | None = None, limit: int | None = None, batch_size: int = 500
+) -> Iterator[Author]:
+    """Yield authors ordered by id, fetching rows from the cursor in batches.
+    :param after_id: keyset cursor - only authors with greater id are returned
+    :param limit: maximum number of authors to return; all authors if None
+    :param batch_size: number of rows to fetch from the cursor at once
+    """
+    query = """
+        SELECT last_name, first_name, id, middle_name
+        FROM authors
+        """
+    params = []
+    if after_id is not None:
+        query += " WHERE id > ?"
+        params.append(after_id)
+    query += " ORDER BY id LIMIT ?"
+    params.append(-1 if limit is None else limit)
+
+    with get_connection() as conn:
         cursor: sqlite3.Cursor = conn.cursor()
-        cursor.execute(
-            """
-            SELECT last_name, first_name, id, middle_name
-            FROM authors
-            """
+        cursor.row_factory = _author_from_row
+        cursor.execute(query, params)
+        while authors := cursor.fetchmany(batch_size):
+            yield from authors
+
+
+def iter_authors_json(
+    after_id: int | None = None, limit: int | None = None
+) -> Iterator[dict]:
+    for author in iter_authors(after_id=after_id, limit=limit):
+        yield dump_author(author)
+
+
+def iter_authors_with_books_json(
+    after_id: int | None = None, limit: int | None = None, batch_size: int = 500
+) -> Iterator[dict]:
+    """Yield authors ordered by id, each with the list of the author's books, as dicts.
+
+    Authors and their books are read with one grouped query, and SQLite builds the JSON
+    of each author, so there are no queries per author.
+    :param after_id: keyset cursor - only authors with greater id are returned
+    :param limit: maximum number of authors to return; all authors if None
+    :param batch_size: number of rows to fetch from the cursor at once
+    """
+    query = """
+        SELECT json_object(
+            'id', authors.id,
+            'last_name', authors.last_name,
+            'first_name', authors.first_name,
+            'middle_name', authors.middle_name,
+            'books', json_group_array(json_object(
+                'id', books.id,
+                'title', books.title,
+                'author', json_object(
+                    'id', authors.id,
+                    'last_name', authors.last_name,
+                    'first_name', authors.first_name,
+                    'middle_name', authors.middle_name
+                )
+            )) FILTER (WHERE books.id IS NOT NULL)
         )
-        return [Author(*row) for row in cursor.fetchall()]
+        FROM authors
+        LEFT JOIN books ON books.author_id = authors.id
+        """
+    params = []
+    if after_id is not None:
+        query += " WHERE authors.id > ?"
+        params.append(after_id)
+    query += " GROUP BY authors.id ORDER BY authors.id LIMIT ?"
+    params.append(-1 if limit is None else limit)
+
+    with get_connection() as conn:
+        cursor: sqlite3.Cursor = conn.execute(query, params)
+        while rows := cursor.fetchmany(batch_size):
+            for (author_json,) in rows:
+                author = json.loads(author_json)
+                # The order of aggregated values is not defined in SQLite
+                author["books"].sort(key=_by_id)
+                yield author
+
+
+def _by_id(item: dict) -> int:
+    return item["id"]
 
 
-def get_all_authors_json() -> list:
-    authors = get_all_authors()
-    return AuthorSchema().dump(authors, many=True)
+def get_all_authors(
+    after_id: int | None = None, limit: int | None = None
+) -> list[Author]:
+    return list(iter_authors(after_id=after_id, limit=limit))
 
 
-def delete_author(author_id: int) -> None:
+def get_all_authors_json(after_id: int | None = None, limit: int | None = None) -> list:
+    with phase("models"):
+        authors = get_all_authors(after_id=after_id, limit=limit)
+    with phase("dump"):
+        return [dump_author(author) for author in authors]
+
+
+def get_all_authors_with_books_json(
+    after_id: int | None = None, limit: int | None = None
+) -> list:
+    with phase("models"):
+        return list(iter_authors_with_books_json(after_id=after_id, limit=limit))
+
+
+def delete_author(
+    author_id: int, if_match: Callable[[str], bool] | None = None
+) -> None:
     """Delete author by its id, and all books of this author.
     :param author_id: id of the author to delete
+    :param if_match: delete only if this predicate accepts current ETag of the author
     :raises Exception: if nothing was deleted
+    :raises PreconditionFailed: if `if_match` rejected the ETag
     """
-    with sqlite3.connect(DATABASE_FILE_PATH) as conn:
+    with get_connection() as conn:
+        # Lock before reading the books, so none is added until they're deleted
+        begin_write(conn)
+        check_etag(lambda: get_author_etag(author_id), if_match)
+
         cursor: sqlite3.Cursor = conn.cursor()
+        book_ids = cursor.execute(
+            """
+            SELECT id FROM books WHERE books.author_id = $1
+            """,
+            [author_id],
+        ).fetchall()
         result = cursor.execute(
             """
             DELETE FROM authors WHERE authors.id = $1
@@ -37,15 +160,27 @@ def delete_author(author_id: int) -> None:
         if not result.rowcount:
             raise Exception(f"Nothing was deleted. Wrong {author_id=}?")
 
+        # Books of the author are deleted by `ON DELETE CASCADE`
+        invalidate_cache(
+            author_key(author_id),
+            author_books_key(author_id),
+            *(book_key(book_id) for (book_id,) in book_ids),
+        )
+
 
 def get_author(author_id: int) -> Author:
-    """Return Author with `author_id`.
+    """Return Author with `author_id` (cached).
     :param author_id: id of the author to return
     :return: Author with `author_id`
     :raises Exception: if author with `author_id` was not found
     """
-    with sqlite3.connect(DATABASE_FILE_PATH) as conn:
+    return read_through(author_key(author_id), lambda: _load_author(author_id))
+
+
+def _load_author(author_id: int) -> Author:
+    with get_connection() as conn:
         cursor: sqlite3.Cursor = conn.cursor()
+        cursor.row_factory = _author_from_row
         cursor.execute(
             """
             SELECT last_name, first_name, id, middle_name
@@ -54,23 +189,78 @@ def get_author(author_id: int) -> Author:
             """,
             [author_id],
         )
-        row = cursor.fetchone()
+        author = cursor.fetchone()
 
-        if not row:
+        if not author:
             raise Exception(f"Author id={author_id} not found.")
 
-        return Author(*row)
+        return author
 
 
 def get_author_json(author_id: int) -> dict:
-    author = get_author(author_id)
-    return AuthorSchema().dump(author)
+    with phase("models"):
+        author = get_author(author_id)
+    with phase("dump"):
+        return dump_author(author)
+
+
+def get_author_with_books(author_id: int) -> tuple[Author, list[Book]]:
+    """Return Author with `author_id` and the author's books (cached under the same keys
+    as `get_author()` and `get_books_by_author()`), loaded with one query on a miss.
+    :param author_id: id of the author to return
+    :return: Author with `author_id` and the author's books ordered by id
+    :raises Exception: if author with `author_id` was not found
+    """
+    cache = get_cache()
+    author = cache.get(author_key(author_id))
+    books = cache.get(author_books_key(author_id))
+    if author is MISSING or books is MISSING:
+        author, books = _load_author_with_books(author_id)
+        if not in_transaction():
+            cache.set(author_key(author_id), author)
+            cache.set(author_books_key(author_id), books)
+    return author, books
+
+
+def _load_author_with_books(author_id: int) -> tuple[Author, list[Book]]:
+    with get_connection() as conn:
+        cursor: sqlite3.Cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT authors.last_name, authors.first_name, authors.id, authors.middle_name,
+                   books.id, books.title
+            FROM authors
+            LEFT JOIN books ON books.author_id = authors.id
+            WHERE authors.id = $1
+            ORDER BY books.id
+            """,
+            [author_id],
+        )
+        rows = cursor.fetchall()
+
+    if not rows:
+        raise Exception(f"Author id={author_id} not found.")
+
+    author = Author(*rows[0][:4])
+    books = [
+        Book(id=book_id, title=book_title, author=author)
+        for *_, book_id, book_title in rows
+        if book_id is not None
+    ]
+    return author, books
+
+
+def get_author_with_books_json(author_id: int) -> dict:
+    with phase("models"):
+        author, books = get_author_with_books(author_id)
+    with phase("dump"):
+        return {**dump_author(author), "books": [dump_book(book) for book in books]}
 
 
 def create_author(
     last_name: str, first_name: str, middle_name: str | None = None
 ) -> Author:
-    with sqlite3.connect(DATABASE_FILE_PATH) as conn:
+    with get_connection() as conn:
         cursor: sqlite3.Cursor = conn.cursor()
         cursor.execute(
             """
@@ -79,6 +269,9 @@ def create_author(
             """,
             [last_name, first_name, middle_name],
         )
+        invalidate_cache(
+            author_key(cursor.lastrowid), author_books_key(cursor.lastrowid)
+        )
 
     return Author(
         id=cursor.lastrowid,
@@ -105,4 +298,4 @@ def create_author_from_payload(payload) -> Author:
 
 def create_author_from_payload_json(payload) -> dict:
     author = create_author_from_payload(payload)
-    return AuthorSchema().dump(author)
+    return dump_author(author)
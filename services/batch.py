@@ -0,0 +1,228 @@
+import sqlite3
+from http import HTTPStatus
+from typing import Any, Iterator
+
+from marshmallow import Schema, ValidationError
+from marshmallow.utils import missing
+
+from core.database import begin_write, get_connection, insert_many, invalidate_cache
+from core.models import (
+    Author,
+    AuthorSchema,
+    Book,
+    BookSchema,
+    compile_load,
+    dump_author,
+    dump_book,
+)
+from services.authors import author_key
+from services.books import author_books_key
+
+MAX_BATCH_SIZE = 100_000
+# Keep `IN (...)` lists below SQLite's limit on the number of query parameters
+MAX_QUERY_PARAMS = 900
+
+
+def load_batch(
+    schema: Schema, payload, partial=None
+) -> tuple[dict[int, Any], dict[int, Any]]:
+    """Load a list of items with a loader compiled from `schema`. Only the items it
+    can't handle (type conversions, invalid items) go through `schema.load()`.
+    :param schema: schema to load the items with
+    :param payload: list of items
+    :param partial: passed to `schema.load()`
+    :return: tuple of loaded items and validation errors, both keyed by item index
+    :raises Exception: if payload is not a list or is too long
+    """
+    if not isinstance(payload, list):
+        raise Exception("Payload must be a list.")
+    if len(payload) > MAX_BATCH_SIZE:
+        raise Exception(f"At most {MAX_BATCH_SIZE} items can be created at once.")
+
+    load = compile_load(schema, partial)
+    loaded, errors = {}, {}
+    for index, item in enumerate(payload):
+        result = load(item)
+        if result is missing:
+            try:
+                result = schema.load(item, partial=partial)
+            except ValidationError as ex:
+                errors[index] = ex.messages
+                continue
+        loaded[index] = result
+    return loaded, errors
+
+
+def create_authors_from_payload_json(payload) -> tuple[list[dict], int]:
+    """
+    Create many authors in one transaction.
+    :param payload: list of `{"last_name": "Lastname", "first_name": "Firstname"}`
+    :return: tuple of per-item results and HTTP status code (201, or 207 if some of the
+    items were not created). Result is `{"status": 201, "author": {...}}` or
+    `{"status": 400, "message": ...}`.
+    """
+    authors, errors = load_batch(AuthorSchema(), payload)
+
+    with get_connection() as conn:
+        begin_write(conn)
+        author_ids = insert_many(
+            conn,
+            "authors",
+            ("last_name", "first_name", "middle_name"),
+            [
+                (author.last_name, author.first_name, author.middle_name)
+                for author in authors.values()
+            ],
+        )
+        # Like `create_author`: books of a missing author may be cached as an empty list
+        invalidate_cache(
+            *(author_key(author_id) for author_id in author_ids),
+            *(author_books_key(author_id) for author_id in author_ids),
+        )
+
+    for author, author_id in zip(authors.values(), author_ids):
+        author.id = author_id
+
+    return _results("author", dump_author, authors, errors)
+
+
+def create_books_from_payload_json(payload) -> tuple[list[dict], int]:
+    """
+    Create many books (and their authors, if no author.id passed) in one transaction.
+    Authors are looked up by name first, and only missing ones are created, once each.
+    :param payload: list of `{"title": "Book title", "author": {"id": 1}}` or
+    `{"title": "Book title", "author": {"last_name": "Lastname", "first_name": "Firstname"}}`
+    :return: tuple of per-item results and HTTP status code (201, or 207 if some of the
+    items were not created). Result is `{"status": 201, "book": {...}}` or
+    `{"status": 400, "message": ...}`.
+    """
+    books, errors = load_batch(
+        BookSchema(),
+        payload,
+        # The only required field is book title
+        partial={"id", "author.id", "author.last_name", "author.first_name"},
+    )
+    for index, book in list(books.items()):
+        if message := _check_book(book):
+            errors[index] = message
+            del books[index]
+
+    with get_connection() as conn:
+        begin_write(conn)
+
+        ids = {book["author"].id for book in books.values()} - {None}
+        authors_by_id = {
+            row[2]: Author(*row)
+            for row in _select_in(
+                conn,
+                "SELECT last_name, first_name, id, middle_name FROM authors "
+                "WHERE id IN ({})",
+                list(ids),
+            )
+        }
+        for index, book in list(books.items()):
+            if book["author"].id is not None and book["author"].id not in authors_by_id:
+                errors[index] = f"Author id={book['author'].id} not found."
+                del books[index]
+
+        authors_by_name = _get_or_create_authors_by_name(
+            conn,
+            [
+                _name(book["author"])
+                for book in books.values()
+                if book["author"].id is None
+            ],
+        )
+
+        created = {}
+        for index, book in books.items():
+            author = book["author"]
+            author = (
+                authors_by_name[_name(author)]
+                if author.id is None
+                else authors_by_id[author.id]
+            )
+            created[index] = Book(id=None, title=book["title"], author=author)
+
+        book_ids = insert_many(
+            conn,
+            "books",
+            ("author_id", "title"),
+            [(book.author.id, book.title) for book in created.values()],
+        )
+        invalidate_cache(
+            *{author_books_key(book.author.id) for book in created.values()}
+        )
+
+    for book, book_id in zip(created.values(), book_ids):
+        book.id = book_id
+
+    return _results("book", dump_book, created, errors)
+
+
+def _check_book(book: dict) -> str | None:
+    """Return error message if the book can't be created."""
+    if "title" not in book:
+        return "Title is required."
+
+    author = book.get("author", None)
+    if author is None:
+        return "Author is required."
+    if author.id is None:
+        if len(author.last_name) < 3:
+            return "Author last name is too short."
+        if len(author.first_name) < 3:
+            return "Author first name is too short."
+    return None
+
+
+def _name(author: Author) -> tuple[str, str, str]:
+    # Authors without a middle name are stored with both NULL and '' (initial data)
+    return author.last_name, author.first_name, author.middle_name or ""
+
+
+def _get_or_create_authors_by_name(
+    conn: sqlite3.Connection, names: list[tuple[str, str, str]]
+) -> dict[tuple, Author]:
+    names = list(dict.fromkeys(names))
+    authors = {}
+    for row in _select_in(
+        conn,
+        "SELECT last_name, first_name, id, middle_name FROM authors "
+        "WHERE last_name IN ({}) ORDER BY id",
+        list({last_name for last_name, _, _ in names}),
+    ):
+        author = Author(*row)
+        authors.setdefault(_name(author), author)
+
+    new_names = [name for name in names if name not in authors]
+    author_ids = insert_many(
+        conn, "authors", ("last_name", "first_name", "middle_name"), new_names
+    )
+    for name, author_id in zip(new_names, author_ids):
+        authors[name] = Author(*name[:2], id=author_id, middle_name=name[2])
+    return authors
+
+
+def _select_in(conn: sqlite3.Connection, query: str, values: list) -> Iterator[tuple]:
+    """Run `query` with `IN ({})` placeholder for `values`, in chunks."""
+    for start in range(0, len(values), MAX_QUERY_PARAMS):
+        chunk = values[start : start + MAX_QUERY_PARAMS]
+        yield from conn.execute(query.format(", ".join("?" * len(chunk))), chunk)
+
+
+def _results(
+    name: str, dump, created: dict[int, Any], errors: dict[int, Any]
+) -> tuple[list[dict], int]:
+    created_status, error_status = (
+        HTTPStatus.CREATED.value,
+        HTTPStatus.BAD_REQUEST.value,
+    )
+    results = [None] * (len(created) + len(errors))
+    for index, item in created.items():
+        results[index] = {"status": created_status, name: dump(item)}
+    for index, message in errors.items():
+        results[index] = {"status": error_status, "message": message}
+
+    status = HTTPStatus.MULTI_STATUS if errors else HTTPStatus.CREATED
+    return results, status
@@ -1,52 +1,148 @@
+import re
 import sqlite3
+from typing import Callable, Iterator
 
-from core.database import DATABASE_FILE_PATH
-from core.models import Author, Book, BookSchema
+from core.database import begin_write, get_connection, invalidate_cache, read_through
+from core.models import Author, Book, BookSchema, dump_book
+from core.profiling import phase
+from services.versions import check_etag, get_book_etag
 
 
-def get_all_books() -> list[Book]:
-    with sqlite3.connect(DATABASE_FILE_PATH) as conn:
+def _book_row_factory() -> Callable[[sqlite3.Cursor, tuple], Book]:
+    """Return row factory building a `Book` from a `(book id, title, author id,
+    last name, first name, middle name)` row. Books of the same author share one
+    `Author` instance, so use a new factory for every result set.
+    """
+    authors: dict[int, Author] = {}
+
+    def book_from_row(cursor: sqlite3.Cursor, row: tuple) -> Book:
+        book_id, title, author_id, last_name, first_name, middle_name = row
+        author = authors.get(author_id)
+        if author is None:
+            author = authors[author_id] = Author(
+                last_name, first_name, author_id, middle_name
+            )
+        return Book(book_id, title, author)
+
+    return book_from_row
+
+
+def iter_books(
+    after_id: int | None = None, limit: int | None = None, batch_size: int = 500
+) -> Iterator[Book]:
+    """Yield books ordered by id, fetching rows from the cursor in batches.
+    :param after_id: keyset cursor - only books with greater id are returned
+    :param limit: maximum number of books to return; all books if None
+    :param batch_size: number of rows to fetch from the cursor at once
+    """
+    query = """
+        SELECT books.id, books.title, authors.id, authors.last_name, authors.first_name, authors.middle_name
+        FROM books
+        JOIN authors ON  books.author_id = authors.id
+        """
+    params = []
+    if after_id is not None:
+        query += " WHERE books.id > ?"
+        params.append(after_id)
+    query += " ORDER BY books.id LIMIT ?"
+    params.append(-1 if limit is None else limit)
+
+    with get_connection() as conn:
+        cursor: sqlite3.Cursor = conn.cursor()
+        cursor.row_factory = _book_row_factory()
+        cursor.execute(query, params)
+        while books := cursor.fetchmany(batch_size):
+            yield from books
+
+
+def iter_books_json(
+    after_id: int | None = None, limit: int | None = None
+) -> Iterator[dict]:
+    for book in iter_books(after_id=after_id, limit=limit):
+        yield dump_book(book)
+
+
+def get_all_books(after_id: int | None = None, limit: int | None = None) -> list[Book]:
+    return list(iter_books(after_id=after_id, limit=limit))
+
+
+def get_all_books_json(after_id: int | None = None, limit: int | None = None) -> list:
+    with phase("models"):
+        books = get_all_books(after_id=after_id, limit=limit)
+    with phase("dump"):
+        return [dump_book(book) for book in books]
+
+
+def search_books(query: str, limit: int, offset: int = 0) -> list[Book]:
+    """Return books matching all words of `query` in their title or author name,
+    best matches first. Every word matches as a prefix, e.g. `refact fowl`.
+    :param query: words to search for, anything else is ignored
+    :param limit: maximum number of books to return
+    :param offset: number of best matching books to skip
+    """
+    match = _fts_query(query)
+    if match is None:
+        return []
+
+    # Rank and cut the page in the FTS table first, so only the page is joined
+    with get_connection() as conn:
         cursor: sqlite3.Cursor = conn.cursor()
+        cursor.row_factory = _book_row_factory()
         cursor.execute(
             """
             SELECT books.id, books.title, authors.id, authors.last_name, authors.first_name, authors.middle_name
-            FROM books
-            JOIN authors ON  books.author_id = authors.id
-            """
+            FROM (
+                SELECT rowid, rank FROM books_search
+                WHERE books_search MATCH ?
+                ORDER BY rank, rowid
+                LIMIT ? OFFSET ?
+            ) AS found
+            JOIN books ON books.id = found.rowid
+            JOIN authors ON books.author_id = authors.id
+            ORDER BY found.rank, books.id
+            """,
+            [match, limit, offset],
         )
-        results = []
-        for row in cursor.fetchall():
-            (
-                book_id,
-                book_title,
-                author_id,
-                author_last_name,
-                author_first_name,
-                author_middle_name,
-            ) = row
-            results.append(
-                Book(
-                    id=book_id,
-                    title=book_title,
-                    author=Author(
-                        id=author_id,
-                        last_name=author_last_name,
-                        first_name=author_first_name,
-                        middle_name=author_middle_name,
-                    ),
-                )
-            )
-        return results
+        return cursor.fetchall()
 
 
-def get_all_books_json() -> list:
-    books = get_all_books()
-    return BookSchema().dump(books, many=True)
+def search_books_json(query: str, limit: int, offset: int = 0) -> list:
+    with phase("models"):
+        books = search_books(query, limit, offset)
+    with phase("dump"):
+        return [dump_book(book) for book in books]
+
+
+def _fts_query(query: str) -> str | None:
+    """Turn user input into FTS5 query matching all of its words as prefixes.
+    Words are quoted, so that FTS5 operators and syntax in the input are not
+    interpreted.
+    """
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def book_key(book_id: int) -> str:
+    return f"book:{int(book_id)}"
+
+
+def author_books_key(author_id: int) -> str:
+    return f"author_books:{int(author_id)}"
 
 
 def get_books_by_author(author_id: int) -> list[Book]:
-    with sqlite3.connect(DATABASE_FILE_PATH) as conn:
+    """Return books of the author with `author_id` (cached)."""
+    return read_through(
+        author_books_key(author_id), lambda: _load_books_by_author(author_id)
+    )
+
+
+def _load_books_by_author(author_id: int) -> list[Book]:
+    with get_connection() as conn:
         cursor: sqlite3.Cursor = conn.cursor()
+        cursor.row_factory = _book_row_factory()
         cursor.execute(
             """
             SELECT books.id, books.title, authors.id, authors.last_name, authors.first_name, authors.middle_name
@@ -56,44 +152,29 @@ def get_books_by_author(author_id: int) -> list[Book]:
             """,
             [author_id],
         )
-        results = []
-        for row in cursor.fetchall():
-            (
-                book_id,
-                book_title,
-                author_id,
-                author_last_name,
-                author_first_name,
-                author_middle_name,
-            ) = row
-            results.append(
-                Book(
-                    id=book_id,
-                    title=book_title,
-                    author=Author(
-                        id=author_id,
-                        last_name=author_last_name,
-                        first_name=author_first_name,
-                        middle_name=author_middle_name,
-                    ),
-                )
-            )
-        return results
+        return cursor.fetchall()
 
 
 def get_books_by_author_json(author_id: int) -> list:
-    books = get_books_by_author(author_id)
-    return BookSchema().dump(books, many=True)
+    with phase("models"):
+        books = get_books_by_author(author_id)
+    with phase("dump"):
+        return [dump_book(book) for book in books]
 
 
 def get_book(book_id: int) -> Book:
-    """Return Book with `book_id`
+    """Return Book with `book_id` (cached)
     :param book_id: id of the book to return
     :return: Book with `book_id`
     :raises Exception: if book with `book_id` was not found
     """
-    with sqlite3.connect(DATABASE_FILE_PATH) as conn:
+    return read_through(book_key(book_id), lambda: _load_book(book_id))
+
+
+def _load_book(book_id: int) -> Book:
+    with get_connection() as conn:
         cursor: sqlite3.Cursor = conn.cursor()
+        cursor.row_factory = _book_row_factory()
         cursor.execute(
             """
             SELECT books.id, books.title, authors.id, authors.last_name, authors.first_name, authors.middle_name
@@ -103,40 +184,25 @@ def get_book(book_id: int) -> Book:
             """,
             [book_id],
         )
-        row = cursor.fetchone()
+        book = cursor.fetchone()
 
-        if not row:
+        if not book:
             raise Exception(f"Book id={book_id} not found.")
 
-        (
-            book_id,
-            book_title,
-            author_id,
-            author_last_name,
-            author_first_name,
-            author_middle_name,
-        ) = row
-        return Book(
-            id=book_id,
-            title=book_title,
-            author=Author(
-                id=author_id,
-                last_name=author_last_name,
-                first_name=author_first_name,
-                middle_name=author_middle_name,
-            ),
-        )
+        return book
 
 
 def get_book_json(book_id: int) -> str:
-    book = get_book(book_id)
-    return BookSchema().dump(book)
+    with phase("models"):
+        book = get_book(book_id)
+    with phase("dump"):
+        return dump_book(book)
 
 
 def create_book(title: str, author_id: int) -> Book:
-    new_book_id = None
-
-    with sqlite3.connect(DATABASE_FILE_PATH) as conn:
+    # The book is read back in this thread's transaction, bypassing the cache, as it
+    # is not committed yet
+    with get_connection() as conn:
         cursor: sqlite3.Cursor = conn.cursor()
         result = cursor.execute(
             """
@@ -148,27 +214,35 @@ def create_book(title: str, author_id: int) -> Book:
         if not result.rowcount:
             raise Exception("Book was not created.")
 
-        new_book_id = result.lastrowid
-
-    return get_book(book_id=new_book_id)
+        invalidate_cache(book_key(result.lastrowid), author_books_key(author_id))
+        return _load_book(result.lastrowid)
 
 
 def update_book(
-    book_id: int, title: str | None = None, author_id: int | None = None
+    book_id: int,
+    title: str | None = None,
+    author_id: int | None = None,
+    if_match: Callable[[str], bool] | None = None,
 ) -> Book:
     """
     Update book title, author ID, or both.
     :param book_id: book to update
     :param title: new book title to set
     :param author_id: new author ID to set
+    :param if_match: update only if this predicate accepts current ETag of the book
     :return: updated `Book` instance
+    :raises PreconditionFailed: if `if_match` rejected the ETag
     """
-    book = get_book(book_id)
+    with get_connection() as conn:
+        if if_match is not None:
+            begin_write(conn)
+            check_etag(lambda: get_book_etag(book_id), if_match)
 
-    new_title = title if title is not None else book.title
-    new_author_id = author_id if author_id is not None else book.author.id
+        book = _load_book(book_id)
+
+        new_title = title if title is not None else book.title
+        new_author_id = author_id if author_id is not None else book.author.id
 
-    with sqlite3.connect(DATABASE_FILE_PATH) as conn:
         cursor: sqlite3.Cursor = conn.cursor()
         result = cursor.execute(
             """
@@ -181,17 +255,24 @@ def update_book(
         if not result.rowcount:
             raise Exception("Book was not updated.")
 
-    book.title = new_title
-    book.author.id = new_author_id
-
-    return book
+        invalidate_cache(
+            book_key(book_id),
+            author_books_key(book.author.id),
+            author_books_key(new_author_id),
+        )
+        # Cached books are shared, so re-read the book instead of modifying it. The
+        # cache is bypassed, as the update is not committed yet.
+        return _load_book(book_id)
 
 
-def update_book_from_payload_json(book_id: int, payload) -> dict:
+def update_book_from_payload_json(
+    book_id: int, payload, if_match: Callable[[str], bool] | None = None
+) -> dict:
     """
     Update book title, author ID, or both.
     :param book_id: book to update
     :param payload: example - `{"title": "New title", "author": {"id": 1}}`.
+    :param if_match: update only if this predicate accepts current ETag of the book
     :return: JSON-serializable updated book data
     """
     book = BookSchema().load(payload, partial=True)
@@ -204,22 +285,32 @@ def update_book_from_payload_json(book_id: int, payload) -> dict:
         book_id,
         title=book.get("title", None),
         author_id=author_id,
+        if_match=if_match,
     )
-    return BookSchema().dump(updated_book)
+    return dump_book(updated_book)
 
 
-def delete_book(book_id: int) -> None:
+def delete_book(book_id: int, if_match: Callable[[str], bool] | None = None) -> None:
     """Delete book by its id.
     :param book_id: id of the book to delete
+    :param if_match: delete only if this predicate accepts current ETag of the book
     :raises Exception: if nothing was deleted
+    :raises PreconditionFailed: if `if_match` rejected the ETag
     """
-    with sqlite3.connect(DATABASE_FILE_PATH) as conn:
+    with get_connection() as conn:
+        if if_match is not None:
+            begin_write(conn)
+            check_etag(lambda: get_book_etag(book_id), if_match)
+
         cursor: sqlite3.Cursor = conn.cursor()
-        result = cursor.execute(
+        deleted = cursor.execute(
             """
             DELETE FROM books WHERE books.id = $1
+            RETURNING author_id
             """,
             [book_id],
-        )
-        if not result.rowcount:
+        ).fetchall()
+        if not deleted:
             raise Exception(f"Nothing was deleted. Wrong {book_id=}?")
+
+        invalidate_cache(book_key(book_id), author_books_key(deleted[0][0]))
@@ -1,6 +1,10 @@
-from core.models import Book, BookSchema
+from typing import Callable
+
+from core.database import begin_write, get_connection
+from core.models import Book, BookSchema, dump_book
 from services.authors import create_author
-from services.books import create_book, get_book, update_book
+from services.books import create_book, update_book
+from services.versions import check_etag, get_book_etag
 
 
 def create_book_and_author_from_payload(payload) -> Book:
@@ -18,22 +22,24 @@ def create_book_and_author_from_payload(payload) -> Book:
 
     author_id = book["author"].id
 
-    # If there's no author id in payload, then create new author and get its id
-    if author_id is None:
-        if len(book["author"].last_name) < 3:
-            raise Exception(f"Author last name is too short.")
+    # Author and book are created on one pooled connection, in one transaction
+    with get_connection():
+        # If there's no author id in payload, then create new author and get its id
+        if author_id is None:
+            if len(book["author"].last_name) < 3:
+                raise Exception(f"Author last name is too short.")
 
-        if len(book["author"].first_name) < 3:
-            raise Exception(f"Author first name is too short.")
+            if len(book["author"].first_name) < 3:
+                raise Exception(f"Author first name is too short.")
 
-        author = create_author(
-            last_name=book["author"].last_name,
-            first_name=book["author"].first_name,
-            middle_name=book["author"].middle_name,
-        )
-        author_id = author.id
+            author = create_author(
+                last_name=book["author"].last_name,
+                first_name=book["author"].first_name,
+                middle_name=book["author"].middle_name,
+            )
+            author_id = author.id
 
-    return create_book(title=book["title"], author_id=author_id)
+        return create_book(title=book["title"], author_id=author_id)
 
 
 def create_book_and_author_from_payload_json(payload) -> dict:
@@ -44,15 +50,19 @@ def create_book_and_author_from_payload_json(payload) -> dict:
     :return: JSON-serializable dict with newly created book data
     """
     book = create_book_and_author_from_payload(payload)
-    return BookSchema().dump(book)
+    return dump_book(book)
 
 
-def update_or_create_book_from_payload_json(book_id: int, payload) -> (dict, int):
+def update_or_create_book_from_payload_json(
+    book_id: int, payload, if_match: Callable[[str], bool] | None = None
+) -> (dict, int):
     """
     Update existing or create new book.
     :param book_id: book to update; if there's no book with such ID, new book will be created (ID will be assigned by database).
     :param payload: title field is required to update; title, author id | first + last name to create.
+    :param if_match: update only if this predicate accepts current ETag of the book
     :return: tuple of JSON-serializable updated book data and HTTP status code (200 or 201)
+    :raises PreconditionFailed: if `if_match` rejected the ETag (or there's no such book)
     """
     book_data = BookSchema().load(
         payload,
@@ -65,14 +75,18 @@ def update_or_create_book_from_payload_json(book_id: int, payload) -> (dict, int
         },
     )
 
-    try:
-        book = get_book(book_id)
-        # Book exists - update it
+    with get_connection() as conn:
+        if if_match is not None:
+            begin_write(conn)
+            check_etag(lambda: get_book_etag(book_id), if_match)
+
+        # Only a missing book is created: errors of the update itself are raised
+        exists = conn.execute("SELECT 1 FROM books WHERE id = ?", [book_id]).fetchone()
+        if not exists:
+            book = create_book_and_author_from_payload(payload)
+            return dump_book(book), 201
+
         author = book_data.get("author", None)
         author_id = author.id if author else None
         book = update_book(book_id, title=book_data.get("title"), author_id=author_id)
-        return BookSchema().dump(book), 200
-    except:
-        # Book does not exist - create it
-        book = create_book_and_author_from_payload(payload)
-        return BookSchema().dump(book), 201
+        return dump_book(book), 200
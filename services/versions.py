@@ -0,0 +1,115 @@
+import sqlite3
+from datetime import datetime, timezone
+
+from core.database import get_connection
+
+# ETags are built from row versions and table change counters kept up to date by
+# triggers (see `core.migrations.VERSIONING_DDL`), so they never need the data itself.
+
+
+class PreconditionFailed(Exception):
+    """Raised when the resource doesn't match the ETag required by the client."""
+
+
+def get_books_etag() -> tuple[str, datetime]:
+    """Return ETag and last modification time of the list of books."""
+    (books_version, authors_version), updated_at = _get_table_versions(
+        "books", "authors"
+    )
+    return f"books-{books_version}-{authors_version}", updated_at
+
+
+def get_authors_etag() -> tuple[str, datetime]:
+    """Return ETag and last modification time of the list of authors."""
+    (authors_version,), updated_at = _get_table_versions("authors")
+    return f"authors-{authors_version}", updated_at
+
+
+def get_authors_with_books_etag() -> tuple[str, datetime]:
+    """Return ETag and last modification time of the list of authors with their books."""
+    (authors_version, books_version), updated_at = _get_table_versions(
+        "authors", "books"
+    )
+    return f"authors-books-{authors_version}-{books_version}", updated_at
+
+
+def get_book_etag(book_id: int) -> tuple[str, datetime]:
+    """Return ETag and last modification time of the book with `book_id`.
+    :raises Exception: if book with `book_id` was not found
+    """
+    with get_connection() as conn:
+        row = conn.execute(
+            """
+            SELECT books.id, books.version, max(b.updated_at, a.updated_at)
+            FROM books, table_versions AS b, table_versions AS a
+            WHERE books.id = $1 AND b.name = 'books' AND a.name = 'authors'
+            """,
+            [book_id],
+        ).fetchone()
+
+    if not row:
+        raise Exception(f"Book id={book_id} not found.")
+
+    book_id, version, updated_at = row
+    return f"book-{book_id}-{version}", _to_datetime(updated_at)
+
+
+def get_author_etag(author_id: int) -> tuple[str, datetime]:
+    """Return ETag and last modification time of the author with `author_id`,
+    including the author's books.
+    :raises Exception: if author with `author_id` was not found
+    """
+    with get_connection() as conn:
+        row = conn.execute(
+            """
+            SELECT authors.id, authors.version, b.version,
+                   max(b.updated_at, a.updated_at)
+            FROM authors, table_versions AS b, table_versions AS a
+            WHERE authors.id = $1 AND b.name = 'books' AND a.name = 'authors'
+            """,
+            [author_id],
+        ).fetchone()
+
+    if not row:
+        raise Exception(f"Author id={author_id} not found.")
+
+    author_id, version, books_version, updated_at = row
+    return f"author-{author_id}-{version}-{books_version}", _to_datetime(updated_at)
+
+
+def check_etag(get_etag, if_match) -> None:
+    """Ensure the resource matches `If-Match` precondition, if there is one.
+    :param get_etag: function returning `(etag, last_modified)` of the resource
+    :param if_match: predicate checking the current ETag, or None to skip the check
+    :raises PreconditionFailed: if the resource does not exist or its ETag doesn't match
+    """
+    if if_match is None:
+        return
+
+    try:
+        etag, _ = get_etag()
+    except Exception:
+        raise PreconditionFailed("Resource does not exist.")
+
+    if not if_match(etag):
+        raise PreconditionFailed(f"Resource was modified, current ETag is {etag}.")
+
+
+def _get_table_versions(*names: str) -> tuple[list[int], datetime]:
+    with get_connection() as conn:
+        cursor: sqlite3.Cursor = conn.execute(
+            f"""
+            SELECT name, version, updated_at FROM table_versions
+            WHERE name IN ({", ".join("?" * len(names))})
+            """,
+            names,
+        )
+        rows = {name: (version, updated_at) for name, version, updated_at in cursor}
+
+    versions = [rows[name][0] for name in names]
+    updated_at = max(rows[name][1] for name in names)
+    return versions, _to_datetime(updated_at)
+
+
+def _to_datetime(timestamp: int) -> datetime:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
@@ -0,0 +1,102 @@
+import asyncio
+import os
+import unittest
+from http import HTTPStatus
+
+from books_app import app
+from books_asgi import app as asgi_app
+from core.database import DATABASE_FILE_PATH, delete_db, init_db
+
+
+def asgi_get(path: str, query_string: str = "", headers: dict = None):
+    """Send GET request to the ASGI app, return status, headers and body."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query_string.encode(),
+        "root_path": "",
+        "headers": [
+            (name.lower().encode(), value.encode())
+            for name, value in (headers or {}).items()
+        ],
+        "server": ("testserver", 80),
+        "client": ("127.0.0.1", 12345),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(asgi_app(scope, receive, send))
+
+    start = messages[0]
+    response_headers = {
+        name.decode().lower(): value.decode() for name, value in start["headers"]
+    }
+    body = b"".join(message.get("body", b"") for message in messages[1:])
+    return start["status"], response_headers, body
+
+
+class TestAsgiApp(unittest.TestCase):
+    def setUp(self) -> None:
+        delete_db()
+        init_db()
+        self.app = app.test_client()
+
+    def test_same_responses_as_wsgi_app(self):
+        for path in (
+            "/api/books/",
+            "/api/books/1",
+            "/api/authors/1",
+            "/apispec_1.json",
+        ):
+            expected = self.app.get(path)
+            status, headers, body = asgi_get(path)
+
+            self.assertEqual(HTTPStatus.OK, status, path)
+            self.assertEqual(expected.data, body, path)
+            self.assertEqual(expected.headers.get("ETag"), headers.get("etag"), path)
+
+    def test_not_found(self):
+        status, _, _ = asgi_get("/api/books/1000")
+        self.assertEqual(HTTPStatus.NOT_FOUND, status)
+
+    def test_streamed_list(self):
+        expected = self.app.get(
+            "/api/books/", headers={"Accept": "application/x-ndjson"}
+        )
+        status, headers, body = asgi_get(
+            "/api/books/", headers={"Accept": "application/x-ndjson"}
+        )
+
+        self.assertEqual(HTTPStatus.OK, status)
+        self.assertEqual("application/x-ndjson", headers["content-type"])
+        self.assertEqual(expected.data, body)
+
+    def test_database_is_created_on_startup(self):
+        delete_db()
+        received = iter([{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}])
+        sent = []
+
+        async def receive():
+            return next(received)
+
+        async def send(message):
+            sent.append(message["type"])
+
+        asyncio.run(asgi_app({"type": "lifespan"}, receive, send))
+
+        self.assertEqual(
+            ["lifespan.startup.complete", "lifespan.shutdown.complete"], sent
+        )
+        self.assertTrue(os.path.exists(DATABASE_FILE_PATH))
+        status, _, _ = asgi_get("/api/books/1")
+        self.assertEqual(HTTPStatus.OK, status)
@@ -2,6 +2,8 @@ import unittest
 
 from books_app import app
 from core.database import delete_db, init_db
+from services.authors import get_author_json
+from services.books import get_books_by_author_json
 
 
 class TestAuthorsEndpoint(unittest.TestCase):
@@ -34,3 +36,108 @@ class TestAuthorsEndpoint(unittest.TestCase):
     def test_delete_author(self):
         response = self.app.delete(self.base_url + "/2")
         self.assertEqual(response.status_code, 204)
+
+    def test_get_author_list_paginated(self):
+        response = self.app.get(self.base_url + "/?after_id=1&limit=1")
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(1, len(response.json))
+        self.assertEqual(2, response.json[0]["id"])
+        self.assertIn("after_id=2", response.headers["Link"])
+
+    def test_get_author_list_streamed(self):
+        response = self.app.get(
+            self.base_url + "/", headers={"Accept": "application/x-ndjson"}
+        )
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(3, len(response.text.splitlines()))
+
+    def test_get_author_not_modified(self):
+        response = self.app.get(self.base_url + "/1")
+        etag = response.headers["ETag"]
+
+        response = self.app.get(self.base_url + "/1", headers={"If-None-Match": etag})
+        self.assertEqual(304, response.status_code)
+
+        # Author's representation includes the author's books
+        self.app.post("/api/books/", json={"title": "New Book", "author": {"id": 1}})
+        response = self.app.get(self.base_url + "/1", headers={"If-None-Match": etag})
+        self.assertEqual(200, response.status_code)
+        self.assertIn("New Book", response.text)
+
+    def test_delete_author_if_match(self):
+        response = self.app.delete(self.base_url + "/2", headers={"If-Match": '"x"'})
+        self.assertEqual(412, response.status_code)
+
+        etag = self.app.get(self.base_url + "/2").headers["ETag"]
+        response = self.app.delete(self.base_url + "/2", headers={"If-Match": etag})
+        self.assertEqual(204, response.status_code)
+
+    def test_post_authors_batch(self):
+        response = self.app.post(
+            self.base_url + "/batch",
+            json=[
+                {"last_name": "Pushkin", "first_name": "Alexander"},
+                {"first_name": "Nameless"},
+            ],
+        )
+        self.assertEqual(207, response.status_code)
+        self.assertEqual(201, response.json[0]["status"])
+        self.assertEqual(400, response.json[1]["status"])
+
+        author_id = response.json[0]["author"]["id"]
+        response = self.app.get(self.base_url + f"/{author_id}")
+        self.assertIn("Pushkin", response.text)
+
+    def test_get_author_with_books(self):
+        response = self.app.get(self.base_url + "/1")
+        books = get_books_by_author_json(1)
+        self.assertEqual(
+            {**get_author_json(1), "books": sorted(books, key=lambda book: book["id"])},
+            response.json,
+        )
+
+        response = self.app.post(
+            self.base_url + "/", json={"last_name": "Pushkin", "first_name": "A"}
+        )
+        response = self.app.get(self.base_url + f"/{response.json['id']}")
+        self.assertEqual([], response.json["books"])
+
+    def test_get_author_list_with_books(self):
+        self.app.post(
+            self.base_url + "/", json={"last_name": "Pushkin", "first_name": "A"}
+        )
+        response = self.app.get(self.base_url + "/?include=books")
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(
+            [
+                self.app.get(self.base_url + f"/{author['id']}").json
+                for author in response.json
+            ],
+            response.json,
+        )
+        self.assertEqual([], response.json[-1]["books"])
+
+        response = self.app.get(self.base_url + "/?include=books&after_id=1&limit=1")
+        self.assertEqual([2], [author["id"] for author in response.json])
+        self.assertIn("include=books", response.headers["Link"])
+
+        response = self.app.get(
+            self.base_url + "/?include=books",
+            headers={"Accept": "application/x-ndjson"},
+        )
+        self.assertEqual(4, len(response.text.splitlines()))
+
+    def test_get_author_list_with_books_not_modified(self):
+        etag = self.app.get(self.base_url + "/?include=books").headers["ETag"]
+        self.assertNotEqual(etag, self.app.get(self.base_url + "/").headers["ETag"])
+
+        self.app.post("/api/books/", json={"title": "New Book", "author": {"id": 1}})
+        response = self.app.get(
+            self.base_url + "/?include=books", headers={"If-None-Match": etag}
+        )
+        self.assertEqual(200, response.status_code)
+        self.assertIn("New Book", response.text)
+
+    def test_get_author_list_include_unknown(self):
+        response = self.app.get(self.base_url + "/?include=reviews")
+        self.assertEqual(400, response.status_code)
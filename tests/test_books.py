@@ -1,8 +1,12 @@
+import sqlite3
 import unittest
 from http import HTTPStatus
+from unittest import mock
 
 from books_app import app
 from core.database import INITIAL_AUTHORS, INITIAL_BOOKS, delete_db, init_db
+from services import books as books_service
+from services import common
 
 
 class TestBooksEndpoint(unittest.TestCase):
@@ -198,6 +202,21 @@ class TestBooksEndpoint(unittest.TestCase):
         self.assertEqual(HTTPStatus.OK, response.status_code)
         self.assertIn(new_book_title, response.text)
 
+    def test_put_book_failed_update_does_not_create_book(self):
+        book_id = INITIAL_BOOKS[0]["id"]
+        with mock.patch.object(
+            common, "update_book", side_effect=sqlite3.OperationalError("locked")
+        ):
+            response = self.app.put(
+                self.base_url + f"/{book_id}",
+                json={"title": "New", "author": {"id": INITIAL_BOOKS[0]["author_id"]}},
+            )
+
+        self.assertEqual(HTTPStatus.BAD_REQUEST, response.status_code)
+        response = self.app.get(self.base_url + "/")
+        self.assertEqual(len(INITIAL_BOOKS), len(response.json))
+        self.assertEqual(INITIAL_BOOKS[0]["title"], response.json[0]["title"])
+
     def test_put_book_updates_author(self):
         book_id = INITIAL_BOOKS[0]["id"]
         new_author_id = INITIAL_BOOKS[0]["author_id"] + 1
@@ -212,3 +231,254 @@ class TestBooksEndpoint(unittest.TestCase):
         )
 
         self.assertEqual(HTTPStatus.OK, response.status_code)
+
+    def test_get_books_list_paginated(self):
+        response = self.app.get(self.base_url + "/?limit=2")
+        self.assertEqual(HTTPStatus.OK, response.status_code)
+        self.assertEqual(
+            [book["id"] for book in INITIAL_BOOKS[:2]],
+            [book["id"] for book in response.json],
+        )
+        self.assertIn("after_id=1", response.headers["Link"])
+
+        response = self.app.get(self.base_url + "/?limit=2&after_id=1")
+        self.assertEqual(
+            [book["id"] for book in INITIAL_BOOKS[2:]],
+            [book["id"] for book in response.json],
+        )
+        self.assertNotIn("Link", response.headers)
+
+    def test_get_books_list_wrong_page_args(self):
+        response = self.app.get(self.base_url + "/?after_id=first")
+        self.assertEqual(HTTPStatus.BAD_REQUEST, response.status_code)
+
+        response = self.app.get(self.base_url + "/?limit=0")
+        self.assertEqual(HTTPStatus.BAD_REQUEST, response.status_code)
+
+    def test_get_books_list_streamed(self):
+        expected = self.app.get(self.base_url + "/")
+
+        response = self.app.get(self.base_url + "/?stream=1")
+        self.assertEqual(HTTPStatus.OK, response.status_code)
+        self.assertEqual(expected.json, response.json)
+
+    def test_get_books_list_ndjson(self):
+        response = self.app.get(
+            self.base_url + "/?after_id=0",
+            headers={"Accept": "application/x-ndjson"},
+        )
+        self.assertEqual("application/x-ndjson", response.mimetype)
+        lines = response.text.splitlines()
+        self.assertEqual(len(INITIAL_BOOKS) - 1, len(lines))
+        self.assertIn(INITIAL_BOOKS[1]["title"], lines[0])
+
+    def test_get_book_not_modified(self):
+        url = self.base_url + f"/{INITIAL_BOOKS[0]['id']}"
+        response = self.app.get(url)
+        etag = response.headers["ETag"]
+
+        response = self.app.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(HTTPStatus.NOT_MODIFIED, response.status_code)
+        self.assertEqual(etag, response.headers["ETag"])
+
+        self.app.patch(url, json={"title": "Updated Book Title"})
+        response = self.app.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(HTTPStatus.OK, response.status_code)
+        self.assertNotEqual(etag, response.headers["ETag"])
+
+    def test_get_books_list_not_modified(self):
+        response = self.app.get(self.base_url + "/")
+        etag = response.headers["ETag"]
+        last_modified = response.headers["Last-Modified"]
+
+        response = self.app.get(self.base_url + "/", headers={"If-None-Match": etag})
+        self.assertEqual(HTTPStatus.NOT_MODIFIED, response.status_code)
+        response = self.app.get(
+            self.base_url + "/", headers={"If-Modified-Since": last_modified}
+        )
+        self.assertEqual(HTTPStatus.NOT_MODIFIED, response.status_code)
+
+        self.app.delete(self.base_url + f"/{INITIAL_BOOKS[0]['id']}")
+        response = self.app.get(self.base_url + "/", headers={"If-None-Match": etag})
+        self.assertEqual(HTTPStatus.OK, response.status_code)
+
+    def test_patch_book_if_match(self):
+        url = self.base_url + f"/{INITIAL_BOOKS[0]['id']}"
+        etag = self.app.get(url).headers["ETag"]
+
+        response = self.app.patch(
+            url, json={"title": "First update"}, headers={"If-Match": etag}
+        )
+        self.assertEqual(HTTPStatus.OK, response.status_code)
+        self.assertNotEqual(etag, response.headers["ETag"])
+
+        response = self.app.patch(
+            url, json={"title": "Lost update"}, headers={"If-Match": etag}
+        )
+        self.assertEqual(HTTPStatus.PRECONDITION_FAILED, response.status_code)
+        self.assertIn("First update", self.app.get(url).text)
+
+    def test_put_and_delete_book_if_match(self):
+        url = self.base_url + f"/{INITIAL_BOOKS[0]['id']}"
+        stale_etag = '"book-0-0"'
+
+        response = self.app.put(
+            url, json={"title": "Lost update"}, headers={"If-Match": stale_etag}
+        )
+        self.assertEqual(HTTPStatus.PRECONDITION_FAILED, response.status_code)
+        response = self.app.delete(url, headers={"If-Match": stale_etag})
+        self.assertEqual(HTTPStatus.PRECONDITION_FAILED, response.status_code)
+
+        etag = self.app.get(url).headers["ETag"]
+        response = self.app.delete(url, headers={"If-Match": etag})
+        self.assertEqual(HTTPStatus.NO_CONTENT, response.status_code)
+
+    def test_post_books_batch(self):
+        response = self.app.post(
+            self.base_url + "/batch",
+            json=[
+                {"title": "First", "author": {"id": INITIAL_AUTHORS[0]["id"]}},
+                {
+                    "title": "Second",
+                    "author": {"last_name": "Ivanov", "first_name": "Ivan"},
+                },
+                {
+                    "title": "Third",
+                    "author": {"last_name": "Ivanov", "first_name": "Ivan"},
+                },
+            ],
+        )
+
+        self.assertEqual(HTTPStatus.CREATED, response.status_code)
+        books = [result["book"] for result in response.json]
+        self.assertEqual(
+            ["First", "Second", "Third"], [book["title"] for book in books]
+        )
+        self.assertEqual(INITIAL_AUTHORS[0]["id"], books[0]["author"]["id"])
+        # Author is created once and reused
+        self.assertEqual(books[1]["author"]["id"], books[2]["author"]["id"])
+
+        for book in books:
+            response = self.app.get(self.base_url + f"/{book['id']}")
+            self.assertEqual(book, response.json)
+
+    def test_post_books_batch_reuses_author_without_middle_name(self):
+        # Initial authors are stored with '' as the middle name
+        author = INITIAL_AUTHORS[2]
+        response = self.app.post(
+            self.base_url + "/batch",
+            json=[
+                {
+                    "title": "Patterns of Enterprise Application Architecture",
+                    "author": {
+                        "last_name": author["last_name"],
+                        "first_name": author["first_name"],
+                    },
+                }
+            ],
+        )
+
+        self.assertEqual(HTTPStatus.CREATED, response.status_code)
+        self.assertEqual(author["id"], response.json[0]["book"]["author"]["id"])
+        response = self.app.get("/api/authors/")
+        self.assertEqual(len(INITIAL_AUTHORS), len(response.json))
+
+    def test_post_books_batch_reports_errors(self):
+        wrong_author_id = 42
+        response = self.app.post(
+            self.base_url + "/batch",
+            json=[
+                {"title": "Good", "author": {"id": INITIAL_AUTHORS[0]["id"]}},
+                {"title": "Bad", "author": {"id": wrong_author_id}},
+                {"title": "Short", "author": {"last_name": "I", "first_name": "I"}},
+                {"title": 42, "author": {"id": INITIAL_AUTHORS[0]["id"]}},
+            ],
+        )
+
+        self.assertEqual(HTTPStatus.MULTI_STATUS, response.status_code)
+        self.assertEqual(
+            [201, 400, 400, 400], [result["status"] for result in response.json]
+        )
+        self.assertEqual("Good", response.json[0]["book"]["title"])
+        self.assertIn(str(wrong_author_id), response.json[1]["message"])
+        self.assertIn("title", response.json[3]["message"])
+
+    def test_post_books_batch_requires_list(self):
+        response = self.app.post(self.base_url + "/batch", json={"title": "Book"})
+        self.assertEqual(HTTPStatus.BAD_REQUEST, response.status_code)
+
+    def test_search_books(self):
+        response = self.app.get(self.base_url + "/?q=code")
+        self.assertEqual(HTTPStatus.OK, response.status_code)
+        # Title "Clean Code" is shorter, so its match ranks higher
+        self.assertEqual([1, 3], [book["id"] for book in response.json])
+        self.assertIn("ETag", response.headers)
+
+    def test_search_books_by_prefixes_of_title_and_author(self):
+        response = self.app.get(self.base_url + "/?q=refact%20fowl")
+        self.assertEqual([3], [book["id"] for book in response.json])
+
+        response = self.app.get(self.base_url + "/?q=martin")
+        self.assertEqual([1, 3], sorted(book["id"] for book in response.json))
+
+    def test_search_books_ranks_title_above_author(self):
+        self.app.post(
+            self.base_url + "/",
+            json={
+                "title": "Martin Eden",
+                "author": {"last_name": "London", "first_name": "Jack"},
+            },
+        )
+        response = self.app.get(self.base_url + "/?q=martin")
+        self.assertEqual("Martin Eden", response.json[0]["title"])
+
+    def test_search_books_follows_changes(self):
+        self.app.patch(self.base_url + "/1", json={"title": "Clean Architecture"})
+        self.app.delete(self.base_url + "/3")
+
+        response = self.app.get(self.base_url + "/?q=code")
+        self.assertEqual([], response.json)
+        response = self.app.get(self.base_url + "/?q=architecture")
+        self.assertEqual([1], [book["id"] for book in response.json])
+
+    def test_search_books_paginated(self):
+        response = self.app.get(self.base_url + "/?q=code&limit=1")
+        self.assertEqual([1], [book["id"] for book in response.json])
+        self.assertIn("offset=1", response.headers["Link"])
+
+        response = self.app.get(self.base_url + "/?q=code&limit=1&offset=1")
+        self.assertEqual([3], [book["id"] for book in response.json])
+
+        response = self.app.get(self.base_url + "/?q=code&offset=-1")
+        self.assertEqual(HTTPStatus.BAD_REQUEST, response.status_code)
+
+    def test_search_books_ignores_query_syntax(self):
+        response = self.app.get(self.base_url + '/?q="clean" OR NOT (')
+        self.assertEqual(HTTPStatus.OK, response.status_code)
+        self.assertEqual([], response.json)
+
+        response = self.app.get(self.base_url + "/?q=")
+        self.assertEqual([], response.json)
+
+
+class TestBookRows(unittest.TestCase):
+    def setUp(self) -> None:
+        delete_db()
+        init_db()
+
+    def test_books_share_author_per_result_set(self):
+        author_id = books_service.get_book(1).author.id
+        books_service.create_book("Second book", author_id)
+        books = books_service.get_all_books()
+        self.assertEqual(len(INITIAL_BOOKS) + 1, len(books))
+        authors = {}
+        for book in books:
+            self.assertIs(authors.setdefault(book.author.id, book.author), book.author)
+        self.assertLess(len(authors), len(books))
+        self.assertFalse(hasattr(books[0], "__dict__"))
+        self.assertFalse(hasattr(books[0].author, "__dict__"))
+
+        by_author = books_service.get_books_by_author(author_id)
+        self.assertEqual(2, len(by_author))
+        self.assertIs(by_author[0].author, by_author[1].author)
+        self.assertEqual(authors[author_id], by_author[0].author)
@@ -0,0 +1,528 @@
+import functools
+import io
+import os
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+from http import HTTPStatus
+from unittest import mock
+
+from sqlalchemy import event
+
+# The engine is created on import, so point it to a test database first
+_tmp_dir = tempfile.TemporaryDirectory()
+os.environ.setdefault(
+    "BOOKS_ALCHEMY_DATABASE_URL",
+    f"sqlite:///{os.path.join(_tmp_dir.name, 'books_alchemy.db')}",
+)
+
+from books_alchemy import database, jobs, statistics  # noqa: E402
+from books_alchemy.app import app  # noqa: E402
+from books_alchemy.database import (  # noqa: E402
+    GivenBook,
+    Student,
+    engine,
+    initialize_db,
+    session,
+)
+
+
+class TestBooksAlchemyConcurrency(unittest.TestCase):
+    def setUp(self) -> None:
+        initialize_db()
+        app.config["TESTING"] = True
+
+    def tearDown(self) -> None:
+        session.remove()
+
+    def test_engine_pragmas(self):
+        with engine.connect() as conn:
+            self.assertEqual(
+                "wal", conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+            )
+            self.assertEqual(5000, conn.exec_driver_sql("PRAGMA busy_timeout").scalar())
+
+    def test_session_is_removed_after_request(self):
+        client = app.test_client()
+        self.assertEqual(HTTPStatus.OK, client.get("/books/").status_code)
+
+        self.assertFalse(session.registry.has())
+        self.assertEqual(0, engine.pool.checkedout())
+
+    def test_concurrent_requests(self):
+        expected = app.test_client().get("/books/").json
+        errors, statuses = [], []
+
+        def hammer():
+            client = app.test_client()
+            try:
+                for index in range(25):
+                    if index % 5 == 0:
+                        response = client.get("/books/?name=clean")
+                        self.assertEqual(4, len(response.json))
+                    else:
+                        response = client.get("/books/")
+                        self.assertEqual(expected, response.json)
+                    statuses.append(response.status_code)
+            except Exception as ex:
+                errors.append(ex)
+
+        threads = [threading.Thread(target=hammer) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([], errors)
+        self.assertEqual([HTTPStatus.OK] * 16 * 25, statuses)
+        # Every request returned its connection to the pool
+        self.assertEqual(0, engine.pool.checkedout())
+
+
+class TestStatistics(unittest.TestCase):
+    def setUp(self) -> None:
+        initialize_db()
+        session.add(
+            Student(
+                id=3,
+                name="Anna",
+                surname="Sidorova",
+                phone="+7(921)000-00-03",
+                email="anna@sidorova.ru",
+                average_score=4.5,
+                scholarship=False,
+            )
+        )
+        session.commit()
+        # Books given this month, so the reports are not empty
+        for student_id, book_id in ((1, 2), (1, 5), (1, 6), (2, 2), (2, 7), (3, 2)):
+            database.give_book(student_id=student_id, book_id=book_id)
+
+    def tearDown(self) -> None:
+        session.remove()
+
+    def assertStatisticsMatchLive(self):
+        self.assertEqual(
+            database.get_average_books_given_this_month(),
+            statistics.get_average_books_given_this_month(),
+        )
+        # The live query doesn't order students with the same count
+        self.assertEqual(
+            sorted(
+                (-count, student.id) for student, count in database.get_top10_readers()
+            ),
+            [(-count, student.id) for student, count in statistics.get_top10_readers()],
+        )
+        self.assertEqual(
+            database.get_most_popular_book().id,
+            statistics.get_most_popular_book().id,
+        )
+
+    def test_counters_follow_given_books(self):
+        self.assertEqual(2.0, statistics.get_average_books_given_this_month())
+        self.assertStatisticsMatchLive()
+
+        database.return_book(student_id=1, book_id=1)
+        self.assertStatisticsMatchLive()
+
+        given_book = session.query(GivenBook).filter_by(student_id=2, book_id=7).one()
+        given_book.student_id = 1
+        session.commit()
+        self.assertStatisticsMatchLive()
+
+        session.delete(given_book)
+        session.commit()
+        self.assertStatisticsMatchLive()
+        self.assertEqual(5 / 3, statistics.get_average_books_given_this_month())
+
+    def test_rebuild_counts_rows_inserted_without_orm(self):
+        session.execute(
+            GivenBook.__table__.insert(),
+            [
+                {"book_id": book_id, "student_id": 3, "date_of_issue": datetime.now()}
+                for book_id in (3, 4, 6)
+            ],
+        )
+        session.commit()
+        self.assertEqual(1, statistics.get_top10_readers()[0][0].id)
+
+        statistics.rebuild_statistics()
+
+        self.assertEqual(3, statistics.get_top10_readers()[0][0].id)
+        self.assertStatisticsMatchLive()
+
+    def test_rebuild_splits_months_and_years(self):
+        session.execute(
+            GivenBook.__table__.insert(),
+            [
+                {"book_id": book_id, "student_id": 3, "date_of_issue": date_of_issue}
+                for book_id, date_of_issue in (
+                    (3, datetime(2019, 12, 31, 23, 59, 59)),
+                    (4, datetime(2020, 1, 1)),
+                    (6, datetime(2020, 1, 31, 12)),
+                )
+            ],
+        )
+        session.commit()
+
+        statistics.rebuild_statistics()
+
+        issues = {
+            (row.year, row.month): row.issued_count
+            for row in session.query(statistics.IssuesByMonth)
+        }
+        self.assertEqual(1, issues[2019, 12])
+        self.assertEqual(2, issues[2020, 1])
+        readers = {
+            row.year: row.issued_count
+            for row in session.query(statistics.ReaderIssuesByYear).filter_by(
+                student_id=3
+            )
+        }
+        self.assertEqual(1, readers[2019])
+        self.assertEqual(2, readers[2020])
+        self.assertStatisticsMatchLive()
+
+    def test_routes_read_statistics(self):
+        client = app.test_client()
+
+        response = client.get("/books/average/")
+        self.assertEqual({"average_books_given": 2.0}, response.json)
+        response = client.get("/top10/")
+        self.assertEqual([1, 2, 3], [student["id"] for student in response.json])
+        response = client.get("/books/most_popular/")
+        self.assertEqual(2, response.json["id"])
+
+    def test_most_popular_book_without_given_books(self):
+        session.query(GivenBook).delete()
+        session.commit()
+        statistics.rebuild_statistics()
+
+        response = app.test_client().get("/books/most_popular/")
+        self.assertEqual(HTTPStatus.NOT_FOUND, response.status_code)
+
+
+class TestDebtors(unittest.TestCase):
+    def setUp(self) -> None:
+        initialize_db()
+        session.add(
+            Student(
+                id=3,
+                name="Anna",
+                surname="Sidorova",
+                phone="+7(921)000-00-03",
+                email="anna@sidorova.ru",
+                average_score=4.5,
+                scholarship=False,
+            )
+        )
+        session.query(GivenBook).delete()
+        now = datetime.now()
+        self.oldest = {1: now - timedelta(30), 2: now - timedelta(60)}
+        for student_id, book_id, days, returned in (
+            (1, 1, 30, False),
+            (1, 2, 20, False),
+            (1, 3, 40, True),
+            (1, 4, 3, False),
+            (2, 1, 60, False),
+            (3, 2, 90, True),
+        ):
+            session.add(
+                GivenBook(
+                    student_id=student_id,
+                    book_id=book_id,
+                    date_of_issue=now - timedelta(days),
+                    date_of_return=now if returned else None,
+                )
+            )
+        session.commit()
+
+    def tearDown(self) -> None:
+        session.remove()
+
+    def test_get_debtors(self):
+        debtors = [
+            (student.id, count, oldest)
+            for student, count, oldest in database.get_debtors()
+        ]
+        # Once per student, the longest overdue first; returned and recent books are
+        # not counted
+        self.assertEqual(
+            [(2, 1, self.oldest[2]), (1, 2, self.oldest[1])],
+            debtors,
+        )
+
+    def test_route(self):
+        response = app.test_client().get("/debtors/")
+        self.assertEqual(HTTPStatus.OK, response.status_code)
+        self.assertEqual(
+            [(2, 1), (1, 2)],
+            [(debtor["id"], debtor["overdue_count"]) for debtor in response.json],
+        )
+        self.assertIn("oldest_date_of_issue", response.json[0])
+
+
+class TestStudentsImport(unittest.TestCase):
+    CSV = (
+        "Иван;Сидоров;+7(921)123-45-67;ivan@sidorov.ru;3.9;0\n"
+        "Петр;Иванов;+7(921)321-54-76;petr@ivanov.ru;4.8;1\n"
+        "\n"
+        "Евгений;Бучий;8-921-003-05-07;eugene@buchi.ru;3.7;0\n"
+        "Анна;Петрова;+7(921)000-00-05;anna.petrova;3.7;0\n"
+        "Ольга;Смирнова;+7(921)000-00-06;olga@smirnova.ru;отлично;0\n"
+        "Олег;Орлов;+7(921)000-00-07;oleg@orlov.ru;4.0\n"
+        '"Мария";"Кузнецова";+7(921)000-00-08;maria@kuznetsova.ru;5;true\n'
+    )
+
+    def setUp(self) -> None:
+        initialize_db()
+
+    def tearDown(self) -> None:
+        session.remove()
+
+    def test_report(self):
+        report = database.bulk_add_students_from_csv(self.CSV)
+
+        self.assertEqual(3, report["imported"])
+        self.assertEqual(4, report["failed"])
+        self.assertEqual(
+            [
+                (4, "Wrong phone format: 8-921-003-05-07"),
+                (5, "Wrong email format: anna.petrova"),
+                (6, "Wrong average score: отлично"),
+                (7, "Expected 6 columns, got 5"),
+            ],
+            [(error["line"], error["error"]) for error in report["errors"]],
+        )
+        students = session.query(Student).filter(Student.id > 2).order_by(Student.id)
+        self.assertEqual(
+            [("Сидоров", False), ("Иванов", True), ("Кузнецова", True)],
+            [(student.surname, student.scholarship) for student in students],
+        )
+
+    def test_chunks(self):
+        lines = (
+            f"Name;Surname{index};+7(921)000-00-00;student{index}@example.com;4.0;0\n"
+            for index in range(25)
+        )
+        report = database.import_students_csv(lines, chunk_size=10)
+
+        self.assertEqual({"imported": 25, "failed": 0, "errors": []}, report)
+        self.assertEqual(27, session.query(Student).count())
+
+    def test_route(self):
+        client = app.test_client()
+        response = client.post(
+            "/students/csv/",
+            data={"file": (io.BytesIO(self.CSV.encode("utf-8-sig")), "students.csv")},
+        )
+        self.assertEqual(HTTPStatus.ACCEPTED, response.status_code)
+
+        status = wait_for_job(client, response.headers["Location"])
+        self.assertEqual("SUCCESS", status["state"])
+        self.assertEqual(1.0, status["progress"])
+        self.assertEqual(3, status["result"]["imported"])
+        self.assertEqual(4, len(status["result"]["errors"]))
+        self.assertEqual(5, session.query(Student).count())
+
+    def test_route_undecodable_file(self):
+        client = app.test_client()
+        response = client.post(
+            "/students/csv/",
+            data={"file": (io.BytesIO(b"\xff\xfe;;\n"), "students.csv")},
+        )
+
+        status = wait_for_job(client, response.headers["Location"])
+        self.assertEqual("FAILURE", status["state"])
+        self.assertIn("UnicodeDecodeError", status["error"])
+
+
+class TestJobs(unittest.TestCase):
+    def setUp(self) -> None:
+        initialize_db()
+
+    def tearDown(self) -> None:
+        session.remove()
+
+    def test_unknown_job(self):
+        response = app.test_client().get("/status/unknown")
+        self.assertEqual(HTTPStatus.NOT_FOUND, response.status_code)
+
+    def test_rebuild_statistics(self):
+        session.query(statistics.IssuesByMonth).delete()
+        session.commit()
+
+        client = app.test_client()
+        response = client.post("/statistics/rebuild/")
+        self.assertEqual(HTTPStatus.ACCEPTED, response.status_code)
+        self.assertEqual(
+            f"/status/{response.json['job_id']}", response.headers["Location"]
+        )
+
+        status = wait_for_job(client, response.headers["Location"])
+        self.assertEqual("SUCCESS", status["state"])
+        self.assertEqual(3, session.query(statistics.IssuesByMonth).count())
+
+    def test_import_progress(self):
+        updates = []
+        path = os.path.join(_tmp_dir.name, "students.csv")
+        with open(path, "w", encoding="utf-8") as file:
+            for index in range(25):
+                file.write(
+                    f"Name;Surname{index};+7(921)000-00-00;s{index}@example.com;4;0\n"
+                )
+
+        import_in_chunks_of_10 = functools.partial(
+            database.import_students_csv, chunk_size=10
+        )
+        with mock.patch.object(jobs, "import_students_csv", import_in_chunks_of_10):
+            report = jobs.import_students_job(
+                lambda fraction, info: updates.append((fraction, info)), path
+            )
+
+        self.assertEqual(25, report["imported"])
+        self.assertEqual(
+            [10, 20, 25], [info["imported"] for _fraction, info in updates]
+        )
+        self.assertEqual(1.0, updates[-1][0])
+        self.assertFalse(os.path.exists(path))
+
+
+def wait_for_job(client, location: str, timeout: float = 5.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        status = client.get(location).json
+        if status["state"] in ("SUCCESS", "FAILURE") or time.monotonic() > deadline:
+            return status
+        time.sleep(0.01)
+
+
+# Loans in the database `EXPLAIN QUERY PLAN` is checked against
+EXPLAIN_LOANS = int(os.environ.get("BOOKS_ALCHEMY_EXPLAIN_LOANS", "1000000"))
+EXPLAIN_STUDENTS = 1000
+
+
+def explain(function, *args) -> list[str]:
+    """Call `function` and return `EXPLAIN QUERY PLAN` details of the queries it ran."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        function(*args)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    with engine.connect() as conn:
+        return [
+            row[3]
+            for statement, parameters in statements
+            for row in conn.exec_driver_sql(
+                f"EXPLAIN QUERY PLAN {statement}", parameters
+            )
+        ]
+
+
+class TestQueryPlans(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        initialize_db()
+        session.remove()
+        # Filling the tables and then creating the indexes is faster
+        for table in database.Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.drop(engine)
+        with engine.begin() as conn:
+            conn.exec_driver_sql(
+                "WITH RECURSIVE n(value) AS "
+                "(SELECT 0 UNION ALL SELECT value + 1 FROM n WHERE value < ?) "
+                "INSERT INTO students "
+                "(id, name, surname, phone, email, average_score, scholarship) "
+                "SELECT value + 3, 'Name', 'Surname', '+7(921)000-00-00', "
+                "'student@example.com', value % 50 / 10.0, value % 2 FROM n",
+                (EXPLAIN_STUDENTS - 1,),
+            )
+            # Three years of loans, every student takes every book at most once
+            conn.exec_driver_sql(
+                "WITH RECURSIVE n(value) AS "
+                "(SELECT 0 UNION ALL SELECT value + 1 FROM n WHERE value < ?) "
+                "INSERT INTO receiving_books (book_id, student_id, date_of_issue) "
+                "SELECT value / ? + 100, value % ? + 3, "
+                "strftime('%Y-%m-%d %H:%M:%S.000000', '2022-01-01', "
+                "'+' || (value % 1095) || ' days') FROM n",
+                (EXPLAIN_LOANS - 1, EXPLAIN_STUDENTS, EXPLAIN_STUDENTS),
+            )
+        database.create_indexes()
+        with engine.begin() as conn:
+            conn.exec_driver_sql("ANALYZE")
+        # Other connections of the pool keep the statistics they have loaded
+        engine.dispose()
+
+    def tearDown(self) -> None:
+        session.remove()
+
+    def assertSearches(self, expected: str, plan: list[str]):
+        self.assertIn(expected, plan)
+        self.assertFalse(
+            [detail for detail in plan if detail.startswith("SCAN receiving_books")],
+            plan,
+        )
+
+    def test_average_books_given_this_month(self):
+        self.assertSearches(
+            "SEARCH receiving_books USING COVERING INDEX "
+            "receiving_books_date_of_issue_student_id "
+            "(date_of_issue>? AND date_of_issue<?)",
+            explain(database.get_average_books_given_this_month),
+        )
+
+    def test_top10_readers(self):
+        self.assertSearches(
+            "SEARCH receiving_books USING COVERING INDEX "
+            "receiving_books_date_of_issue_student_id "
+            "(date_of_issue>? AND date_of_issue<?)",
+            explain(database.get_top10_readers),
+        )
+
+    def test_students_with_average_more_than(self):
+        self.assertEqual(
+            ["SEARCH students USING INDEX ix_students_average_score (average_score>?)"],
+            explain(Student.all_with_average_more_than, 4.5),
+        )
+
+    def test_unread_books(self):
+        self.assertSearches(
+            "SEARCH receiving_books USING INDEX ix_receiving_books_student_id "
+            "(student_id=?)",
+            explain(database.get_unread_books, 3),
+        )
+
+    def test_rebuild_statistics(self):
+        plan = explain(statistics.rebuild_statistics)
+        self.assertIn(
+            "SEARCH receiving_books USING COVERING INDEX "
+            "receiving_books_date_of_issue_student_id "
+            "(date_of_issue>? AND date_of_issue<?)",
+            plan,
+        )
+        # Only the popularity of books needs every loan
+        self.assertEqual(
+            1, len([detail for detail in plan if detail.startswith("SCAN receiving")])
+        )
+
+    def test_date_ranges(self):
+        self.assertEqual(
+            (datetime(2024, 12, 1), datetime(2025, 1, 1)),
+            database.month_range(datetime(2024, 12, 31, 23, 59)),
+        )
+        self.assertEqual(
+            (datetime(2024, 2, 1), datetime(2024, 3, 1)),
+            database.month_range(datetime(2024, 2, 1)),
+        )
+        self.assertEqual(
+            (datetime(2024, 1, 1), datetime(2025, 1, 1)),
+            database.year_range(datetime(2024, 6, 15)),
+        )
@@ -0,0 +1,133 @@
+import unittest
+from unittest import mock
+
+from core.cache import MISSING, LRUCache, get_cache
+from core.database import INITIAL_BOOKS, delete_db, get_connection, init_db
+from services.authors import delete_author, get_author
+from services.batch import create_authors_from_payload_json
+from services.books import (
+    author_books_key,
+    create_book,
+    delete_book,
+    get_book,
+    get_books_by_author,
+    update_book,
+)
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_least_recently_used_evicted(self):
+        cache = LRUCache(max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEqual(1, cache.get("a"))
+        self.assertIs(MISSING, cache.get("b"))
+        self.assertEqual(1, cache.stats()["evictions"])
+
+    def test_expired_entry_is_a_miss(self):
+        cache = LRUCache(ttl=10)
+        with mock.patch("core.cache.time.monotonic", return_value=100):
+            cache.set("a", 1)
+        with mock.patch("core.cache.time.monotonic", return_value=105):
+            self.assertEqual(1, cache.get("a"))
+        with mock.patch("core.cache.time.monotonic", return_value=111):
+            self.assertIs(MISSING, cache.get("a"))
+
+        stats = cache.stats()
+        self.assertEqual(1, stats["hits"])
+        self.assertEqual(1, stats["misses"])
+        self.assertEqual(1, stats["expirations"])
+
+
+class TestServicesCache(unittest.TestCase):
+    def setUp(self) -> None:
+        delete_db()
+        init_db()
+        self.book = INITIAL_BOOKS[0]
+
+    def test_get_book_is_cached(self):
+        hits = get_cache().stats()["hits"]
+        first = get_book(self.book["id"])
+        second = get_book(str(self.book["id"]))
+
+        self.assertIs(first, second)
+        self.assertEqual(hits + 1, get_cache().stats()["hits"])
+
+    def test_update_book_invalidates(self):
+        old_author_id = self.book["author_id"]
+        new_author_id = old_author_id + 1
+        get_book(self.book["id"])
+        get_books_by_author(old_author_id)
+        get_books_by_author(new_author_id)
+
+        update_book(self.book["id"], title="New title", author_id=new_author_id)
+
+        self.assertEqual("New title", get_book(self.book["id"]).title)
+        self.assertNotIn(
+            self.book["id"], [book.id for book in get_books_by_author(old_author_id)]
+        )
+        self.assertIn(
+            self.book["id"], [book.id for book in get_books_by_author(new_author_id)]
+        )
+
+    def test_create_and_delete_book_invalidate(self):
+        author_id = self.book["author_id"]
+        count = len(get_books_by_author(author_id))
+
+        book = create_book("New book", author_id)
+        self.assertEqual(count + 1, len(get_books_by_author(author_id)))
+
+        delete_book(book.id)
+        self.assertEqual(count, len(get_books_by_author(author_id)))
+        with self.assertRaises(Exception):
+            get_book(book.id)
+
+    def test_delete_author_invalidates_books(self):
+        author_id = self.book["author_id"]
+        get_author(author_id)
+        get_book(self.book["id"])
+        get_books_by_author(author_id)
+
+        delete_author(author_id)
+
+        with self.assertRaises(Exception):
+            get_author(author_id)
+        with self.assertRaises(Exception):
+            get_book(self.book["id"])
+        self.assertEqual([], get_books_by_author(author_id))
+
+    def test_rolled_back_changes_are_not_cached(self):
+        with self.assertRaises(RuntimeError):
+            with get_connection():
+                book = create_book("Phantom", self.book["author_id"])
+                raise RuntimeError
+        with self.assertRaises(Exception):
+            get_book(book.id)
+
+        get_book(self.book["id"])
+        with self.assertRaises(RuntimeError):
+            with get_connection():
+                update_book(self.book["id"], title="Uncommitted title")
+                self.assertEqual("Uncommitted title", get_book(self.book["id"]).title)
+                raise RuntimeError
+        self.assertEqual(self.book["title"], get_book(self.book["id"]).title)
+        self.assertEqual(
+            [self.book["title"]],
+            [book.title for book in get_books_by_author(self.book["author_id"])],
+        )
+
+    def test_create_authors_batch_invalidates(self):
+        with get_connection() as conn:
+            (next_id,) = conn.execute(
+                "SELECT seq + 1 FROM sqlite_sequence WHERE name = 'authors'"
+            ).fetchone()
+        self.assertEqual([], get_books_by_author(next_id))
+
+        results, _ = create_authors_from_payload_json(
+            [{"last_name": "Beck", "first_name": "Kent"}]
+        )
+        self.assertEqual(next_id, results[0]["author"]["id"])
+        self.assertIs(MISSING, get_cache().get(author_books_key(next_id)))
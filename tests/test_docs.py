@@ -0,0 +1,76 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from apis import docs
+from books_app import app
+
+# Seconds importing `books_app` may take in a fresh interpreter. Only checked when set,
+# as wall-clock time depends on the load of the machine.
+IMPORT_BUDGET = os.environ.get("BOOKS_IMPORT_BUDGET")
+
+IMPORT_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import books_app
+elapsed = time.perf_counter() - started
+print(json.dumps({"elapsed": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+
+class TestStartup(unittest.TestCase):
+    def test_import_skips_docs(self):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_SCRIPT],
+            cwd=Path(__file__).parent.parent,
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout
+        result = json.loads(output)
+
+        self.assertNotIn("flasgger", result["modules"])
+        self.assertNotIn("apis.authors_specs", result["modules"])
+        if IMPORT_BUDGET:
+            self.assertLess(result["elapsed"], float(IMPORT_BUDGET))
+
+
+class TestLazyDocs(unittest.TestCase):
+    def setUp(self) -> None:
+        self.client = app.test_client()
+
+    def test_docs(self):
+        response = self.client.get("/apidocs/")
+        self.assertEqual(200, response.status_code)
+        self.assertIn("Flasgger", response.text)
+
+        response = self.client.get("/apispec_1.json")
+        self.assertEqual(200, response.status_code)
+        authors = response.json["paths"]["/api/authors/"]
+        self.assertEqual(["authors"], authors["get"]["tags"])
+        self.assertIn("/api/books/", response.json["paths"])
+
+        self.assertEqual(200, self.client.get("/swagger.json").status_code)
+        self.assertEqual(200, self.client.get("/api/authors/").status_code)
+
+    def test_docs_app_is_cached(self):
+        self.client.get("/apidocs/")
+        docs_app = app.wsgi_app.docs_app
+        self.client.get("/apispec_1.json")
+        self.assertIs(docs_app, app.wsgi_app.docs_app)
+
+    def test_prebuilt_spec(self):
+        spec = docs.build_spec(app)
+        self.assertEqual(self.client.get("/apispec_1.json").json, json.loads(spec))
+
+        with tempfile.NamedTemporaryFile(suffix=".json") as file:
+            file.write(b'{"swagger": "2.0", "paths": {}}')
+            file.flush()
+            lazy_docs = docs.LazyDocs(app, spec_file=file.name)
+            response = lazy_docs.docs_app.test_client().get("/apispec_1.json")
+
+        self.assertEqual({"swagger": "2.0", "paths": {}}, response.json)
@@ -0,0 +1,316 @@
+import os
+import subprocess
+import sys
+import time
+import unittest
+import uuid
+from pathlib import Path
+from unittest import mock
+
+# Celery and the tracker are configured on import: run the workers in this process
+os.environ.update(
+    IMAGE_SERVICE_BROKER_URL="memory://",
+    IMAGE_SERVICE_RESULT_BACKEND="cache+memory://",
+    IMAGE_SERVICE_TRACKER_URL="memory://",
+    IMAGE_SERVICE_PROCESSING_TIME="0,0",
+)
+
+from celery.contrib.testing.worker import start_worker  # noqa: E402
+
+from image_service import app as image_app  # noqa: E402
+from image_service.progress import MemoryTracker, Tracker  # noqa: E402
+from image_service.ratelimit import TokenBucketLimiter  # noqa: E402
+
+
+class TestImageService(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.worker = start_worker(
+            image_app.celery, pool="solo", perform_ping_check=False
+        )
+        cls.worker.__enter__()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.worker.__exit__(None, None, None)
+
+    def setUp(self) -> None:
+        self.client = image_app.app.test_client()
+        # Every test starts with empty progress and results cache
+        patcher = mock.patch.object(image_app, "tracker", MemoryTracker())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def process(self, images: list[str]) -> str:
+        response = self.client.post("/process_images", json={"images": images})
+        self.assertEqual(202, response.status_code)
+        return response.json["group_id"]
+
+    def wait(self, group_id: str, timeout: float = 10.0) -> dict:
+        deadline = time.monotonic() + timeout
+        while True:
+            status = self.client.get(f"/status/{group_id}?results=1").json
+            if status["status"] == 1.0 or time.monotonic() > deadline:
+                return status
+            time.sleep(0.01)
+
+    def test_group_progress(self):
+        group_id = self.process(["a", "b", "c"])
+
+        status = self.wait(group_id)
+        del status["cache"]
+        self.assertEqual(
+            {
+                "status": 1.0,
+                "total": 3,
+                "completed": 3,
+                "failed": 0,
+                "cached": 0,
+                "attached": 0,
+                "results": [
+                    "Image a processed",
+                    "Image b processed",
+                    "Image c processed",
+                ],
+            },
+            status,
+        )
+
+    def test_failed_tasks(self):
+        calls = []
+
+        def sleep(seconds):
+            calls.append(seconds)
+            if len(calls) == 2:
+                raise RuntimeError("Corrupted image")
+
+        with mock.patch.object(image_app, "time", mock.Mock(sleep=sleep)):
+            status = self.wait(self.process(["a", "b", "c"]))
+
+        self.assertEqual(2, status["completed"])
+        self.assertEqual(1, status["failed"])
+        self.assertEqual(
+            1, sum("Corrupted image" in result for result in status["results"])
+        )
+
+    def test_chunks(self):
+        with mock.patch.object(image_app, "CHUNK_SIZE", 2):
+            status = self.wait(self.process(["a", "b", "c", "d", "e"]))
+
+        self.assertEqual(5, status["completed"])
+        self.assertEqual(
+            [f"Image {image_id} processed" for image_id in "abcde"], status["results"]
+        )
+
+    def test_priority_queues(self):
+        for size, priority, queue in (
+            (1, None, "interactive"),
+            (11, None, "bulk"),
+            (11, "interactive", "interactive"),
+            (1, "bulk", "bulk"),
+        ):
+            images = [str(uuid.uuid4()) for _ in range(size)]
+            with mock.patch.object(image_app, "group") as group:
+                response = self.client.post(
+                    "/process_images", json={"images": images, "priority": priority}
+                )
+            self.assertEqual(202, response.status_code)
+            group.return_value.apply_async.assert_called_once_with(queue=queue)
+
+        response = self.client.post(
+            "/process_images", json={"images": ["a"], "priority": "urgent"}
+        )
+        self.assertEqual(400, response.status_code)
+
+    def test_rate_limit(self):
+        limiter = TokenBucketLimiter(5, 60)
+        with mock.patch.object(image_app, "limiter", limiter):
+            self.process(["a", "b", "c"])
+            response = self.client.post(
+                "/process_images", json={"images": ["d", "e", "f"]}
+            )
+            self.assertEqual(429, response.status_code)
+            self.assertEqual("12", response.headers["Retry-After"])
+
+            # The header is ignored unless it is set by a trusted proxy
+            response = self.client.post(
+                "/process_images",
+                json={"images": ["d", "e", "f"]},
+                headers={"X-Client-Id": "another"},
+            )
+            self.assertEqual(429, response.status_code)
+
+            response = self.client.post(
+                "/process_images",
+                json={"images": ["d", "e", "f"]},
+                environ_base={"REMOTE_ADDR": "10.0.0.2"},
+            )
+            self.assertEqual(202, response.status_code)
+
+            with mock.patch.object(image_app, "TRUSTED_PROXIES", {"10.0.0.1"}):
+                for client_id, status in (
+                    ("another", 202),
+                    ("another", 429),
+                    ("third", 202),
+                ):
+                    response = self.client.post(
+                        "/process_images",
+                        json={"images": ["d", "e", "f"]},
+                        headers={"X-Client-Id": client_id},
+                        environ_base={"REMOTE_ADDR": "10.0.0.1"},
+                    )
+                    self.assertEqual(status, response.status_code, client_id)
+
+    def test_processed_images_are_cached(self):
+        self.wait(self.process(["a", "b"]))
+
+        with mock.patch.object(image_app, "group") as group:
+            status = self.wait(self.process(["a", "b"]))
+        group.assert_not_called()
+        self.assertEqual(2, status["cached"])
+        self.assertEqual(["Image a processed", "Image b processed"], status["results"])
+
+        status = self.wait(self.process(["b", "c"]))
+        self.assertEqual(1, status["cached"])
+        self.assertEqual(["Image b processed", "Image c processed"], status["results"])
+        self.assertEqual(
+            {"cache_hits": 3, "misses": 3, "hit_rate": 0.5, "size": 3},
+            {
+                name: status["cache"][name]
+                for name in ("cache_hits", "misses", "hit_rate", "size")
+            },
+        )
+
+    def test_bulk_status(self):
+        first, second = self.process(["a"]), self.process(["b", "c"])
+        self.wait(second)
+
+        response = self.client.post(
+            "/status", json={"group_ids": [first, second, "unknown"]}
+        )
+
+        self.assertEqual(200, response.status_code)
+        groups = response.json["groups"]
+        self.assertEqual(1, groups[first]["total"])
+        self.assertEqual(2, groups[second]["completed"])
+        self.assertIsNone(groups["unknown"])
+
+    def test_invalid_requests(self):
+        response = self.client.get("/status/unknown")
+        self.assertEqual(404, response.status_code)
+
+        response = self.client.post("/process_images", json={"images": "a"})
+        self.assertEqual(400, response.status_code)
+
+        response = self.client.post("/process_images", json={"images": ["a"] * 10001})
+        self.assertEqual(400, response.status_code)
+
+        for images in (["a", 1], [["a"]], [{"id": "a"}], ["a", ""], [None]):
+            response = self.client.post("/process_images", json={"images": images})
+            self.assertEqual(400, response.status_code, images)
+
+        for group_ids in ([], "a", [1], ["a"] * 1001):
+            response = self.client.post("/status", json={"group_ids": group_ids})
+            self.assertEqual(400, response.status_code, group_ids)
+
+
+class TestTokenBucketLimiter(unittest.TestCase):
+    def setUp(self) -> None:
+        self.now = 0.0
+        self.limiter = TokenBucketLimiter(10, 60, clock=lambda: self.now)
+
+    def test_refill(self):
+        self.assertEqual(0, self.limiter.acquire("client", 10))
+        self.assertEqual(6, self.limiter.acquire("client", 1))
+
+        self.now = 30
+        self.assertEqual(0, self.limiter.acquire("client", 5))
+        self.assertEqual(6, self.limiter.acquire("client", 1))
+        # Buckets don't overflow
+        self.now = 1000
+        self.assertEqual(0, self.limiter.acquire("client", 10))
+        self.assertEqual(float("inf"), self.limiter.acquire("client", 11))
+
+    def test_clients_are_independent(self):
+        self.limiter.acquire("first", 10)
+        self.assertEqual(0, self.limiter.acquire("second", 10))
+
+    def test_full_buckets_are_forgotten(self):
+        limiter = TokenBucketLimiter(10, 60, clock=lambda: self.now, max_clients=2)
+        limiter.acquire("first", 10)
+        limiter.acquire("second", 1)
+
+        self.now = 6
+        limiter.acquire("third", 1)
+
+        self.assertEqual({"first", "third"}, set(limiter._buckets))
+
+
+class TestMemoryTracker(unittest.TestCase):
+    def test_in_flight_images_are_attached(self):
+        tracker = MemoryTracker()
+
+        self.assertEqual(["x", "y"], tracker.submit("first", ["x", "x", "y"]))
+        self.assertEqual([], tracker.submit("second", ["y"]))
+        tracker.images_done([("x", "X", False), ("y", "Y", False)])
+
+        first, second = tracker.get_statuses(["first", "second"])
+        self.assertEqual((1.0, 1), (first["status"], first["attached"]))
+        self.assertEqual((1.0, 1), (second["status"], second["attached"]))
+        self.assertEqual(["X", "X", "Y"], tracker.get_results("first"))
+        self.assertEqual(["Y"], tracker.get_results("second"))
+        self.assertEqual(0.5, tracker.cache_stats()["hit_rate"])
+
+    def test_failed_images_are_not_cached(self):
+        tracker = MemoryTracker()
+        tracker.submit("first", ["x"])
+        tracker.images_done([("x", "Error", True)])
+
+        self.assertEqual(["x"], tracker.submit("second", ["x"]))
+
+    def test_expired_results_are_processed_again(self):
+        tracker = MemoryTracker(ttl=0)
+        tracker.submit("first", ["x"])
+        tracker.images_done([("x", "X", False)])
+
+        self.assertEqual(["x"], tracker.submit("second", ["x"]))
+
+    def test_lost_images_are_queued_again(self):
+        tracker = MemoryTracker(in_flight_timeout=0)
+        tracker.submit("first", ["x"])
+
+        self.assertEqual(["x"], tracker.submit("second", ["x"]))
+        tracker.images_done([("x", "X", False)])
+        # Both groups get the result
+        self.assertEqual(["X"], tracker.get_results("first"))
+        self.assertEqual(["X"], tracker.get_results("second"))
+
+    def test_lru_eviction(self):
+        tracker = MemoryTracker(cache_size=2)
+        tracker.submit("first", ["x", "y", "z"])
+        tracker.images_done([("x", "X", False), ("y", "Y", False), ("z", "Z", False)])
+
+        self.assertEqual(["x"], tracker.submit("second", ["x", "y", "z"]))
+        self.assertEqual(1, tracker.cache_stats()["evictions"])
+
+    def test_does_not_depend_on_books_api(self):
+        output = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, image_service.progress; print('core' in sys.modules)",
+            ],
+            cwd=Path(__file__).parent.parent,
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout
+        self.assertEqual("False", output.strip())
+
+    def test_tracker_interface_is_abstract(self):
+        class Incomplete(Tracker):
+            def start(self, group_id: str, total: int) -> None:
+                pass
+
+        with self.assertRaises(TypeError):
+            Incomplete()
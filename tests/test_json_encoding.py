@@ -0,0 +1,113 @@
+import importlib.util
+import json
+import random
+import unittest
+from datetime import date, datetime
+
+from books_app import app
+from core import json_encoding
+from core.database import delete_db, init_db
+from core.models import Author, Book
+
+HAS_UJSON = importlib.util.find_spec("ujson") is not None
+HAS_ORJSON = importlib.util.find_spec("orjson") is not None
+
+
+def random_value(rnd: random.Random, depth: int = 0):
+    def text() -> str:
+        return "".join(
+            chr(rnd.choice([rnd.randrange(128), rnd.randrange(128, 0x110000)]))
+            for _ in range(rnd.randrange(6))
+        )
+
+    kinds = [
+        lambda: rnd.randrange(-(2**70), 2**70),
+        lambda: rnd.random() * 10 ** rnd.randrange(-10, 20),
+        text,
+        lambda: None,
+        lambda: rnd.random() < 0.5,
+        lambda: [random_value(rnd, depth + 1) for _ in range(rnd.randrange(4))],
+        lambda: {text(): random_value(rnd, depth + 1) for _ in range(rnd.randrange(4))},
+    ]
+    return rnd.choice(kinds if depth < 3 else kinds[:5])()
+
+
+class TestJsonEncoding(unittest.TestCase):
+    def assertSameAsJson(self, dumps, values):
+        for value in values:
+            self.assertEqual(json.dumps(value), dumps(value), repr(value))
+
+    @unittest.skipUnless(HAS_UJSON, "ujson is not installed")
+    def test_ujson_output_is_the_same_as_json(self):
+        rnd = random.Random(0)
+        self.assertSameAsJson(
+            json_encoding.get_dumps("ujson"),
+            [random_value(rnd) for _ in range(10_000)],
+        )
+
+    @unittest.skipUnless(HAS_UJSON, "ujson is not installed")
+    def test_ujson_falls_back_to_json(self):
+        self.assertSameAsJson(
+            json_encoding.get_dumps("ujson"),
+            [1e-05, [1e16, "e-1"], "\x7f", {"/": "é "}],
+        )
+
+    def test_dataclasses_and_dates(self):
+        book = Book(id=1, title="Title", author=Author("Last", "First", id=2))
+        expected = json.dumps(
+            {
+                "book": {
+                    "id": 1,
+                    "title": "Title",
+                    "author": {
+                        "last_name": "Last",
+                        "first_name": "First",
+                        "id": 2,
+                        "middle_name": None,
+                    },
+                },
+                "dates": ["2024-02-01", "2024-02-01T10:30:00"],
+            }
+        )
+        value = {
+            "book": book,
+            "dates": [date(2024, 2, 1), datetime(2024, 2, 1, 10, 30)],
+        }
+        for name in ("auto", "json") + (("ujson",) if HAS_UJSON else ()):
+            self.assertEqual(expected, json_encoding.get_dumps(name)(value), name)
+
+        with self.assertRaises(TypeError):
+            json_encoding.json_dumps(object())
+
+    @unittest.skipUnless(HAS_ORJSON, "orjson is not installed")
+    def test_orjson(self):
+        dumps = json_encoding.get_dumps("orjson")
+        rnd = random.Random(1)
+        for value in [random_value(rnd) for _ in range(1000)] + [{1: "é"}]:
+            self.assertEqual(json.loads(json.dumps(value)), json.loads(dumps(value)))
+
+    def test_unknown_encoder(self):
+        with self.assertRaises(ValueError):
+            json_encoding.get_dumps("simdjson")
+
+
+class TestJsonRepresentation(unittest.TestCase):
+    def setUp(self) -> None:
+        delete_db()
+        init_db()
+        self.client = app.test_client()
+
+    def tearDown(self) -> None:
+        app.config.pop("RESTX_JSON", None)
+
+    def test_response_is_the_same_as_json(self):
+        for url in ("/api/books/", "/api/authors/1", "/api/authors/?include=books"):
+            response = self.client.get(url)
+            self.assertEqual(json.dumps(response.json) + "\n", response.text)
+
+    def test_restx_json_settings(self):
+        app.config["RESTX_JSON"] = {"indent": 2, "sort_keys": True}
+        response = self.client.get("/api/authors/1")
+        self.assertEqual(
+            json.dumps(response.json, indent=2, sort_keys=True) + "\n", response.text
+        )
@@ -0,0 +1,226 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from http import HTTPStatus
+
+from books_app import app
+from core.database import (
+    DATABASE_FILE_PATH,
+    INITIAL_AUTHORS,
+    INITIAL_BOOKS,
+    delete_db,
+    get_connection,
+    init_db,
+)
+from core.migrations import MIGRATIONS, get_schema_version, migrate
+from services.authors import delete_author, get_all_authors, get_author
+from services.books import get_book, get_books_by_author
+
+
+def create_baseline_tables(conn: sqlite3.Connection) -> None:
+    """Create tables like `init_db` did before migrations were introduced."""
+    conn.executescript(
+        """
+        CREATE TABLE `authors` (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            last_name TEXT NOT NULL,
+            first_name TEXT,
+            middle_name TEXT NULL
+        );
+        CREATE TABLE `books` (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            author_id INTEGER NOT NULL ,
+            title TEXT,
+            FOREIGN KEY (author_id)
+                REFERENCES `authors` (id)
+                ON DELETE CASCADE
+        );
+        """
+    )
+
+
+class TestMigrate(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.conn = sqlite3.connect(os.path.join(self.tmp_dir.name, "migrate.db"))
+
+    def tearDown(self) -> None:
+        self.conn.close()
+        self.tmp_dir.cleanup()
+
+    def test_migrates_to_latest_version(self):
+        applied = migrate(self.conn)
+        self.conn.commit()
+
+        self.assertEqual([item.version for item in MIGRATIONS], applied)
+        self.assertEqual(MIGRATIONS[-1].version, get_schema_version(self.conn))
+
+    def test_applies_only_pending_migrations(self):
+        self.assertEqual([1], migrate(self.conn, target=1))
+        self.conn.commit()
+
+        self.assertEqual([item.version for item in MIGRATIONS[1:]], migrate(self.conn))
+        self.assertEqual([], migrate(self.conn))
+
+    def test_adopts_database_created_without_migrations(self):
+        create_baseline_tables(self.conn)
+        self.conn.execute(
+            "INSERT INTO authors (last_name, first_name) VALUES ('Martin', 'Robert')"
+        )
+        self.conn.execute("INSERT INTO books (author_id, title) VALUES (1, 'Title')")
+        self.conn.commit()
+
+        migrate(self.conn)
+        self.conn.commit()
+
+        self.assertEqual(MIGRATIONS[-1].version, get_schema_version(self.conn))
+        self.assertEqual(
+            [("Martin",)], self.conn.execute("SELECT last_name FROM authors").fetchall()
+        )
+        self.conn.execute("UPDATE books SET title = 'New title' WHERE id = 1")
+        self.assertEqual(
+            [("New title", 2)],
+            self.conn.execute("SELECT title, version FROM books").fetchall(),
+        )
+
+    def test_adds_version_columns_missed_by_adopting_migration(self):
+        # Databases adopted by the first release of migration 1 have no `version`
+        create_baseline_tables(self.conn)
+        self.conn.execute("PRAGMA user_version = 3")
+        self.conn.commit()
+
+        self.assertEqual([4], migrate(self.conn, target=4))
+        for table in ("authors", "books"):
+            columns = [
+                row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")
+            ]
+            self.assertIn("version", columns)
+
+    def test_failed_migration_is_rolled_back(self):
+        self.conn.execute("CREATE TABLE books (id INTEGER PRIMARY KEY)")
+        self.conn.commit()
+
+        # Index on a missing column fails after the tables were created
+        with self.assertRaises(sqlite3.OperationalError):
+            migrate(self.conn)
+        self.conn.rollback()
+
+        self.assertEqual(0, get_schema_version(self.conn))
+        tables = self.conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'"
+        ).fetchall()
+        self.assertEqual([("books",)], tables)
+
+    def test_newer_schema_is_refused(self):
+        migrate(self.conn)
+        self.conn.commit()
+
+        with self.assertRaises(Exception):
+            migrate(self.conn, target=1)
+
+
+class TestInitDb(unittest.TestCase):
+    def setUp(self) -> None:
+        delete_db()
+
+    def test_init_db_loads_initial_data_once(self):
+        init_db()
+        with get_connection() as conn:
+            conn.execute("DELETE FROM books")
+        init_db()
+
+        with get_connection() as conn:
+            (authors,) = conn.execute("SELECT count(*) FROM authors").fetchone()
+            (books,) = conn.execute("SELECT count(*) FROM books").fetchone()
+        self.assertEqual(len(INITIAL_AUTHORS), authors)
+        self.assertEqual(0, books)
+
+    def test_init_db_adopts_database_created_without_migrations(self):
+        with sqlite3.connect(DATABASE_FILE_PATH) as conn:
+            create_baseline_tables(conn)
+            conn.execute(
+                "INSERT INTO authors (id, last_name, first_name) VALUES (7, 'Beck', 'Kent')"
+            )
+            conn.execute(
+                "INSERT INTO books (id, author_id, title) VALUES (7, 7, 'TDD')"
+            )
+        conn.close()
+
+        init_db()
+
+        # Existing data is kept, and initial data is not loaded into it
+        self.assertEqual([7], [author.id for author in get_all_authors()])
+        client = app.test_client()
+        response = client.patch("/api/books/7", json={"title": "Test Driven"})
+        self.assertEqual(HTTPStatus.OK, response.status_code)
+        response = client.get("/api/books/7")
+        self.assertEqual(HTTPStatus.OK, response.status_code)
+        self.assertEqual("Test Driven", response.json["title"])
+        self.assertIn("ETag", response.headers)
+
+
+class TestQueryPlans(unittest.TestCase):
+    """Lookups of single resources must use indexes, not scan whole tables."""
+
+    def setUp(self) -> None:
+        delete_db()
+        init_db()
+
+    def assert_no_full_scans(self, func, *args):
+        statements = []
+        with get_connection() as conn:
+            conn.set_trace_callback(statements.append)
+            try:
+                func(*args)
+            finally:
+                conn.set_trace_callback(None)
+
+            selects = [
+                statement
+                for statement in statements
+                if statement.lstrip().upper().startswith("SELECT")
+            ]
+            self.assertTrue(selects)
+            for statement in selects:
+                plan = [
+                    detail
+                    for _, _, _, detail in conn.execute(
+                        f"EXPLAIN QUERY PLAN {statement}"
+                    )
+                ]
+                scans = [detail for detail in plan if detail.startswith("SCAN")]
+                self.assertEqual([], scans, statement)
+            conn.rollback()
+
+    def test_get_book(self):
+        self.assert_no_full_scans(get_book, INITIAL_BOOKS[0]["id"])
+
+    def test_get_books_by_author(self):
+        self.assert_no_full_scans(get_books_by_author, INITIAL_AUTHORS[0]["id"])
+
+    def test_get_author(self):
+        self.assert_no_full_scans(get_author, INITIAL_AUTHORS[0]["id"])
+
+    def test_delete_author(self):
+        self.assert_no_full_scans(delete_author, INITIAL_AUTHORS[0]["id"])
+
+    def test_book_title_lookup(self):
+        def get_book_ids_by_title(title):
+            with get_connection() as conn:
+                conn.execute("SELECT id FROM books WHERE title = ?", [title])
+
+        self.assert_no_full_scans(get_book_ids_by_title, INITIAL_BOOKS[0]["title"])
+
+    def test_author_last_name_lookup(self):
+        def get_authors_by_last_name(last_name):
+            with get_connection() as conn:
+                conn.execute(
+                    "SELECT last_name, first_name, id, middle_name FROM authors "
+                    "WHERE last_name IN (?) ORDER BY id",
+                    [last_name],
+                )
+
+        self.assert_no_full_scans(
+            get_authors_by_last_name, INITIAL_AUTHORS[0]["last_name"]
+        )
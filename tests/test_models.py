@@ -0,0 +1,109 @@
+import json
+import unittest
+
+from marshmallow import Schema, fields, post_dump
+from marshmallow.utils import missing
+
+from core.models import (
+    Author,
+    AuthorSchema,
+    Book,
+    BookSchema,
+    compile_dump,
+    compile_load,
+    dump_author,
+    dump_book,
+)
+
+
+class TestCompiledDump(unittest.TestCase):
+    def setUp(self) -> None:
+        self.authors = [
+            Author(id=1, last_name="Romalho", first_name="Luciano", middle_name=""),
+            Author(id=2, last_name="Пушкин", first_name="Александр", middle_name=None),
+            Author(last_name="Fowler", first_name="Martin"),
+        ]
+        self.books = [
+            Book(id=0, title="Fluent Python", author=self.authors[0]),
+            Book(id=1, title="Евгений Онегин / 1", author=self.authors[1]),
+            Book(id=2, title=None, author=self.authors[2]),
+        ]
+
+    def test_dump_author_matches_marshmallow(self):
+        for author in self.authors:
+            expected = AuthorSchema().dump(author)
+            self.assertEqual(json.dumps(expected), json.dumps(dump_author(author)))
+
+    def test_dump_book_matches_marshmallow(self):
+        for book in self.books:
+            expected = BookSchema().dump(book)
+            self.assertEqual(json.dumps(expected), json.dumps(dump_book(book)))
+
+    def test_dump_book_without_author(self):
+        book = Book(id=3, title="Anonymous", author=None)
+        self.assertEqual(BookSchema().dump(book), dump_book(book))
+
+    def test_data_key_and_attribute(self):
+        class RenamedSchema(Schema):
+            book_id = fields.Int(attribute="id", data_key="bookId")
+            title = fields.Str()
+
+        book = self.books[0]
+        self.assertEqual(
+            RenamedSchema().dump(book), compile_dump(RenamedSchema())(book)
+        )
+
+    def test_unsupported_schema_falls_back_to_marshmallow(self):
+        class HookedSchema(Schema):
+            id = fields.Int()
+
+            @post_dump
+            def add_kind(self, data, **kwargs):
+                data["kind"] = "book"
+                return data
+
+        class FloatSchema(Schema):
+            id = fields.Float()
+
+        book = self.books[0]
+        self.assertEqual({"id": 0, "kind": "book"}, compile_dump(HookedSchema())(book))
+        self.assertEqual({"id": 0.0}, compile_dump(FloatSchema())(book))
+
+
+class TestCompileLoad(unittest.TestCase):
+    book_partial = {"id", "author.id", "author.last_name", "author.first_name"}
+
+    def assert_loads_like_marshmallow(self, schema, data, partial=None):
+        self.assertEqual(
+            schema.load(data, partial=partial), compile_load(schema, partial)(data)
+        )
+
+    def test_load_matches_marshmallow(self):
+        self.assert_loads_like_marshmallow(
+            AuthorSchema(), {"last_name": "Tolstoy", "first_name": "Leo"}
+        )
+        self.assert_loads_like_marshmallow(
+            BookSchema(),
+            {"title": "War and Peace", "author": {"id": 1}},
+            self.book_partial,
+        )
+        self.assert_loads_like_marshmallow(
+            BookSchema(), {"title": "War and Peace"}, self.book_partial
+        )
+
+    def test_items_needing_marshmallow_are_not_loaded(self):
+        load_book = compile_load(BookSchema(), self.book_partial)
+        for data in (
+            {"title": "War and Peace", "author": {"id": "1"}},
+            {"title": 1},
+            {"title": "War and Peace", "publisher": "Penguin"},
+            {"title": "War and Peace", "author": {"id": 1, "middle_name": None}},
+            ["War and Peace"],
+        ):
+            self.assertIs(missing, load_book(data))
+
+    def test_unsupported_schema_is_not_loaded(self):
+        class ValidatedSchema(Schema):
+            title = fields.Str(validate=lambda value: len(value) > 3)
+
+        self.assertIs(missing, compile_load(ValidatedSchema())({"title": "War"}))
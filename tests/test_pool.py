@@ -0,0 +1,111 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from core.pool import ConnectionPool, PoolTimeout
+
+
+class TestConnectionPool(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.pool = ConnectionPool(
+            os.path.join(self.tmp_dir.name, "pool.db"), max_size=2, timeout=0.1
+        )
+        with self.pool.connection() as conn:
+            conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+
+    def tearDown(self) -> None:
+        self.pool.close_all()
+        self.tmp_dir.cleanup()
+
+    def test_pragmas_applied(self):
+        with self.pool.connection() as conn:
+            self.assertEqual("wal", conn.execute("PRAGMA journal_mode").fetchone()[0])
+            self.assertEqual(1, conn.execute("PRAGMA foreign_keys").fetchone()[0])
+
+    def test_connection_reused(self):
+        with self.pool.connection() as first:
+            pass
+        with self.pool.connection() as second:
+            pass
+        self.assertIs(first, second)
+
+    def test_nested_checkout_shares_connection(self):
+        with self.pool.connection() as outer:
+            with self.pool.connection() as inner:
+                self.assertIs(outer, inner)
+
+    def test_rollback_on_error(self):
+        with self.assertRaises(RuntimeError):
+            with self.pool.connection() as conn:
+                conn.execute("INSERT INTO items (name) VALUES ('lost')")
+                with self.pool.connection():
+                    raise RuntimeError
+
+        with self.pool.connection() as conn:
+            count = conn.execute("SELECT count(*) FROM items").fetchone()[0]
+        self.assertEqual(0, count)
+
+    def test_pool_is_bounded(self):
+        checked_out = threading.Event()
+        release = threading.Event()
+
+        def hold_connection():
+            with self.pool.connection():
+                checked_out.set()
+                release.wait()
+
+        threads = [threading.Thread(target=hold_connection) for _ in range(2)]
+        for thread in threads:
+            checked_out.clear()
+            thread.start()
+            checked_out.wait()
+
+        try:
+            with self.assertRaises(PoolTimeout):
+                with self.pool.connection():
+                    pass
+        finally:
+            release.set()
+            for thread in threads:
+                thread.join()
+
+    def test_closed_connection_replaced(self):
+        with self.pool.connection() as conn:
+            pass
+        conn.close()
+
+        with self.pool.connection() as new_conn:
+            self.assertIsNot(conn, new_conn)
+            self.assertEqual(
+                0, new_conn.execute("SELECT count(*) FROM items").fetchone()[0]
+            )
+
+    def test_call_after_commit(self):
+        calls = []
+        with self.pool.connection():
+            self.pool.call_after_commit(lambda: calls.append("committed"))
+            self.assertEqual([], calls)
+        self.assertEqual(["committed"], calls)
+
+        with self.assertRaises(RuntimeError):
+            with self.pool.connection():
+                self.pool.call_after_commit(lambda: calls.append("rolled back"))
+                raise RuntimeError
+        self.assertEqual(["committed"], calls)
+
+    def test_call_after_rollback(self):
+        calls = []
+        with self.pool.connection():
+            self.pool.call_after_rollback(lambda: calls.append("committed"))
+        self.assertEqual([], calls)
+
+        with self.assertRaises(RuntimeError):
+            with self.pool.connection() as conn:
+                conn.execute("INSERT INTO items DEFAULT VALUES")
+                self.assertTrue(self.pool.in_transaction())
+                self.pool.call_after_rollback(lambda: calls.append("rolled back"))
+                raise RuntimeError
+        self.assertEqual(["rolled back"], calls)
+        self.assertFalse(self.pool.in_transaction())
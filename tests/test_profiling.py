@@ -0,0 +1,107 @@
+import marshal
+import sqlite3
+import time
+import unittest
+from http import HTTPStatus
+
+from flask import Flask
+from flask_restx import Api
+
+from apis import profiling
+from apis.authors import api as api_authors
+from apis.books import api as api_books
+from core.database import delete_db, get_pool, init_db
+from core.profiling import Recorder, phase, start_recording, stop_recording
+
+
+class TestRecorder(unittest.TestCase):
+    def test_phases_are_exclusive(self):
+        recorder = start_recording()
+        with phase("models"):
+            time.sleep(0.01)
+            with phase("sql"):
+                time.sleep(0.02)
+        stop_recording()
+
+        self.assertAlmostEqual(0.01, recorder.durations["models"], delta=0.005)
+        self.assertAlmostEqual(0.02, recorder.durations["sql"], delta=0.005)
+        self.assertAlmostEqual(
+            recorder.total(), sum(recorder.durations.values()), delta=0.001
+        )
+
+    def test_phase_without_recorder_does_nothing(self):
+        with phase("sql"):
+            pass
+        self.assertIsNone(stop_recording())
+
+    def test_recorder_counts(self):
+        recorder = Recorder()
+        recorder.count("sql_statements")
+        recorder.count("sql_statements", 2)
+        self.assertEqual(3, recorder.counts["sql_statements"])
+
+
+class TestProfilingMiddleware(unittest.TestCase):
+    def setUp(self) -> None:
+        app = Flask(__name__)
+        api = Api()
+        api.add_namespace(api_books, path="/api/books")
+        api.add_namespace(api_authors, path="/api/authors")
+        api.init_app(app)
+        profiling.init_app(app, api)
+        delete_db()
+        init_db()
+        self.app = app.test_client()
+
+    def tearDown(self) -> None:
+        get_pool().factory = sqlite3.Connection
+        get_pool().close_all()
+
+    def test_server_timing_header(self):
+        response = self.app.get("/api/books/1")
+        self.assertEqual(HTTPStatus.OK, response.status_code)
+
+        metrics = dict(
+            metric.split(";", 1)
+            for metric in response.headers["Server-Timing"].split(", ")
+        )
+        for name in ("db_connect", "sql", "models", "dump", "json", "app", "total"):
+            self.assertIn(name, metrics)
+        self.assertRegex(metrics["sql"], r'desc="[1-9]\d* statements"')
+
+    def test_latency_histograms(self):
+        for _ in range(3):
+            self.app.get("/api/books/1")
+        self.app.get("/api/authors/")
+
+        histograms = self.app.get("/_profiling/latency").json
+        histogram = histograms["GET /api/books/<book_id>"]
+        self.assertEqual(3, histogram["count"])
+        self.assertEqual(3, histogram["buckets"][-1]["count"])
+        self.assertEqual("+Inf", histogram["buckets"][-1]["le"])
+        self.assertEqual(1, histograms["GET /api/authors/"]["count"])
+
+    def test_sample_profile(self):
+        self.assertEqual(
+            HTTPStatus.NOT_FOUND, self.app.get("/_profiling/profile").status_code
+        )
+
+        response = self.app.post("/_profiling/profile?requests=2")
+        self.assertEqual(HTTPStatus.ACCEPTED, response.status_code)
+        self.app.get("/api/books/")
+        self.assertEqual(
+            HTTPStatus.ACCEPTED, self.app.get("/_profiling/profile").status_code
+        )
+        self.app.get("/api/books/1")
+
+        response = self.app.get("/_profiling/profile")
+        self.assertEqual(HTTPStatus.OK, response.status_code)
+        stats = marshal.loads(response.data)
+        self.assertTrue(any(name == "get_book_json" for _, _, name in stats))
+
+        response = self.app.get("/_profiling/profile?format=text")
+        self.assertIn("function calls", response.text)
+
+    def test_sample_profile_wrong_number_of_requests(self):
+        response = self.app.post("/_profiling/profile?requests=zero")
+        self.assertEqual(HTTPStatus.BAD_REQUEST, response.status_code)
@@ -0,0 +1,125 @@
+import json
+import unittest
+
+from apis.representations import BINARY_CODECS
+from books_app import app
+from core.database import delete_db, init_db
+
+GET_URLS = [
+    "/api/books/",
+    "/api/books/?after_id=1&limit=2",
+    "/api/books/?q=python",
+    "/api/books/1",
+    "/api/books/999",
+    "/api/authors/",
+    "/api/authors/?include=books",
+    "/api/authors/1",
+    "/api/authors/999",
+]
+
+
+class TestBinaryRepresentations(unittest.TestCase):
+    def setUp(self) -> None:
+        delete_db()
+        init_db()
+        self.client = app.test_client()
+
+    def test_codecs_are_installed(self):
+        self.assertIn("application/msgpack", BINARY_CODECS)
+        self.assertIn("application/cbor", BINARY_CODECS)
+
+    def test_same_data_as_json(self):
+        for url in GET_URLS:
+            expected = self.client.get(url)
+            for mimetype, (_encode, decode) in BINARY_CODECS.items():
+                with self.subTest(url=url, mimetype=mimetype):
+                    response = self.client.get(url, headers={"Accept": mimetype})
+                    self.assertEqual(expected.status_code, response.status_code)
+                    self.assertEqual(mimetype, response.mimetype)
+                    self.assertEqual(expected.json, decode(response.data))
+                    if "ETag" in expected.headers:
+                        # Strong validators differ between representations
+                        suffix = mimetype.split("/")[1]
+                        self.assertEqual(
+                            f'{expected.headers["ETag"][:-1]}-{suffix}"',
+                            response.headers["ETag"],
+                        )
+                    self.assertIn("Accept", response.vary)
+
+    def test_etags_depend_on_representation(self):
+        json_etag = self.client.get("/api/books/1").headers["ETag"]
+        headers = {"Accept": "application/msgpack"}
+        response = self.client.get(
+            "/api/books/1", headers={**headers, "If-None-Match": json_etag}
+        )
+        self.assertEqual(200, response.status_code)
+        self.assertEqual("application/msgpack", response.mimetype)
+
+        msgpack_etag = response.headers["ETag"]
+        response = self.client.get(
+            "/api/books/1", headers={**headers, "If-None-Match": msgpack_etag}
+        )
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(msgpack_etag, response.headers["ETag"])
+        self.assertIn("Accept", response.vary)
+
+        encode, _decode = BINARY_CODECS["application/msgpack"]
+        for etag, status_code in ((json_etag, 412), (msgpack_etag, 200)):
+            response = self.client.patch(
+                "/api/books/1",
+                data=encode({"title": "Newer"}),
+                headers={
+                    **headers,
+                    "Content-Type": "application/msgpack",
+                    "If-Match": etag,
+                },
+            )
+            self.assertEqual(status_code, response.status_code, etag)
+
+    def test_json_is_default(self):
+        for accept in ("*/*", "text/html,application/xhtml+xml,*/*;q=0.8"):
+            response = self.client.get("/api/books/", headers={"Accept": accept})
+            self.assertEqual("application/json", response.mimetype)
+
+    def test_binary_request_bodies(self):
+        for mimetype, (encode, decode) in BINARY_CODECS.items():
+            headers = {"Accept": mimetype, "Content-Type": mimetype}
+            with self.subTest(mimetype=mimetype):
+                response = self.client.post(
+                    "/api/books/",
+                    data=encode({"title": "New", "author": {"id": 1}}),
+                    headers=headers,
+                )
+                self.assertEqual(201, response.status_code)
+                book = decode(response.data)
+                self.assertEqual("New", book["title"])
+
+                response = self.client.patch(
+                    f"/api/books/{book['id']}",
+                    data=encode({"title": "Newer"}),
+                    headers=headers,
+                )
+                self.assertEqual("Newer", decode(response.data)["title"])
+
+                response = self.client.put(
+                    f"/api/books/{book['id']}",
+                    data=encode({"title": "Newest", "author": {"id": 2}}),
+                    headers=headers,
+                )
+                self.assertEqual(2, decode(response.data)["author"]["id"])
+
+                response = self.client.post(
+                    "/api/authors/batch",
+                    data=encode([{"last_name": "Pushkin", "first_name": "A"}]),
+                    headers=headers,
+                )
+                self.assertEqual(201, decode(response.data)[0]["status"])
+
+    def test_invalid_binary_body(self):
+        for mimetype in BINARY_CODECS:
+            with self.subTest(mimetype=mimetype):
+                response = self.client.post(
+                    "/api/authors/", data=b"\xc1\xff", content_type=mimetype
+                )
+                self.assertEqual(400, response.status_code)
+                self.assertIn(mimetype, json.dumps(response.json))